@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+'''
+Time convert_to_dicts with the generated row converters against converting
+each field of each row with the runtime checks of _convert_value (which is how
+every field was converted before the row converters). The rows are unsaved 
+users of the test models, so no queries are made. Run from the root of the
+repo:
+
+    python benchmarks/bench_row_converter.py [<rows>]
+'''
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def runtime_convert(rows, fields, trav, hyperlinkerize):
+    vals = []
+    for m in rows:
+        out = {}
+        for f in fields:
+            _convert_value(trav, m, f, out)
+        out['url'] = hyperlinkerize(m.serializable_value('id'), '', 
+                                    getattr(m, 'url_path', ''))
+        vals.append(out)
+    return vals
+
+if __name__ == '__main__':
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'tests.settings'
+    import django
+    django.setup()
+    from mviews.serializer.models2dicts import _convert_value
+    from mviews.serializer.models2dicts import _Traversal
+    from mviews.serializer.models2dicts import convert_to_dicts
+    from mviews.serializer.utils import hyperlinkerize
+    from tests.models import User
+    
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    fields = ['id', 'email', 'password', 'level', 'last_login', 'is_active']
+    rows = [User(pk = i, email = '{}@example.com'.format(i), password = 'x')
+            for i in range(count)]
+    trav = _Traversal(User, fields, '', 0)
+    for name, run in (('runtime checks', 
+                       lambda: runtime_convert(rows, fields, trav, 
+                                               hyperlinkerize)),
+                      ('row converter', 
+                       lambda: convert_to_dicts(rows, fields))):
+        best = min(timeit.repeat(run, number = 1, repeat = 3))
+        print("{:<16}{:>10.0f} rows/sec".format(name, count / best))
@@ -32,4 +32,10 @@ class AuthorizationError(BaseAuthError):
     def __init__(self, msg="AuthorizationError error. "
                             "You do not have the correct level "
                             "or you did not create this entity."):
-        super(AuthorizationError, self).__init__(msg)
\ No newline at end of file
+        super(AuthorizationError, self).__init__(msg)
+
+class ParamError(ValueError):
+    '''
+    A query param of the request that cannot be parsed (ie. a bad cursor or 
+    page limit). It is answered with a 400.
+    '''
@@ -0,0 +1,15 @@
+'''
+Background jobs for the large writes of the modelviews. A POST, PUT or DELETE
+sent with the _async=1 query param is saved as a job and answered right away
+with a 202 and the url of the job, which reports the status, progress and 
+result of the write. The jobs are kept in the database and run by a pool of 
+worker threads in the process that received them, so no broker is needed.
+
+You must add this to your INSTALLED_APPS in your settings to use _async 
+(add mviews.jobs to the list) and migrate. The number of worker threads of 
+each process is set with the MVIEWS_JOB_WORKERS setting (default 2). The body
+of each job is kept in the default storage until the job is done. The url of
+a job is reversed from the mviews-job route of the JobStatus view, so it 
+must be routed (it is if ROUTE_AUTO_CREATE is set, otherwise add it with 
+routes.add_view).
+'''
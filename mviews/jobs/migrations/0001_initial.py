@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('model', models.CharField(verbose_name='The app_label.model_name of the modelview.', max_length=200)),
+                ('method', models.CharField(max_length=10)),
+                ('args', models.TextField(verbose_name='The json list of the path args.', default='[]')),
+                ('query', models.TextField(verbose_name='The query string, without _async.', blank=True)),
+                ('content_type', models.CharField(max_length=200, blank=True)),
+                ('accept', models.CharField(max_length=200, blank=True)),
+                ('scheme', models.CharField(max_length=10, default='http')),
+                ('host', models.CharField(max_length=200, blank=True)),
+                ('body', models.FileField(verbose_name='The body of the request, spooled to the default storage.', max_length=255, blank=True, upload_to='mviews_jobs')),
+                ('user_id', models.CharField(verbose_name='The pk of the user that sent the job.', max_length=255, blank=True, null=True)),
+                ('status', models.CharField(max_length=10, db_index=True, default='queued', choices=[('queued', 'queued'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')])),
+                ('processed', models.IntegerField(verbose_name='The number of rows written so far.', default=0)),
+                ('heartbeat', models.DateTimeField(verbose_name='When the process running the job last reported in.', blank=True, null=True)),
+                ('status_code', models.SmallIntegerField(verbose_name='The status of the response.', blank=True, null=True)),
+                ('result', models.TextField(verbose_name='The body of the response.', blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+'''
+The job table of the background writes.
+'''
+
+from django.db import models as m
+
+
+class Job(m.Model):
+    '''
+    A write of a modelview to run in the background. The request is saved as
+    it was received so that it can be run again by any process.
+    '''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    statuses = ((QUEUED, QUEUED), 
+                (RUNNING, RUNNING), 
+                (DONE, DONE), 
+                (FAILED, FAILED))
+    
+    model = m.CharField('The app_label.model_name of the modelview.', 
+                        max_length = 200)
+    method = m.CharField(max_length = 10)
+    args = m.TextField('The json list of the path args.', default = '[]')
+    query = m.TextField('The query string, without _async.', blank = True)
+    content_type = m.CharField(max_length = 200, blank = True)
+    accept = m.CharField(max_length = 200, blank = True)
+    scheme = m.CharField(max_length = 10, default = 'http')
+    host = m.CharField(max_length = 200, blank = True)
+    body = m.FileField('The body of the request, spooled to the default '
+                       'storage.', 
+                       upload_to = 'mviews_jobs', 
+                       max_length = 255, 
+                       blank = True)
+    user_id = m.CharField('The pk of the user that sent the job.', 
+                          max_length = 255, 
+                          null = True, 
+                          blank = True)
+    status = m.CharField(max_length = 10, choices = statuses, default = QUEUED, 
+                         db_index = True)
+    processed = m.IntegerField('The number of rows written so far.', 
+                               default = 0)
+    heartbeat = m.DateTimeField('When the process running the job last '
+                                'reported in.', 
+                                null = True, 
+                                blank = True)
+    status_code = m.SmallIntegerField('The status of the response.', 
+                                      null = True, blank = True)
+    result = m.TextField('The body of the response.', blank = True)
+    error = m.TextField(blank = True)
+    created = m.DateTimeField(auto_now_add = True)
+    started = m.DateTimeField(null = True, blank = True)
+    finished = m.DateTimeField(null = True, blank = True)
@@ -0,0 +1,256 @@
+'''
+Queueing and running the background jobs. Each process runs the jobs in a
+pool of MVIEWS_JOB_WORKERS threads (default 2). A job is claimed by updating
+its status from queued to running, so when the pool starts it also picks up
+any jobs left queued by a process that stopped before running them.
+
+The body of a job is spooled to the default storage as it is read from the
+request, so it is never held in memory, and the file is deleted once the job
+is done.
+
+The job runs in a transaction that the other connections cannot see into
+until it is done, so its progress is saved to the job table by another thread
+every MVIEWS_JOB_HEARTBEAT seconds (default 5), along with the heartbeat of
+the job. A running job whose heartbeat is older than MVIEWS_JOB_STALE seconds
+(default 60) was left by a process that stopped, and is marked failed when
+the pool starts or when the status of a job is asked for.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from json import dumps as dump
+from json import loads as load
+import threading
+import traceback
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.base import File
+from django.db import connections
+from django.db import DatabaseError
+from django.db import transaction
+from django.http.request import HttpRequest
+from django.http.request import QueryDict
+from django.utils import timezone
+
+from .models import Job
+
+
+_pool = None
+_pool_lock = threading.Lock()
+#the trackers of the jobs running in this process, by job id
+_trackers = {}
+
+
+class _JobRequest(HttpRequest):
+    '''
+    The request of a job, rebuilt from the job table.
+    '''
+
+    def __init__(self, job):
+        super(_JobRequest, self).__init__()
+        self.method = job.method
+        self.path = self.path_info = '/'
+        self.GET = QueryDict(job.query, mutable = True)
+        if job.body:
+            job.body.open('rb')
+            self._stream = job.body.file
+            length = job.body.size
+        else:
+            self._stream = BytesIO()
+            length = 0
+        self.META = {'CONTENT_TYPE' : job.content_type,
+                     'CONTENT_LENGTH' : str(length),
+                     'HTTP_ACCEPT' : job.accept,
+                     'HTTP_HOST' : job.host,
+                     'REQUEST_METHOD' : job.method}
+        self._read_started = False
+        self._scheme = job.scheme
+        self.user = AnonymousUser()
+        if job.user_id is not None:
+            try:
+                self.user = get_user_model().objects.get(pk = job.user_id)
+            except get_user_model().DoesNotExist:
+                pass
+        self.mviews_job = _trackers[job.pk]
+
+    def _get_scheme(self):
+        return self._scheme
+
+
+class _Tracker(object):
+    '''
+    Counts the rows written by a running job and saves the count to the job
+    table (with the heartbeat of the job) from its own thread, since the job
+    runs in a transaction. The modelviews find it on the request as
+    mviews_job.
+    '''
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.processed = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target = self._beat)
+        self._thread.daemon = True
+
+    def add_progress(self, rows):
+        self.processed += rows
+
+    def start(self):
+        _trackers[self.job_id] = self
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        _trackers.pop(self.job_id, None)
+
+    def _beat(self):
+        interval = getattr(settings, 'MVIEWS_JOB_HEARTBEAT', 5)
+        try:
+            while not self._stopped.wait(interval):
+                try:
+                    Job.objects.filter(pk = self.job_id,
+                                       status = Job.RUNNING
+                                       ).update(processed = self.processed,
+                                                heartbeat = timezone.now())
+                except DatabaseError:
+                    pass #ie. the table is locked by the job; try next beat
+        finally:
+            connections.close_all()
+
+
+def fail_stale_jobs():
+    '''
+    Mark the running jobs whose heartbeat is older than MVIEWS_JOB_STALE
+    seconds as failed, since the process running them has stopped.
+
+    @return the number of jobs marked failed
+    '''
+    now = timezone.now()
+    stale = now - timedelta(seconds = getattr(settings, 'MVIEWS_JOB_STALE', 60))
+    return Job.objects.filter(status = Job.RUNNING, heartbeat__lt = stale
+                              ).update(status = Job.FAILED,
+                                       finished = now,
+                                       error = "The job stopped before it "
+                                               "finished.")
+
+def _get_pool():
+    '''
+    Get the worker pool of the process, starting it (and queueing the jobs
+    that are waiting in the job table) the first time.
+    '''
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(getattr(settings,
+                                               'MVIEWS_JOB_WORKERS',
+                                               2))
+            fail_stale_jobs()
+            for job_id in Job.objects.filter(status = Job.QUEUED
+                                             ).values_list('pk', flat = True):
+                _pool.submit(run_job, job_id)
+    return _pool
+
+def queue_job(mview, request, *args):
+    '''
+    Save the request to the modelview as a job and queue it to run in the
+    background once the transaction the job is saved in is committed.
+
+    @param mview: the modelview handling the request
+    @param request: the request, which must not have been read yet
+    @param args: the path args of the request
+    @return the job
+    '''
+    query = request.GET.copy()
+    query.pop('_async', None)
+    user = getattr(request, 'user', None)
+    job = Job(model = mview._mv_spec.label,
+              method = request.method,
+              args = dump(list(args)),
+              query = query.urlencode(),
+              content_type = request.META.get('CONTENT_TYPE', ''),
+              accept = mview.accept,
+              scheme = request.scheme,
+              host = request.get_host(),
+              user_id = (str(user.pk) if user is not None
+                         and user.is_authenticated() else None)
+              )
+    if request.method != 'DELETE':
+        #saved with the storage since the size of the body may not be known
+        body = job.body
+        body.name = body.storage.save(body.field.generate_filename(job, 'body'),
+                                      File(request))
+    job.save()
+    #the workers cannot see the job until the transaction of the request is
+    #committed (ie. with ATOMIC_REQUESTS)
+    transaction.on_commit(lambda: _get_pool().submit(run_job, job.pk))
+    return job
+
+def run_job(job_id):
+    '''
+    Run the job if it is still queued, saving the response of the modelview
+    to the job table.
+
+    @param job_id: the id of the job
+    '''
+    try:
+        if not Job.objects.filter(pk = job_id, status = Job.QUEUED
+                                  ).update(status = Job.RUNNING,
+                                           started = timezone.now(),
+                                           heartbeat = timezone.now()):
+            return #another worker got to it first
+        job = Job.objects.get(pk = job_id)
+        tracker = _Tracker(job_id)
+        tracker.start()
+        try:
+            view = apps.get_model(job.model).as_view()
+            resp = view(_JobRequest(job), *load(job.args))
+            job.status_code = resp.status_code
+            job.result = resp.content.decode('utf-8')
+            job.status = Job.DONE if resp.status_code < 400 else Job.FAILED
+        except Exception:
+            job.status = Job.FAILED
+            job.error = traceback.format_exc()
+        finally:
+            tracker.stop()
+        if job.body:
+            job.body.close()
+            job.body.delete(save = False)
+            job.body = ''
+        job.processed = tracker.processed
+        job.finished = timezone.now()
+        job.save(update_fields = ['status', 'status_code', 'result', 'error',
+                                  'processed', 'finished', 'body'])
+    finally:
+        connections.close_all()
+
+def job_status(job):
+    '''
+    Get the status of the job to send to the client.
+
+    @param job: the job
+    @return a json serializable dictionary of the job
+    '''
+    result = job.result
+    if result:
+        try:
+            result = load(result)
+        except ValueError:
+            pass #not a json response
+    tracker = _trackers.get(job.pk)
+    return {"id" : job.pk,
+            "model" : job.model,
+            "method" : job.method,
+            "status" : job.status,
+            "processed" : job.processed if tracker is None
+                                        else tracker.processed,
+            "status_code" : job.status_code,
+            "result" : result or None,
+            "error" : job.error or None,
+            "created" : job.created,
+            "started" : job.started,
+            "finished" : job.finished}
@@ -0,0 +1,51 @@
+'''
+The view that reports the status of a background job.
+'''
+
+from django.views.generic.base import View
+
+from .models import Job
+from .utils import fail_stale_jobs
+from .utils import job_status
+from mviews.utils import err
+from mviews.utils import json_response
+
+
+class JobStatus(View):
+    '''
+    The status resource of the background jobs.
+    '''
+    routes = [{"pattern" : "mviews/jobs/{}", 
+               "map" : [(r'(\d+)',)], 
+               "kwargs" : {"django_url_name" : "mviews-job"}}]
+    
+    def get(self, request, job_id, *args, **kwargs):
+        '''
+        Get the status of a job. Looks as follows:
+        
+            {
+                "id" : <job id>,
+                "model" : "<app_label.model_name>",
+                "method" : "<POST|PUT|DELETE>",
+                "status" : "queued" | "running" | "done" | "failed",
+                "processed" : <number of rows written so far>,
+                "status_code" : <status of the response when done>,
+                "result" : <body of the response when done>,
+                "error" : <the error if the job could not be run>,
+                "created" : <timestamp>,
+                "started" : <timestamp>,
+                "finished" : <timestamp>
+            }
+        
+        Only the user that sent the job (or staff) can see it.
+        '''
+        fail_stale_jobs()
+        try:
+            job = Job.objects.get(pk = job_id)
+        except Job.DoesNotExist:
+            return err("Job {} was not found.".format(job_id), 404)
+        user = request.user
+        if (job.user_id is not None and job.user_id != str(user.pk) 
+                and not getattr(user, 'is_staff', False)):
+            return err("Job {} was not found.".format(job_id), 404)
+        return json_response(job_status(job))
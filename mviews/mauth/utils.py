@@ -11,10 +11,13 @@ framework. All functions that get the user model should access it through this
 module.
 '''
 
+from types import MappingProxyType
+
 from django.contrib.auth import authenticate as auth
 from django.contrib.auth import get_user_model
 from django.contrib.auth import login
 from django.contrib.auth import SESSION_KEY
+from django.core.signals import setting_changed
 
 from mviews.utils import read
 from mviews.errors import AuthenticationError
@@ -23,6 +26,99 @@ from mviews.errors import AuthenticationError
 USER = get_user_model
 
 
+class LevelTable(object):
+    """
+    The user levels of the user model, resolved once per process. Use 
+    level_table to get it and reload_levels if the levels change. The levels
+    are read off an instance of the user model, so they may be properties.
+    """
+    
+    def __init__(self, user_model):
+        user = user_model()
+        by_name = getattr(user, 'level_by_name', None)
+        if not isinstance(by_name, dict):
+            raise AttributeError("The user model {} does not define the "
+                                 "level_by_name dictionary."
+                                 .format(user_model.__name__))
+        self.level_by_name = MappingProxyType(dict(by_name))
+        self.levels = MappingProxyType(dict(getattr(user, 'levels', None)
+                                            or {v : k for k, v in 
+                                                self.level_by_name.items()}))
+
+_table = None
+#the _perms of each view compiled against the level table, by view
+_perm_levels = {}
+
+def level_table():
+    """
+    Get the user levels of the user model. An attribute error is raised if 
+    the level_by_name dictionary is not defined (see get_user_level_names).
+    
+    @return the LevelTable
+    """
+    global _table
+    if _table is None:
+        _table = LevelTable(USER())
+    return _table
+
+def reload_levels():
+    """
+    Forget the user levels and the permissions compiled with them, so that
+    they are resolved again from the user model. Call this if the levels of
+    the user model change while running. This is done when the 
+    AUTH_USER_MODEL setting is changed (ie. in tests).
+    """
+    global _table
+    _table = None
+    _perm_levels.clear()
+
+def _reload_on_setting(setting, **kwargs):
+    if setting == 'AUTH_USER_MODEL':
+        reload_levels()
+
+setting_changed.connect(_reload_on_setting)
+
+def compile_perms(perms):
+    """
+    Compile a _perms dictionary of method to level name into a dictionary of
+    method to the minimum level, so that checking a permission is a single
+    compare. A method with no level name only needs an authenticated user 
+    and has a level of None. If the user model does not define its levels,
+    every level is None.
+    
+    @param perms: the _perms dictionary
+    @return the read-only dictionary of the method to the level
+    """
+    try:
+        by_name = level_table().level_by_name
+    except AttributeError:
+        by_name = None
+    compiled = {}
+    for method, name in perms.items():
+        if not name or by_name is None:
+            compiled[method] = None
+        elif name not in by_name:
+            raise ValueError("{} is not a user level. User levels are: {}"
+                             .format(name, sorted(by_name)))
+        else:
+            compiled[method] = by_name[name]
+    return MappingProxyType(compiled)
+
+def perm_levels(view):
+    """
+    Get the _perms of the view compiled with compile_perms. They are compiled
+    once per view class.
+    
+    @param view: the view class (or an instance of it)
+    @return the read-only dictionary of the method to the level
+    """
+    if not isinstance(view, type):
+        view = type(view)
+    levels = _perm_levels.get(view)
+    if levels is None:
+        levels = _perm_levels[view] = compile_perms(getattr(view, '_perms', {}))
+    return levels
+
 def get_user_level_names():
     """
     Get the user levels that are currently defined on the user model. An attribute
@@ -37,7 +133,7 @@ def get_user_level_names():
     
     @return the current user model levels_by_name dictionary 
     """
-    return USER().level_by_name
+    return level_table().level_by_name
 
 def get_user_levels():
     """
@@ -53,7 +149,7 @@ def get_user_levels():
     
     @return the current user model levels dictionary
     """
-    return USER().levels
+    return level_table().levels
 
 def get_level_name(level):
     """
@@ -62,7 +158,7 @@ def get_level_name(level):
     @param level: the int of the level
     @return the level name
     """
-    return get_user_level_names()[level]
+    return get_user_levels()[level]
 
 def get_level(levelName):
     """
@@ -71,7 +167,7 @@ def get_level(levelName):
     @param levelName: the name of the level
     @return the level int
     """
-    return get_user_levels()[levelName]
+    return get_user_level_names()[levelName]
 
 def authenticate(request, email = None, password = None):
     '''
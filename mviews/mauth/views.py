@@ -7,7 +7,6 @@ Created on May 19, 2015
 from django.contrib.auth import logout
 from django.db.utils import IntegrityError
 from django.http.response import HttpResponse
-from django.http.response import JsonResponse as jr
 from django.views.generic.base import View
 
 from .utils import authenticate
@@ -15,8 +14,9 @@ from .utils import USER
 from mviews.errors import AuthenticationError
 from mviews.serializer.models2dicts import convert_to_dicts
 from mviews.utils import err
+from mviews.utils import json_response
 from mviews.utils import read
-from mviews.mauth.utils import get_level, get_user_levels, get_user_level_names
+from mviews.mauth.utils import get_level_name, get_user_levels, get_user_level_names
 
 class CreateUser(View):
     '''
@@ -38,7 +38,7 @@ class CreateUser(View):
         try:
             p = USER().objects.create_user(**j)
             resp = convert_to_dicts([p], p.field_names, p)[0]
-            return jr(resp)
+            return json_response(resp)
         except IntegrityError as ie:
             return err(ie)
 
@@ -86,19 +86,19 @@ class Permission(View):
         Return the permission levels available.
         """
         data = {
-                "levels" : get_user_levels(),
-                "level_by_name" : get_user_level_names()
+                "levels" : dict(get_user_levels()),
+                "level_by_name" : dict(get_user_level_names())
                 }
-        return jr(data)
+        return json_response(data)
     
     def get(self, request, *args, **kwargs):
         '''
         Return the permission level of the user.
         '''
         if not request.user.is_authenticated():
-            return jr({'level' : get_level(0)})
+            return json_response({'level' : get_level_name(0)})
         else:
-            return jr({'level' : get_level(
+            return json_response({'level' : get_level_name(
                                         getattr(request.user, 'level', 0)
                                         )
                        }
@@ -0,0 +1,347 @@
+'''
+A cache for the GET responses of the modelviews, kept in the Django cache
+framework (so eviction is done by the backend, ie. LRU for locmem and TTL for
+all of them). To cache a modelview, add _cache_timeout = <seconds> on the
+model. The cache used is the one named by the MVIEWS_CACHE setting, or the
+default cache.
+
+Responses are keyed by the model, the path ids, the query params (which hold
+the fields, depth, page, etc.), the Accept header and the host, along with the
+current version of the model and of every model that can be reached from it
+by expanding. A write to any of these models changes its version so that the
+responses that used it are never read again. Versions are changed by the
+writes of the modelviews and by the save, delete and m2m changed signals of
+the ORM. Writes that send no signals (ie. queryset.update or bulk_create done
+outside of a modelview) must call invalidate themselves.
+
+The signal receivers are only connected for the models that cached responses
+can depend on (so the deletes of other models can still be fast deletes), 
+which is only known once the app registry is ready. They are connected when 
+the first request is started. A process that writes to the models without 
+serving requests (ie. a worker or a management command) must call 
+connect_receivers itself, ie. in the ready method of an AppConfig.
+
+Cached responses vary by the user of the request, so each user has their own.
+If the responses of a model are the same for every user, add _cache_vary = 
+None on the model to share them. If they vary by something else, define a 
+_cache_vary(request) method on the model returning what they vary by (it must
+have a stable repr, ie. a string or a tuple of them).
+
+The same versions are used to answer conditional GETs. Add
+_conditional_get = True on the model to send an ETag made from the versions
+with each GET response, and to answer a GET with a matching If-None-Match
+with a 304 without querying the database. Add _last_modified_field =
+'<field>' on the model (ie. an auto_now datetime) to also send a
+Last-Modified header and answer If-Modified-Since. This costs one query for
+the max of the field and the count of the entities being returned, but none
+for the entities themselves. Since the max of the field does not change when
+an older entity is deleted (or saved without touching the field), the
+Last-Modified is never before the time the current ETag was first seen.
+That time is kept for MVIEWS_SEEN_TIMEOUT seconds (default a day), after 
+which the Last-Modified can move forward to when the ETag is next seen (so
+clients refetch a response that has not changed, but never keep one that 
+has).
+'''
+
+import calendar
+from hashlib import md5
+import time
+from uuid import uuid4
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_started
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models import Count
+from django.db.models import Max
+from django.http.response import HttpResponse
+from django.utils.http import http_date
+from django.utils.http import parse_etags
+from django.utils.http import parse_http_date_safe
+from django.utils.http import quote_etag
+
+from .spec import get_spec
+
+
+#the labels of the models that cached responses can depend on; writes to 
+#other models do not need to change a version
+_watched = None
+#the labels of the models reached by expanding, by (model, depth)
+_reached = {}
+
+
+def _cache():
+    return caches[getattr(settings, 'MVIEWS_CACHE', 'default')]
+
+def _version_key(label):
+    return 'mviews:version:{}'.format(label)
+
+def _label(model):
+    opts = model._meta
+    return '{}.{}'.format(opts.app_label, opts.model_name)
+
+def _reach(models, depth=None):
+    '''
+    Get the models and every model that can be reached from them by expanding
+    to the depth, or as far as possible if the depth is None.
+    '''
+    found = set(models)
+    level = list(found)
+    while level and (depth is None or depth > 0):
+        level = [r for m in level
+                   for r in get_spec(m).related_models.values()
+                   if r not in found]
+        found.update(level)
+        depth = None if depth is None else depth - 1
+    return found
+
+def _reached_labels(model, depth):
+    '''
+    Get the labels of the model and of every model that can be reached from
+    it by expanding to the depth.
+    '''
+    key = (model, depth)
+    labels = _reached.get(key)
+    if labels is None:
+        labels = _reached[key] = tuple(sorted(_label(m) 
+                                              for m in _reach([model], depth)))
+    return labels
+
+def _watched_labels():
+    '''
+    Get the labels of the models reachable from any cached modelview. This is
+    worked out from the app registry (and not from what has been cached) so 
+    that it is the same in every process using the cache.
+    '''
+    global _watched
+    if _watched is None:
+        cached = [m for m in apps.get_models() 
+                  if getattr(m, '_cache_timeout', None) is not None
+                  or getattr(m, '_conditional_get', False)]
+        _watched = frozenset(_label(m) for m in _reach(cached))
+    return _watched
+
+def _versions(labels):
+    '''
+    Get the current versions of the models, making a version for any that do
+    not have one (or that were evicted).
+    '''
+    cache = _cache()
+    keys = [_version_key(l) for l in labels]
+    versions = cache.get_many(keys)
+    for k in keys:
+        if k not in versions:
+            versions[k] = uuid4().hex
+            cache.add(k, versions[k], None)
+    return [versions[k] for k in keys]
+
+def _by_user(request):
+    '''
+    The default _cache_vary: the pk of the user of the request, or None for
+    an anonymous user.
+    '''
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated():
+        return None
+    return user.pk
+
+def _vary(mview):
+    '''
+    Get what the response varies by other than the request path, params and
+    headers (see _cache_vary in the module doc).
+    '''
+    vary = getattr(mview, '_cache_vary', _by_user)
+    if vary is None:
+        return None
+    return vary(getattr(mview, 'request', None))
+
+def _request_hash(mview, args, *extra):
+    '''
+    Hash everything about the GET request that can change its response,
+    including the versions of the models it can reach and the user.
+    '''
+    connect_receivers()
+    labels = _reached_labels(mview.__class__, mview.sdepth)
+    params = sorted((k, tuple(v)) for k, v in mview.params.lists())
+    raw = repr((labels,
+                _versions(labels),
+                args,
+                params,
+                mview.accept,
+                getattr(mview, 'rootcall', ''),
+                _vary(mview),
+                extra
+                ))
+    return md5(raw.encode('utf-8')).hexdigest()
+
+def cache_key(mview, *args):
+    '''
+    Get the key of the cached GET response of the modelview for the request
+    being handled.
+
+    @param mview: the modelview handling the request
+    @param args: the path args of the request
+    @return the key, or None if the modelview is not cached or the response
+        is streamed
+    '''
+    if getattr(mview, '_cache_timeout', None) is None or mview._mv_stream:
+        return None
+    return 'mviews:get:{}'.format(_request_hash(mview, args))
+
+def validators(mview, *args):
+    '''
+    Get the validators of the GET response of the modelview for the request
+    being handled, without reading the entities to be returned.
+    
+    @param mview: the modelview handling the request
+    @param args: the path args of the request
+    @return the ETag and the Last-Modified timestamp (or None for each if the
+        modelview does not use them)
+    '''
+    field = getattr(mview, '_last_modified_field', None)
+    if field is None:
+        if not getattr(mview, '_conditional_get', False):
+            return None, None
+        return quote_etag(_request_hash(mview, args)), None
+    summary = mview._get_qs(*args).aggregate(last=Max(field), 
+                                             count=Count('pk'))
+    last = summary['last']
+    if last is None:
+        timestamp = None
+    elif hasattr(last, 'timetuple'):
+        timestamp = int(calendar.timegm(last.utctimetuple()))
+    else:
+        timestamp = int(last)
+    etag = quote_etag(_request_hash(mview, args, timestamp, summary['count']))
+    if timestamp is not None:
+        timestamp = max(timestamp, _first_seen(etag))
+    return etag, timestamp
+
+def _first_seen(etag):
+    '''
+    Get the time the ETag was first seen, so that the Last-Modified changes
+    whenever the ETag does (ie. when the count of the entities changes). The
+    time expires after MVIEWS_SEEN_TIMEOUT seconds so that the ETags of old
+    versions do not fill the cache.
+    '''
+    cache = _cache()
+    key = 'mviews:seen:{}'.format(etag)
+    seen = cache.get(key)
+    if seen is None:
+        seen = int(time.time())
+        cache.add(key, seen, getattr(settings, 'MVIEWS_SEEN_TIMEOUT', 86400))
+    return seen
+
+def not_modified(request, etag, last_modified):
+    '''
+    Check if the conditional headers of the request match the validators.
+    If-None-Match is used over If-Modified-Since when both are sent.
+    
+    @param request: the request
+    @param etag: the ETag of the response, or None
+    @param last_modified: the Last-Modified timestamp of the response, or None
+    @return True if a 304 should be sent
+    '''
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and etag is not None:
+        if if_none_match.strip() == '*':
+            return True
+        return etag in [quote_etag(t) for t in parse_etags(if_none_match)]
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return (since is not None 
+            and last_modified is not None 
+            and last_modified <= since)
+
+def set_validators(response, etag, last_modified):
+    '''
+    Add the ETag and Last-Modified headers to the response.
+    '''
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+def get_response(key):
+    '''
+    Get the cached response for the key.
+
+    @param key: the key from cache_key
+    @return the HttpResponse, or None if not cached
+    '''
+    cached = _cache().get(key)
+    if cached is None:
+        return None
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+def set_response(key, response, timeout):
+    '''
+    Cache the response for the key. Only successful, non-streamed responses
+    are cached.
+
+    @param key: the key from cache_key
+    @param response: the HttpResponse to cache
+    @param timeout: the seconds to cache the response for
+    '''
+    if response.status_code != 200 or response.streaming:
+        return
+    _cache().set(key, (response.content, response['Content-Type']), timeout)
+
+def invalidate(model):
+    '''
+    Change the version of the model so that no response cached with the
+    current version is used again.
+
+    @param model: the model class (or an instance of it) that was written to
+    '''
+    label = _label(model)
+    if label in _watched_labels():
+        _cache().set(_version_key(label), uuid4().hex, None)
+
+def _invalidate_sender(sender, **kwargs):
+    invalidate(sender)
+
+def _invalidate_m2m(sender, instance, model, **kwargs):
+    invalidate(sender)
+    invalidate(instance)
+    invalidate(model)
+
+_connected = False
+
+def connect_receivers():
+    '''
+    Connect the receivers of the cache to the save and delete signals of the
+    models that cached responses can depend on, and to the m2m changed 
+    signals of their many to many fields. This is done once, when the first
+    request is started; call it where the app registry is ready in processes
+    that do not serve requests (see the module doc).
+    '''
+    global _connected
+    if _connected:
+        return
+    watched = _watched_labels()
+    for model in apps.get_models():
+        label = _label(model)
+        if label in watched:
+            post_save.connect(_invalidate_sender, 
+                              sender = model, 
+                              dispatch_uid = 'mviews.cache')
+            post_delete.connect(_invalidate_sender, 
+                                sender = model, 
+                                dispatch_uid = 'mviews.cache')
+        for field in model._meta.many_to_many:
+            if label in watched or _label(field.rel.to) in watched:
+                m2m_changed.connect(_invalidate_m2m, 
+                                    sender = field.rel.through, 
+                                    dispatch_uid = 'mviews.cache')
+    _connected = True
+
+def _connect_on_request(**kwargs):
+    request_started.disconnect(_connect_on_request)
+    connect_receivers()
+
+request_started.connect(_connect_on_request)
@@ -0,0 +1,102 @@
+'''
+Reading the rows of a bulk import. A modelview takes a POST with a 
+Content-Type of application/x-ndjson (one json object per line) or text/csv
+(with a header row of field names) as an import: the payload is read and 
+validated one row at a time, so an import of any size only holds a batch of
+rows in memory. See BaseModelAsView.do_import for how the rows are written.
+'''
+
+import codecs
+import csv
+from json import loads as load
+
+from django.core.exceptions import ValidationError
+
+
+import_types = ('application/x-ndjson', 'text/csv')
+
+
+def import_type(request):
+    '''
+    Get the content type of the payload if it is an import.
+
+    @param request: the request
+    @return the content type, or None if the payload is not an import
+    '''
+    if request.method != 'POST':
+        return None
+    ct = request.META.get('CONTENT_TYPE', '').split(';')[0].strip().lower()
+    return ct if ct in import_types else None
+
+def read_rows(request, content_type):
+    '''
+    Read the rows of the payload one at a time. Blank lines are skipped.
+
+    @param request: the request to read
+    @param content_type: the content type from import_type
+    @return a generator of the line number and the row as a dictionary of 
+        field name to value, or the error if the line could not be parsed
+    '''
+    lines = codecs.iterdecode(request, 'utf-8')
+    if content_type == 'text/csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, ValueError("The row has more values "
+                                                  "than the header.")
+            else:
+                yield reader.line_num, row
+        return
+    for i, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = load(line)
+        except ValueError as e:
+            yield i, ValueError("Not a valid json object: {}".format(e))
+            continue
+        if not isinstance(row, dict):
+            yield i, ValueError("Not a json object.")
+        else:
+            yield i, row
+
+def clean_row(spec, row, csv_values=False, filled=()):
+    '''
+    Validate the row against the fields of the model and convert its values
+    to python. The values are checked with the clean of their field (ie. the
+    max_length, the choices and not being blank), except that a foreign key
+    is not checked to exist, which is left to the database. The required 
+    fields of the model must all be in the row.
+
+    @param spec: the ViewSpec of the model
+    @param row: the row from read_rows
+    @param csv_values: True if the values are strings from a csv, in which 
+        case an empty value is None if the field is nullable
+    @param filled: the names of the fields that are set after the row is
+        cleaned, and so do not need to be in it
+    @return a dictionary of attname to value to create the model with
+    '''
+    cleaned = {}
+    for name, value in row.items():
+        field = spec.columns.get(name)
+        if field is None:
+            raise ValueError("{} is not a field of {}.".format(name, spec.label))
+        if csv_values and value == '' and field.null:
+            value = None
+        try:
+            if field.attname != field.name:
+                #the value of a foreign key is the value of the field it 
+                #targets; cleaning the foreign key would query for it
+                value = field.rel.get_related_field().to_python(value)
+                if value is None and not field.null:
+                    raise ValidationError(field.error_messages['null'])
+            else:
+                value = field.clean(value, None)
+        except ValidationError as e:
+            raise ValueError("{}: {}".format(name, '; '.join(e.messages)))
+        cleaned[field.attname] = value
+    for field in spec.required:
+        if (field.attname not in cleaned and field.name not in filled 
+                and field.attname not in filled):
+            raise ValueError("{} is required.".format(field.name))
+    return cleaned
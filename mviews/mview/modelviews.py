@@ -13,14 +13,30 @@ more.
 NOTE: By using this class you need to read all the documentation on it.
 """
 
-from json import dumps
+from collections import OrderedDict
+import sqlite3
 
+from django.apps import apps
 from django.contrib.auth.models import BaseUserManager
 from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError
+from django.core.urlresolvers import NoReverseMatch
+from django.core.urlresolvers import reverse
 from django.db.models import Avg
+from django.db.models import Case
+from django.db.models import Count
+from django.db.models import F
 from django.db.models import Max
 from django.db.models import Min
+from django.db.models import Q
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.deletion import Collector
 from django.db import models as m
+from django.db import connections
+from django.db import DatabaseError
+from django.db import router
 from django.db import transaction
 from django.views.generic.base import View
 from django.http.response import HttpResponse
@@ -28,12 +44,78 @@ from django.contrib.auth.models import AbstractBaseUser
 from django.conf import settings
 from django.utils import timezone
 
+from .cache import cache_key
+from .cache import get_response
+from .cache import invalidate
+from .cache import not_modified
+from .cache import set_response
+from .cache import set_validators
+from .cache import validators
+from .imports import clean_row
+from .imports import import_type
+from .imports import import_types
+from .imports import read_rows
+from .spec import get_spec
 from .utils import check_perms
 from .utils import response
 from .utils import other_response
 from mviews.utils import err
+from mviews.utils import json_response
 from mviews.utils import read
+from mviews.utils import read_stream
 from mviews.errors import BaseAuthError
+from mviews.mauth.utils import perm_levels
+from mviews.serializer.encoders import dumps
+from mviews.serializer.models2dicts import relation_paths
+from mviews.serializer.serializer import streamed_content_type
+
+def _supports_returning(connection):
+    '''
+    Check if the database supports INSERT ... RETURNING.
+    '''
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 35)
+    return False
+
+def _supports_on_conflict(connection):
+    '''
+    Check if the database supports INSERT ... ON CONFLICT DO UPDATE with a
+    RETURNING clause: PostgreSQL 9.5 or later, or SQLite 3.35 or later (ON
+    CONFLICT came in 3.24, but RETURNING in 3.35).
+    '''
+    if connection.vendor == 'postgresql':
+        return connection.pg_version >= 90500
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 35)
+    return False
+
+def _key_value(field, value):
+    '''
+    Convert a value of a unique field sent in a payload to the python value 
+    of the field, so that it is equal to the value read from the database 
+    (ie. "1.5" and Decimal('1.50')).
+    '''
+    try:
+        return field.to_python(value)
+    except ValidationError as e:
+        raise ValueError("{} is not a valid value for {}: {}"
+                         .format(value, field.name, '; '.join(e.messages)))
+
+def _batches(items, size):
+    '''
+    Split an iterable of items into lists of at most size items, without
+    reading more than one list of items at a time.
+    '''
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 class ViewWrapper(View):
     """
@@ -51,10 +133,12 @@ class ViewWrapper(View):
         "<method2>" : "<required perm>"
     }
     
-    You must also fill out the get_level_by_name dictionary on the user object
+    You must also fill out the level_by_name dictionary on the user object
     for this to work. If either of the dictionaries is not found, authorization
-    checks will be skipped. User perms must also be linked to a level and the 
-    get_level_by_name should assign those perms to a number. The user object
+    checks will be skipped. The _perms are compiled against the user levels 
+    once per view (see mviews.mauth.utils.perm_levels), so call reload_levels
+    there if the levels change while running. User perms must also be linked
+    to a level and the level_by_name should assign those perms to a number. The user object
     must also have a level attribute. To assist in making a user object, use 
     the UserModelAsView class for your user model, or extend the ABUWrapper
     and the UserManagerWrapper(if needed) to implement your users. Then
@@ -67,8 +151,10 @@ class ViewWrapper(View):
     for anyone if method is not set, then override the _check_perms method.
     """
     allowed_methods = ['get', 'post', 'put', 'delete', 'head', 'options']
-    return_types = ['application/json']
+    return_types = ['application/json', 'application/x-ndjson', 'text/csv']
     parses = ['application/json']
+    #if large payloads are parsed as they are read (see _streams_body)
+    _stream_requests = False
 
     def __init__(self, *args, **kwargs):
         super(ViewWrapper, self).__init__(**kwargs)
@@ -78,7 +164,12 @@ class ViewWrapper(View):
             return err("Method {} not allowed.".format(request.method), 405)
 
         try:
-            check_perms(request, getattr(self, '_perms', {}))
+            levels = perm_levels(self)
+        except ValueError as e: #a level name of _perms is not a user level
+            return err("The _perms of {} are misconfigured: {}"
+                       .format(type(self).__name__, e), 500)
+        try:
+            check_perms(request, getattr(self, '_perms', {}), levels)
         except BaseAuthError as e:
             return err(e, e.status)
         #It makes sense why these are stored in the request, but i want them
@@ -99,11 +190,82 @@ class ViewWrapper(View):
             self.rootcall = request.scheme + '://' + request.get_host()
         else:
             self.rootcall = ''
+        if (self.params.get('_async') == '1' 
+                and request.method in ('POST', 'PUT', 'DELETE')):
+            return self._queue_job(request, *args)
+        self._mv_import_type = import_type(request)
         try:
-            self.data = read(request)
+            if self._mv_import_type:
+                self.data = {} #the rows are read by do_import
+            elif self._streams_body(request):
+                self.data = read_stream(request, 
+                                        max_value_size = getattr(
+                                                settings, 
+                                                'STREAM_MAX_VALUE_SIZE', 
+                                                1024 * 1024))
+            else:
+                self.data = read(request)
         except ValueError as e:
             return err(e)
         return super(ViewWrapper, self).dispatch(request, *args, **kwargs)
+    
+    def _queue_job(self, request, *args):
+        '''
+        Queue the request to run in the background (see mviews.jobs) and 
+        answer with a 202 and the url of the job.
+        '''
+        if not apps.is_installed('mviews.jobs'):
+            return err("The _async param needs mviews.jobs in the "
+                       "INSTALLED_APPS.", 501)
+        if getattr(self, '_mv_spec', None) is None:
+            #the job runs the view again by the label of its model
+            return err("The _async param is only supported by modelviews.")
+        #only needs mviews.jobs installed when _async is used
+        from mviews.jobs.utils import queue_job
+        job = queue_job(self, request, *args)
+        try:
+            url = self.rootcall + reverse('mviews-job', args = [job.pk])
+        except NoReverseMatch: #the status view is not routed
+            url = None
+        resp = json_response({"job" : job.pk, 
+                              "status" : job.status, 
+                              "url" : url}, 
+                             status = 202)
+        if url is not None:
+            resp['Location'] = url
+        return resp
+    
+    def _progress(self, rows):
+        '''
+        Report the number of rows written to the job running the request, if
+        the request is a background job.
+        '''
+        job = getattr(getattr(self, 'request', None), 'mviews_job', None)
+        if job is not None:
+            job.add_progress(rows)
+    
+    def _streams_body(self, request):
+        '''
+        Check if the payload should be parsed as it is read (see read_stream)
+        instead of all at once. This is only done for views with 
+        _stream_requests = True, since the data list of a streamed payload can
+        only be iterated over once. Payloads of a POST or PUT to them that are
+        larger than _stream_request_size on the view or the 
+        STREAM_REQUEST_SIZE setting (default 1MB) are streamed, as are 
+        payloads of unknown length. Each entity in the data list of a 
+        streamed payload may be at most STREAM_MAX_VALUE_SIZE characters 
+        (default 1M); a single entity is read whole.
+        '''
+        if not self._stream_requests or request.method not in ('POST', 'PUT'):
+            return False
+        size = getattr(self, 
+                       '_stream_request_size', 
+                       getattr(settings, 'STREAM_REQUEST_SIZE', 1024 * 1024)
+                       )
+        if size is None:
+            return False
+        length = str(request.META.get('CONTENT_LENGTH') or '')
+        return not length.isdigit() or int(length) > size
 
 class BaseModelWrapper():
     """
@@ -199,56 +361,93 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
     When the unique id you want to query by is not the pk of the field, you can
     add the _unique_id = '<field>' on the model, where field is the name of the 
     field you want to query by.
+    
+    To add an aggregate that can be used in the _aggs param, add it to the
+    _aggregates dictionary of the name to a function that takes the field name
+    and returns the aggregate expression.
+    
+    For large tables, page with the _cursor query param instead of _page. The
+    first page is _cursor= (or _after=<value> to start after a value) and each
+    page returns the next_cursor and previous_cursor to send for the pages
+    around it. The entities are ordered by the unique id, or by the field in
+    _cursor_key = '<field>' on the model if set (which should be indexed and
+    unique). The total count is only returned if the _count param is sent.
     """
     
+    #the imports of do_import, along with json
+    parses = ViewWrapper.parses + list(import_types)
+    
+    _aggregates = {
+                  "max" : Max,
+                  "min" : Min,
+                  "avg" : Avg,
+                  "sum" : Sum,
+                  "count" : Count,
+                  "count_distinct" : lambda f: Count(f, distinct=True)
+                  }
+    
+    @property
+    def _mv_spec(self):
+        """
+        The compiled metadata of this modelview. It is shared by every instance
+        of the modelview so it is only worked out once per model.
+        """
+        return get_spec(self.__class__)
+
     @property
     def unique_id(self):
-        if not hasattr(self, '_unique_id'):
-            self._unique_id = self._meta.pk.name       
-        return self._unique_id
+        return self._mv_spec.unique_id
     
     @property
     def url_path(self):
         """
         Get the url path for this modelview.
         """
-        if not hasattr(self, '_url_path'):
-            if settings.ROUTE_AUTO_CREATE == 'app_module_view':
-                p = '/'.join(self.__module__.split('.') )
-            else:
-                p = self.__module__.split('.')[-1]
-            self._url_path = (p +
-                               '/' + 
-                              self.__class__.__name__.lower())
-        return self._url_path
+        return self._mv_spec.url_path
+    
+    @property
+    def _mv_stream(self):
+        """
+        If the GET response should be streamed. Set by the _stream query param,
+        or for every GET by adding _stream = True on the model. Streamed 
+        content types (ndjson and csv) are always streamed.
+        """
+        return ('_stream' in self.params 
+                or getattr(self, '_stream', False)
+                or streamed_content_type(self.accept)[0] is not None)
+    
+    @property
+    def _mv_normalize(self):
+        """
+        If the related objects of an expanded GET should be given once each in
+        the included object instead of nested. Set by the _normalize query 
+        param, or for every GET by adding _normalize = True on the model.
+        """
+        return '_normalize' in self.params or getattr(self, '_normalize', False)
+    
+    @property
+    def _mv_stream_chunk_size(self):
+        """
+        The number of entities read from the database at a time when streaming.
+        Set with _stream_chunk_size on the model or the STREAM_CHUNK_SIZE 
+        setting; defaults to 2000.
+        """
+        return getattr(self, 
+                       '_stream_chunk_size', 
+                       getattr(settings, 'STREAM_CHUNK_SIZE', 2000)
+                       )
     
     @property
     def m2ms(self):
-        if not hasattr(self, "_m2ms"):
-            self._m2ms = [str(m2m[0]).split('.')[-1] 
-                           for m2m in self.__class__._meta.get_m2m_with_model()
-                         ]
-        return self._m2ms
+        return self._mv_spec.m2ms
     
     @property
     def fks(self):
-        if not hasattr(self, "_fks"):
-            self._fks = [str(fk).split('.')[-1] for fk in self.field_names 
-                         if getattr(self.__class__._meta.get_field_by_name(fk)[0], 
-                                    "rel",
-                                     False
-                                     ) 
-                            and not fk.endswith('_id')
-                         ]
-        return self._fks
+        return self._mv_spec.fks
         
     @property
     def field_names(self):
-        if not hasattr(self, "_field_names"):
-            self._field_names = getattr(self, 'public_fields', False)
-            if not self._field_names:
-                self._field_names = self.__class__._meta.get_all_field_names()
-        return self._field_names
+        return self._mv_spec.field_names
      
     def _get_ids_from_args(self, *args):
         '''
@@ -271,28 +470,20 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
         A helper method to get the queryset, to be used for GET, PUT, and maybe
         DELETE. Look at the GET docs to see how this works.
         '''
-        def filter_by_pks(vals):
-            for f in self.field_names:
-                if getattr(self._meta.get_field_by_name(f)[0], 
-                           "primary_key", 
-                           False):
-                    return {f + "__in" : vals}
-            else:
-                return {}
-        
         args = self._get_ids_from_args(*args)
         try:
             filtered = self.__class__.objects.all()
         except AttributeError:
             raise TypeError("This model is abstract and has no actual data "
                             "fields.")
-        if len(args) == 1 and 'id' in self.field_names:
+        spec = self._mv_spec
+        if len(args) == 1 and 'id' in spec.field_set:
             filtered = filtered.filter(id = args[0])
-        elif 'id' in self.field_names and args:
+        elif 'id' in spec.field_set and args:
             filtered = filtered.filter(id__in = args)
         elif args:
-            filtered = filtered.filter(**filter_by_pks(args))            
-        reqDict = {field : self.params[field] for field in self.field_names 
+            filtered = filtered.filter(**{spec.pk_name + "__in" : args})
+        reqDict = {field : self.params[field] for field in spec.field_names 
                                                   if field in self.params
                                                   } 
         return filtered.filter(**reqDict)
@@ -301,46 +492,83 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
         '''
         Expands the queryset if necessary.
         '''
-        pfields = getattr(self, 'public_fields', [])
+        pfields = self._mv_spec.public_fields
         fields = []
         if self.fields or pfields:
             if pfields and not self.fields:
                 fields = pfields
             else:
                 fields = self.fields #already filtered
+            cursor_key = self._mv_spec.cursor_key
+            if ('_cursor' in self.params or '_after' in self.params 
+                    or self._mv_stream) and cursor_key not in fields:
+                #the cursor key is needed to find the next page or chunk
+                fields = list(fields) + [cursor_key]
         if self.sdepth:
             if fields:
                 qs = qs.only(*fields)
-            qs = qs.select_related(*self.fks).prefetch_related()
+            select, prefetch = relation_paths(self.__class__, 
+                                              fields or self.field_names, 
+                                              self.sdepth
+                                              )
+            if select:
+                qs = qs.select_related(*select)
+            if prefetch:
+                qs = qs.prefetch_related(*prefetch)
         elif fields:
             qs = qs.values(*fields)
         else:
             qs = qs.values()
         return qs
     
-    def _get_aggs(self, qs):
+    def _get_aggs(self):
+        '''
+        Get the aggregates asked for in the _aggs param as a dictionary of
+        <agg>_<field> to the aggregate expression. Aggregates that are not
+        supported or are on fields not in the model are skipped.
+        '''
         aggers = {}
-        if '_aggs' not in self.params:
-            return qs
-        if '_aggs_only' in self.params:
-            qs = qs.only()
-        aggs = self.params['_aggs'].split(',')
-  
-        for agg in aggs:
+        for agg in self.params['_aggs'].split(','):
             try:
                 ag, f = agg.split(' ')
             except ValueError:
-                ag, f = agg.split('+')
-            if ag not in ('max', 'min', 'avg') or f not in self.field_names:
+                try:
+                    ag, f = agg.split('+')
+                except ValueError:
+                    continue
+            if ag not in self._aggregates or f not in self._mv_spec.field_set:
                 continue
-            if ag == "max":
-                aggers["max_{}".format(f)] = Max(f)
-            elif ag == "min":
-                aggers["min_{}".format(f)] = Min(f)
-            elif ag == "avg":
-                aggers["avg_{}".format(f)] = Avg(f)
-        qs = qs.annotate(**aggers)
-        return qs
+            aggers["{}_{}".format(ag, f)] = self._aggregates[ag](f)
+        return aggers
+    
+    def do_aggregate(self, request, *args, **kwargs):
+        '''
+        Do the aggregates of the _aggs param on the entities that would be 
+        returned by the GET, in a single query. Only the summary is read from
+        the database, not the entities.
+        
+        If the _group_by param is sent as a csv of fields, the aggregates are
+        done for each group of those fields instead of over all the entities.
+        
+        Look at get for more info on how this is to be used.
+        
+        @return a dictionary of <agg>_<field> to the value, or if grouping, a 
+        list of these dictionaries with the values of the group fields added
+        @raise ValueError: if none of the _aggs are valid
+        '''
+        aggers = self._get_aggs()
+        if not aggers:
+            raise ValueError("None of the _aggs are valid. Send them as "
+                             "<agg>+<field>, where the agg is one of: {}."
+                             .format(', '.join(sorted(self._aggregates))))
+        qs = self._get_qs(*args, **kwargs)
+        group_by = [f for f in self.params.get('_group_by', '').split(',') 
+                    if f in self._mv_spec.field_set]
+        if not group_by:
+            return qs.aggregate(**aggers)
+        #ordering by the group also removes any default ordering, which would
+        #otherwise be added to the GROUP BY
+        return list(qs.values(*group_by).annotate(**aggers).order_by(*group_by))
     
     def do_get(self, request, *args, **kwargs):
         '''
@@ -359,7 +587,6 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
             qs = self._expand(self._get_qs(*args, **kwargs))
         except ValueError as e:
             return err(e, 500)
-        qs = self._get_aggs(qs)
         if 'latest' in self.params:
             qs = [qs[0]]
         return qs
@@ -403,9 +630,54 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
         
             _aggs=avg+<field_name>,min+<field_name>...
             
-        If you want to return only the aggregates and not the rest of the query,
-        set the flag _aggs_only.
+        The aggregates are max, min, avg, sum, count and count_distinct. They
+        are returned in the extra object as aggs. If you want to return only 
+        the aggregates and not the rest of the query, set the flag _aggs_only.
+        To aggregate by group, send the csv of fields to group by as 
+        _group_by; only the aggregates are returned then, one per group:
+        
+            _aggs=count+id,sum+<field_name>&_group_by=<field_name>,...
+            
+        Either way the aggregates are done in one query on the database.
+        
+        To cache the responses of a GET, add _cache_timeout = <seconds> on the
+        model. See mviews.mview.cache for how the cache is kept up to date.
+        Conditional GETs (ETag and Last-Modified) are set up there as well.
+        
+        When expanding, an object that many entities point to (like an owner) 
+        is copied into every one of them. To get each related object only once,
+        add the _normalize flag. The relations will then be the pks of the 
+        related objects, and the objects will be in the "included" object of 
+        the response by <app_label>.<model_name> and then by pk.
+        '''
+        etag, last_modified = validators(self, *args)
+        if not_modified(request, etag, last_modified):
+            return set_validators(HttpResponse(status=304), etag, last_modified)
+        key = cache_key(self, *args)
+        if key is not None:
+            cached = get_response(key)
+            if cached is not None:
+                return set_validators(cached, etag, last_modified)
+        resp = self._get_response(request, *args, **kwargs)
+        if key is not None:
+            set_response(key, resp, self._cache_timeout)
+        return set_validators(resp, etag, last_modified)
+    
+    def _get_response(self, request, *args, **kwargs):
         '''
+        Make the response of the GET. See get for more info.
+        '''
+        if '_aggs' in self.params:
+            try:
+                aggs = self.do_aggregate(request, *args, **kwargs)
+            except ValueError as e:
+                return err(e)
+            if '_aggs_only' in self.params or '_group_by' in self.params:
+                return other_response(dumps({"aggs" : aggs}))
+            return response(self, 
+                            self.do_get(request, *args, **kwargs), 
+                            extra={"aggs" : aggs}
+                            )
         return response(self, self.do_get(request, *args, **kwargs))
     
     def do_post(self, request, *args, **kwargs):
@@ -428,23 +700,84 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
                     if m2m in self.data and type(self.data.get(m2m)) == list:
                         getattr(bp, m2m).add(*self.data[m2m])
             self.sdepth = 1
+            invalidate(self.__class__)
+            if self.params.get('_pks') == '1':
+                return [bp.pk]
             return (bp,)
         else:
-            to_create = []
-            if user_field_name:
-                for ud in self.data["data"]:
-                    ud[user_field_name] = request.user
+            return self._bulk_create(request, self.data["data"])
+    
+    def _bulk_create(self, request, items):
+        '''
+        Create the entities of a multi POST, _mv_post_batch_size at a time. Each
+        batch is one bulk insert, plus one bulk insert into the through table
+        of each m2m field sent with the batch. On PostgreSQL and SQLite (3.35
+        or later) the bulk insert returns the ids of the entities (see 
+        _bulk_insert). If the database cannot return them and the ids are 
+        needed (for m2m fields or for an expanded response), the entities of 
+        the batch are saved one at a time instead.
+        
+        If a depth was asked for, the created entities are read back with one
+        query by their ids, expanded to the depth.
+        
+        If the _pks=1 param is sent, only the pks of the created entities are
+        kept and returned so that memory does not grow with the entities 
+        (which is what to send with a streamed payload, see read_stream).
+        
+        @param request: the request of the POST
+        @param items: an iterable of the entities to create (see post)
+        @return a list-like structure of model objects that can be serialized,
+            or the list of pks if _pks=1 was sent
+        '''
+        user_field_name = getattr(self, 'register_user_on_create', '')
+        db = router.db_for_write(self.__class__)
+        connection = connections[db]
+        #bulk_create cannot insert into the parent tables of the model
+        returns_ids = (_supports_returning(connection) 
+                       and not self._meta.parents)
+        pks_only = self.params.get('_pks') == '1'
+        created = []
+        with transaction.atomic(using=db):
+            for batch in _batches(items, self._mv_post_batch_size):
+                to_create = []
+                m2m_items = []
+                for ud in batch:
+                    if "entity" in ud: #the entity has many2many fields with it
+                        m2m_items.append(ud)
+                        ud = ud["entity"]
+                    else:
+                        m2m_items.append({})
+                    if user_field_name:
+                        ud[user_field_name] = request.user
                     to_create.append(self.__class__(**ud))
-            else:
-                to_create = [self.__class__(**ud) for ud in self.data["data"]]
-            if self.sdepth:
-                for c in to_create:
-                    c.save()
-                return to_create
-            else:
-                created = self.__class__.objects.bulk_create(to_create)
-                self.sdepth = 1
-                return created   
+                has_m2ms = any(m2m in d for d in m2m_items for m2m in self.m2ms)
+                if returns_ids:
+                    self._bulk_insert(to_create, connection)
+                elif self.sdepth or has_m2ms or pks_only:
+                    #the ids are needed but the database will not give them
+                    for c in to_create:
+                        c.save()
+                else:
+                    self.__class__.objects.bulk_create(to_create)
+                if has_m2ms:
+                    adds, removes = {}, {}
+                    for c, d in zip(to_create, m2m_items):
+                        self._m2m_changes(d, [c.pk], adds, removes)
+                    self._write_m2ms(adds, removes)
+                if pks_only:
+                    created += [c.pk for c in to_create]
+                else:
+                    created += to_create
+                self._progress(len(to_create))
+        invalidate(self.__class__)
+        if pks_only:
+            return created
+        if self.sdepth:
+            return self._expand(self.__class__.objects.filter(
+                                        pk__in = [c.pk for c in created]
+                                                            ).order_by('pk'))
+        self.sdepth = 1
+        return created
     
     def post(self, request, *args, **kwargs):
         '''
@@ -474,12 +807,17 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
         }
         
         This method will allow for an efficient and fast means of creating
-        all of the entities in one batch save. However, there may be times
-        when you want to save m2m fields with the data, or perhaps you
-        want a return value of the newly created entity with the entity's id
-        in the database. Currently the above method does not return the new
-        entity's id. To do this, send data as follows while adding the
-        '_expand' query param:
+        all of the entities in batch saves of _mv_post_batch_size entities each
+        (override per request with the _batch_size query param). The 
+        entities are returned with their ids if the database can return the
+        ids of a bulk insert (PostgreSQL and SQLite 3.35 or later). Adding the
+        _depth or _expand query param returns the created entities expanded to
+        that depth, read back with one query by their ids (if the database 
+        cannot return the ids the entities are saved one at a time to get 
+        them).
+        
+        There may also be times when you want to save m2m fields with the 
+        data. To do this, send data as follows:
         
         {
             "data" : [
@@ -495,28 +833,489 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
         }
         
         These will return the data that has been created as if it were a GET.
+        
+        The m2m fields of each batch of entities are written together with a
+        bulk insert into the through table of each m2m field. If the database
+        can return the ids of a bulk insert, the entities are bulk created as 
+        well; otherwise they are saved one at a time to get their ids.
+        
+        To insert the entities that do not exist and update those that do 
+        (ie. an upsert), send the list of entities with the _upsert=<field>
+        query param, where field is a unique field of the model that is in 
+        every entity. Instead of the entities, the response is the pks of the
+        entities in the order they were sent:
+        
+        {
+            "count" : <number of entities>,
+            "data" : [<pk>, ...]
+        }
+        
+        Many2many fields are not supported with _upsert.
+        
+        To get the pks of the created entities in the order they were sent 
+        instead of the entities (as with _upsert), send the _pks=1 param.
+        
+        Large payloads (see _streams_body, which models opt into with 
+        _stream_requests = True) are parsed as they are read and the
+        entities are created as each batch is parsed, so that the payload is
+        never held in memory all at once. Send _pks=1 with them so that the 
+        created entities are not held in memory for the response either.
+        
+        To import rows, POST them as application/x-ndjson (one json object 
+        per line) or text/csv (with a header row of field names) instead of
+        json. See do_import.
         '''
-        return response(self, self.do_post(request, *args, **kwargs))   
+        if self._mv_import_type:
+            try:
+                counts = self.do_import(request, *args, **kwargs)
+            except (KeyError, ValueError, TypeError, DatabaseError) as e:
+                return err(e)
+            return other_response(dumps(counts))
+        try:
+            if '_upsert' in self.params:
+                created = self.do_upsert(request, *args, **kwargs)
+            else:
+                created = self.do_post(request, *args, **kwargs)
+        except (KeyError, ValueError, TypeError) as e:
+            return err(e)
+        if '_upsert' in self.params or self.params.get('_pks') == '1':
+            return other_response(dumps({"count" : len(created), 
+                                         "data" : created}))
+        return response(self, created)   
+    
+    @property
+    def _mv_post_batch_size(self):
+        """
+        The number of entities inserted by each statement of a bulk POST. Set
+        with the _batch_size query param, _post_batch_size on the model or the
+        POST_BATCH_SIZE setting; defaults to 500.
+        """
+        size = self.params.get('_batch_size', '')
+        if size.isdigit() and int(size) > 0:
+            return int(size)
+        return getattr(self, 
+                       '_post_batch_size', 
+                       getattr(settings, 'POST_BATCH_SIZE', 500)
+                       )
+    
+    def do_upsert(self, request, *args, **kwargs):
+        '''
+        Insert or update the list of entities of the POST by the unique field
+        in the _upsert param, in batches of _mv_post_batch_size. On 
+        PostgreSQL (9.5 or later) and SQLite (3.35 or later) each batch is 
+        written with INSERT ... ON CONFLICT DO UPDATE statements (see 
+        _upsert_on_conflict). On other databases (and older versions) the 
+        existing entities are found with one query, 
+        then the new ones are bulk created and the others are updated as a 
+        multi PUT would (see _bulk_update).
+        
+        If an entity is in the list more than once, the last one wins. The 
+        fields in _no_update_fields are only set on insert. Streamed payloads
+        are upserted as each batch is parsed.
+        
+        See post for more info on how this is used.
+        
+        @return the list of pks of the entities in the order they were sent
+        '''
+        key = self.params['_upsert']
+        field = self._upsert_field(key)
+        if isinstance(self.data["data"], dict):
+            raise TypeError("Must send a list of entities to upsert.")
+        user_field_name = getattr(self, 'register_user_on_create', '')
+        db = router.db_for_write(self.__class__)
+        connection = connections[db]
+        upserted = []
+        with transaction.atomic(using=db):
+            for batch in _batches(self.data["data"], self._mv_post_batch_size):
+                items = OrderedDict()
+                for ud in batch:
+                    if key not in ud:
+                        raise KeyError("Upsert field {} was not found in object "
+                                       "number {}".format(key, len(upserted) + 
+                                                               len(items)))
+                    if user_field_name:
+                        ud[user_field_name] = request.user
+                    #a row can only be upserted once per statement
+                    value = _key_value(field, ud[key])
+                    items.pop(value, None)
+                    items[value] = ud
+                if _supports_on_conflict(connection):
+                    pks = self._upsert_on_conflict(list(items.values()), 
+                                                   field, 
+                                                   connection)
+                else:
+                    pks = self._upsert_by_lookup(list(items.values()), 
+                                                 key, 
+                                                 field)
+                upserted += [pks[_key_value(field, ud[key])] for ud in batch]
+                self._progress(len(batch))
+        invalidate(self.__class__)
+        return upserted
+    
+    def _upsert_field(self, key):
+        '''
+        Get the field to upsert on, which must be unique.
+        '''
+        if key not in self._mv_spec.field_set:
+            raise ValueError("Cannot upsert on {} since it is not a field."
+                             .format(key))
+        field = self._meta.get_field(key)
+        if not (field.unique or field.primary_key):
+            raise ValueError("Cannot upsert on {} since it is not unique."
+                             .format(key))
+        return field
+    
+    def do_import(self, request, *args, **kwargs):
+        '''
+        Import the rows of an application/x-ndjson or text/csv payload. The 
+        rows are read and validated against the fields of the model one at a
+        time and written _mv_post_batch_size at a time with one bulk insert per 
+        batch. With the _upsert=<field> query param, the rows are upserted 
+        by the unique field instead (see do_upsert) and the rows that already
+        existed are counted as updated.
+        
+        Rows that cannot be parsed, that have fields not on the model, that 
+        are missing a required field or that have values that are not valid 
+        for their field (as checked by the clean of the field) are rejected 
+        and the rest are written. The first _import_max_errors (default 100) errors 
+        are returned with their line numbers.
+        
+        The import is done in one transaction, so if writing any batch fails
+        nothing is written. With the _commit=batch query param, each batch is
+        committed on its own instead; a batch that fails is rolled back, its
+        rows are counted as rejected and the import goes on with the next.
+        
+        The response looks like:
+        
+        {
+            "inserted" : <number of rows inserted>,
+            "updated" : <number of rows updated>,
+            "rejected" : <number of rows rejected>,
+            "errors" : [
+                {
+                    "line" : <line number of the row>,
+                    "err" : <reason the row was rejected>
+                }, ...
+            ]
+        }
+        
+        @return the dictionary of the counts and errors
+        '''
+        key = self.params.get('_upsert')
+        field = self._upsert_field(key) if key else None
+        per_batch = self.params.get('_commit') == 'batch'
+        max_errors = getattr(self, '_import_max_errors', 100)
+        user_field_name = getattr(self, 'register_user_on_create', '')
+        is_csv = self._mv_import_type == 'text/csv'
+        counts = {"inserted" : 0, "updated" : 0, "rejected" : 0}
+        errors = []
+        
+        def reject(line, e):
+            counts["rejected"] += 1
+            if len(errors) < max_errors:
+                errors.append({"line" : line, "err" : "{}".format(e)})
+        
+        def valid_rows():
+            for line, row in read_rows(request, self._mv_import_type):
+                if isinstance(row, Exception):
+                    reject(line, row)
+                    continue
+                try:
+                    row = clean_row(self._mv_spec, 
+                                    row, 
+                                    is_csv, 
+                                    [user_field_name] if user_field_name else [])
+                except ValueError as e:
+                    reject(line, e)
+                    continue
+                if field is not None and field.attname not in row:
+                    reject(line, "Upsert field {} was not found.".format(key))
+                    continue
+                if user_field_name:
+                    row[user_field_name] = request.user
+                yield line, row
+        
+        db = router.db_for_write(self.__class__)
+        batches = _batches(valid_rows(), self._mv_post_batch_size)
+        if per_batch:
+            for batch in batches:
+                try:
+                    with transaction.atomic(using=db):
+                        self._import_batch(batch, field, counts)
+                except DatabaseError as e:
+                    for line, _ in batch:
+                        reject(line, e)
+        else:
+            with transaction.atomic(using=db):
+                for batch in batches:
+                    self._import_batch(batch, field, counts)
+        invalidate(self.__class__)
+        counts["errors"] = errors
+        return counts
+    
+    def _import_batch(self, batch, field, counts):
+        '''
+        Write a batch of the rows of an import, adding to the counts.
+        
+        @param batch: the list of line numbers and cleaned rows
+        @param field: the field to upsert on, or None to insert
+        @param counts: the counts of the import
+        '''
+        if field is None:
+            self.__class__.objects.bulk_create([self.__class__(**row) 
+                                                for _, row in batch])
+            counts["inserted"] += len(batch)
+            self._progress(len(batch))
+            return
+        items = OrderedDict()
+        for _, row in batch:
+            #a row can only be upserted once per statement
+            value = _key_value(field, row[field.attname])
+            items.pop(value, None)
+            items[value] = row
+        existing = self.__class__.objects.filter(
+                                    **{field.attname + '__in' : list(items)}
+                                                 ).count()
+        connection = connections[router.db_for_write(self.__class__)]
+        if _supports_on_conflict(connection):
+            self._upsert_on_conflict(list(items.values()), field, connection)
+        else:
+            self._upsert_by_lookup(list(items.values()), field.attname, field)
+        #the rows repeated in the batch update the row before them
+        counts["updated"] += existing + len(batch) - len(items)
+        counts["inserted"] += len(items) - existing
+        self._progress(len(batch))
+    
+    def _upsert_no_update_fields(self):
+        '''
+        The fields only set when an upserted entity is inserted: the 
+        _no_update_fields and the register_user_on_create field.
+        '''
+        fields = list(getattr(self, '_no_update_fields', None) or [])
+        user_field_name = getattr(self, 'register_user_on_create', '')
+        if user_field_name:
+            fields.append(user_field_name)
+        return fields
+    
+    def _upsert_on_conflict(self, items, key_field, connection):
+        '''
+        Upsert the items with INSERT ... ON CONFLICT (<key>) DO UPDATE. Items 
+        that set the same fields are upserted together so that a field not 
+        sent is never overwritten by its default, in as many statements as 
+        the database needs to stay under its limit of query params.
+        
+        @return a dictionary of the key value (see _key_value) to the pk
+        '''
+        qn = connection.ops.quote_name
+        opts = self._meta
+        no_update = set(self._upsert_no_update_fields())
+        #an auto pk is only inserted if it is the key, which every item has
+        columns = [f for f in opts.concrete_fields 
+                   if f is key_field
+                   or not (f.primary_key and isinstance(f, m.AutoField))]
+        groups = OrderedDict()
+        for ud in items:
+            groups.setdefault(frozenset(ud), []).append(ud)
+        pks = {}
+        for sent, group in groups.items():
+            updates = [f for f in columns 
+                       if (f.name in sent or f.attname in sent) 
+                       and f.name not in no_update
+                       and f.name != key_field.name
+                       and not f.primary_key]
+            #updating the key to itself still returns the pk of the row
+            updates = updates or [key_field]
+            conflict = ('ON CONFLICT ({}) DO UPDATE SET {}'
+                        .format(qn(key_field.column),
+                                ', '.join('{0} = EXCLUDED.{0}'
+                                          .format(qn(f.column)) 
+                                          for f in updates)))
+            for value, pk in self._insert_returning(
+                                        [self.__class__(**ud) for ud in group],
+                                        columns,
+                                        [key_field, opts.pk],
+                                        connection,
+                                        conflict):
+                pks[key_field.to_python(value)] = pk
+        return pks
+    
+    def _insert_returning(self, objs, columns, returning, connection, 
+                          conflict=''):
+        '''
+        Insert the objects with INSERT ... RETURNING, in as many statements as
+        the database needs to stay under its limit of query params. The rows
+        are returned in the order the objects were inserted.
+        
+        @param objs: the model objects to insert
+        @param columns: the concrete fields to insert
+        @param returning: the fields to return for each row
+        @param connection: the connection of the database to insert into
+        @param conflict: the ON CONFLICT clause of the insert, if any
+        @return the list of the returned rows
+        '''
+        qn = connection.ops.quote_name
+        row = '({})'.format(', '.join(['%s'] * len(columns)))
+        size = max(connection.ops.bulk_batch_size(columns, objs), 1)
+        returned = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(objs), size):
+                batch = objs[start:start + size]
+                params = []
+                for obj in batch:
+                    params += [f.get_db_prep_save(f.pre_save(obj, True), 
+                                                  connection)
+                               for f in columns]
+                sql = ('INSERT INTO {} ({}) VALUES {} {} RETURNING {}'
+                       .format(qn(self._meta.db_table),
+                               ', '.join(qn(f.column) for f in columns),
+                               ', '.join([row] * len(batch)),
+                               conflict,
+                               ', '.join(qn(f.column) for f in returning)))
+                cursor.execute(sql, params)
+                returned += cursor.fetchall()
+        return returned
+    
+    def _bulk_insert(self, objs, connection):
+        '''
+        Insert the objects as bulk_create would, but with INSERT ... RETURNING
+        (see _insert_returning) so that the pks of the new rows are set on the
+        objects. The objects with a pk already are inserted with it.
+        
+        @param objs: the model objects to insert
+        @param connection: the connection of the database to insert into
+        '''
+        opts = self._meta
+        auto = isinstance(opts.pk, m.AutoField)
+        for has_pk in (True, False):
+            batch = [o for o in objs if (o.pk is not None) is has_pk]
+            if not batch:
+                continue
+            columns = [f for f in opts.concrete_fields 
+                       if has_pk or not (f.primary_key and auto)]
+            rows = self._insert_returning(batch, columns, [opts.pk], connection)
+            for obj, (pk,) in zip(batch, rows):
+                obj.pk = pk
+                obj._state.adding = False
+                obj._state.db = connection.alias
+    
+    def _upsert_by_lookup(self, items, key, key_field):
+        '''
+        Upsert the items by finding which already exist with one query, then
+        bulk creating the new ones and updating the rest. Used for databases
+        without ON CONFLICT.
+        
+        @param items: the items to upsert
+        @param key: the name the key field is sent by in the items
+        @param key_field: the unique field to upsert on
+        @return a dictionary of the key value (see _key_value) to the pk
+        '''
+        pks = {key_field.to_python(value) : pk for value, pk in 
+               self.__class__.objects.filter(
+                                    **{key + '__in' : [ud[key] for ud in items]}
+                                             ).values_list(key, 'pk')}
+        new = [ud for ud in items 
+               if _key_value(key_field, ud[key]) not in pks]
+        self._bulk_update([{"data" : ud} for ud in items 
+                           if _key_value(key_field, ud[key]) in pks],
+                          key, 
+                          self._upsert_no_update_fields())
+        created = self.__class__.objects.bulk_create(
+                                            [self.__class__(**ud) for ud in new])
+        if any(c.pk is None for c in created):
+            #the database did not give the ids of the bulk insert
+            created = self.__class__.objects.filter(
+                                    **{key + '__in' : [ud[key] for ud in new]})
+        for c in created:
+            pks[_key_value(key_field, getattr(c, key))] = c.pk
+        return pks
     
     def _update_entity(self, qs, data, to_remove):
         """
         Updates the entity
         """
         if to_remove is not None:
-            to_remove += ['id']
+            to_remove = to_remove + ['id']
             for tr in to_remove:
-                if tr in self.data["data"]:
-                    del self.data["data"][tr]
-        qs.update(**data['data'])
-        if len(self.data) > 1: #there are many2many fields to add and delete, lets add them
-            for m2m in self.m2ms:
-                if m2m in self.data:
-                    if ("add" in self.data[m2m] and 
-                            type(self.data[m2m]['add']) == list):
-                        getattr(qs[0], m2m).add(*self.data[m2m]['add'])
-                    if ("delete" in self.data[m2m] and 
-                            type(self.data[m2m]['delete']) == list):
-                        getattr(qs[0], m2m).remove(*self.data[m2m]['delete'])
+                if tr in data["data"]:
+                    del data["data"][tr]
+        pks = None
+        if len(data) > 1: #there are many2many fields to add and delete
+            #found before the update, which can change what the qs matches
+            pks = list(qs.values_list('pk', flat=True))
+        if data['data']:
+            qs.update(**data['data'])
+        if pks is not None:
+            adds, removes = {}, {}
+            self._m2m_changes(data, pks, adds, removes)
+            self._write_m2ms(adds, removes)
+    
+    def _m2m_changes(self, data, pks, adds, removes):
+        '''
+        Collect the many2many changes of an item of a write for the entities
+        with the pks. The changes of a many2many field are either a list of 
+        ids to add (as in a POST) or a dictionary with the lists of ids to 
+        "add" and to "delete" (as in a PUT).
+        
+        @param data: the item with the many2many fields
+        @param pks: the pks of the entities the item is for
+        @param adds: the dictionary of many2many field to the set of 
+                    (pk, related pk) pairs to add, that will be added to
+        @param removes: the same as adds for the pairs to remove
+        '''
+        for m2m in self.m2ms:
+            change = data.get(m2m)
+            if type(change) == list:
+                change = {"add" : change}
+            elif not isinstance(change, dict):
+                continue
+            for key, pairs in (("add", adds), ("delete", removes)):
+                if type(change.get(key)) == list:
+                    pairs.setdefault(m2m, set()).update((pk, i) 
+                                                        for pk in pks 
+                                                        for i in change[key]
+                                                        )
+    
+    def _write_m2ms(self, adds, removes):
+        '''
+        Write the many2many changes collected by _m2m_changes straight to the
+        through tables. Whatever the number of entities changed, this is at 
+        most three queries for each many2many field: one to find the pairs to 
+        add that already exist, one bulk insert and one delete. Pairs that are
+        both added and removed are removed.
+        
+        Since this skips the related managers, the m2m_changed signal is not
+        sent.
+        '''
+        for m2m in set(adds) | set(removes):
+            field = self._meta.get_field(m2m)
+            through = field.rel.through
+            if not through._meta.auto_created:
+                raise TypeError("Cannot set values on many2many field {} "
+                                "since it has an intermediary model."
+                                .format(m2m))
+            src = field.m2m_field_name()
+            tgt = field.m2m_reverse_field_name()
+            pairs = adds.get(m2m)
+            if pairs:
+                existing = set(through.objects.filter(
+                                        **{src + '__in' : {s for s, _ in pairs},
+                                           tgt + '__in' : {t for _, t in pairs}}
+                                                      ).values_list(src, tgt))
+                src_att = through._meta.get_field(src).attname
+                tgt_att = through._meta.get_field(tgt).attname
+                through.objects.bulk_create([through(**{src_att : s, 
+                                                        tgt_att : t})
+                                             for s, t in pairs - existing])
+            pairs = removes.get(m2m)
+            if pairs:
+                by_src = {}
+                for s, t in pairs:
+                    by_src.setdefault(s, []).append(t)
+                match = Q()
+                for s, ts in by_src.items():
+                    match |= Q(**{src : s, tgt + '__in' : ts})
+                through.objects.filter(match).delete()
+            invalidate(field.rel.to)
     
     def do_put(self, request, *args, **kwargs):
         '''
@@ -526,25 +1325,130 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
         See put for how this method is used.
         
         To prevent certain fields from being updated, add them to the 
-        _no_update_fields list. The id field is added by default. To prevent
-        all data from being updated, set _no_update_fields to None.
+        _no_update_fields list. The id field is added by default. If 
+        _no_update_fields is None, no fields are removed (not even the id).
         '''
         to_remove = getattr(self, '_no_update_fields', []) 
-        if not isinstance(self.data['data'], list):
+        if isinstance(self.data['data'], dict):
             qs = self._get_qs(*args, **kwargs)
             self._update_entity(qs, self.data, to_remove)
         else:
             qslookup = self.data.get('lookup', self.unique_id)
             with transaction.atomic():
-                for i, d in enumerate(self.data['data']):
-                    if qslookup in d["data"]:
-                        qs = self.__class__.objects.filter(
-                                         **{qslookup:d['data'][qslookup]}
-                                                         )
-                        self._update_entity(qs, d, to_remove)
-                    else:
-                        raise KeyError("Lookup {} was not found in object "
-                                       "number {}".format(qslookup, i))
+                for batch in _batches(self.data['data'], 
+                                      self._mv_put_batch_size):
+                    self._bulk_update(batch, qslookup, to_remove)
+                    self._bulk_update_m2ms(batch, qslookup)
+                    self._progress(len(batch))
+                if self.data.get('lookup', qslookup) != qslookup:
+                    #the keys after the data of a streamed payload are only 
+                    #read once the data has been
+                    raise ValueError("The lookup must come before the data "
+                                     "when the payload is streamed.")
+        invalidate(self.__class__)
+    
+    @property
+    def _mv_put_batch_size(self):
+        """
+        The number of entities updated by each statement of a multi update.
+        Set with _put_batch_size on the model or the PUT_BATCH_SIZE setting;
+        defaults to 500.
+        """
+        return getattr(self, 
+                       '_put_batch_size', 
+                       getattr(settings, 'PUT_BATCH_SIZE', 500)
+                       )
+    
+    def _bulk_update_m2ms(self, items, lookup):
+        '''
+        Make the many2many changes of the items of a multi update. The pks of
+        all the entities are found with one query and the changes of every 
+        item are written together (see _write_m2ms).
+        
+        @param items: the list of items of the multi update
+        @param lookup: the field to find the entities to update by
+        '''
+        items = [d for d in items if any(m2m in d for m2m in self.m2ms)]
+        if not items:
+            return
+        lookup_field = self._meta.get_field(lookup)
+        #the lookup values from the json may not be the same type (see 
+        #_bulk_update)
+        values = [_key_value(lookup_field, d["data"][lookup]) for d in items]
+        pks = {}
+        for value, pk in self.__class__.objects.filter(
+                                            **{lookup + '__in' : set(values)}
+                                                       ).values_list(lookup, 
+                                                                     'pk'):
+            pks.setdefault(lookup_field.to_python(value), []).append(pk)
+        adds, removes = {}, {}
+        for d, value in zip(items, values):
+            self._m2m_changes(d, pks.get(value, []), adds, removes)
+        self._write_m2ms(adds, removes)
+    
+    def _bulk_update(self, items, lookup, to_remove):
+        '''
+        Update the data of each of the items of a multi update. Instead of an
+        update statement for each item, the items that change the same fields
+        are updated together, _mv_put_batch_size at a time (or fewer if the 
+        database limits the params of a statement), with one statement of the
+        form:
+        
+            UPDATE ... SET <field> = CASE WHEN <lookup> = <value> THEN ... END
+            WHERE <lookup> IN (<values>)
+        
+        If the same lookup value is in more than one item, the later item wins
+        for each field it sets (as if they were updated one after the other).
+        The lookup values are compared as the python values of the lookup 
+        field, so 1 and "1" are the same entity. This should be called inside
+        a transaction.
+        
+        @param items: the list of items of the multi update
+        @param lookup: the field to find the entities to update by
+        @param to_remove: the fields not to update (with the id), or None to
+            not remove any
+        '''
+        merged = OrderedDict()
+        if to_remove is None:
+            skip = {lookup}
+        else:
+            skip = {lookup, 'id'} | set(to_remove)
+        lookup_field = self._meta.get_field(lookup)
+        for i, d in enumerate(items):
+            if lookup not in d["data"]:
+                raise KeyError("Lookup {} was not found in object "
+                               "number {}".format(lookup, i))
+            value = _key_value(lookup_field, d["data"][lookup])
+            merged.setdefault(value, {}).update((f, v) 
+                                                for f, v in d["data"].items() 
+                                                if f not in skip)
+        groups = OrderedDict()
+        for value, data in merged.items():
+            if data:
+                groups.setdefault(tuple(sorted(data)), []).append((value, data))
+        connection = connections[router.db_for_write(self.__class__)]
+        for fields, group in groups.items():
+            #each row has a param for the lookup in the IN, and one for the 
+            #lookup and one for the value in the CASE of each field
+            params = [lookup_field] + [self._meta.get_field(f) 
+                                       for f in fields] * 2
+            size = min(self._mv_put_batch_size, 
+                       max(connection.ops.bulk_batch_size(params, group), 1))
+            for start in range(0, len(group), size):
+                batch = group[start:start + size]
+                updates = {}
+                for f in fields:
+                    output = self._meta.get_field(f)
+                    updates[f] = Case(*[When(**{lookup : value, 
+                                                'then' : Value(data[f], 
+                                                               output_field=output)
+                                                })
+                                        for value, data in batch],
+                                      default=F(f),
+                                      output_field=output)
+                self.__class__.objects.filter(
+                                 **{lookup + '__in' : [v for v, _ in batch]}
+                                              ).update(**updates)
     
     def put(self, request, *args, **kwargs):
         '''
@@ -592,10 +1496,16 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
         update all values returned in the qs. If you do not provide a lookup, it
         will assume the pk and will search for the pk in the body of the data.
         If the pk is not found, then an error is thrown and none are updated.
+        
+        The items of a multi update that change the same fields are updated
+        together in batches (see _bulk_update), so a large multi update does 
+        not need a statement per item. It is still all or nothing. Large 
+        payloads are parsed as they are read, one batch at a time (see post);
+        the lookup must then come before the data in the payload.
         '''
         try:
             self.do_put(request, *args, **kwargs)
-        except (KeyError, FieldDoesNotExist, TypeError) as e:
+        except (KeyError, FieldDoesNotExist, TypeError, ValueError) as e:
             return err(e)
         return other_response()
     
@@ -607,6 +1517,10 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
         Filtering is done in the same way as GET.
         
         Will return status 204 if successful.
+        
+        Large POSTs, PUTs and DELETEs can be run in the background by adding 
+        the _async=1 query param. The request is answered with a 202 and the 
+        url of the job to get its status and result from (see mviews.jobs).
         '''
         args = self._get_ids_from_args(*args)
         if not args:
@@ -616,9 +1530,66 @@ class BaseModelAsView(BaseModelWrapper, ViewWrapper):
             deletes = self._get_qs(*args, **kwargs)   
         except TypeError as e:
             return err(e)
-        deletes.delete()
+        self.do_delete(deletes)
         return other_response()
     
+    @property
+    def _mv_delete_batch_size(self):
+        """
+        The number of entities deleted at a time by a bulk delete. Set with 
+        _delete_batch_size on the model or the DELETE_BATCH_SIZE setting; 
+        defaults to 2000. If set to None, an entity delete that can be done 
+        in SQL alone is done with one statement.
+        """
+        return getattr(self, 
+                       '_delete_batch_size', 
+                       getattr(settings, 'DELETE_BATCH_SIZE', 2000)
+                       )
+    
+    def _deletes_in_sql(self, deletes, db):
+        '''
+        Check if the entities of the queryset can be deleted with a DELETE 
+        statement alone, without being loaded: the delete does not cascade to
+        other tables (see ViewSpec) and the ORM's Collector finds nothing else
+        that needs them (ie. delete signal receivers, which includes those of
+        the cache for models whose responses are cached).
+        '''
+        if not self._mv_spec.fast_delete:
+            return False
+        return Collector(using=db).can_fast_delete(deletes)
+    
+    def do_delete(self, deletes):
+        '''
+        Delete the entities of the queryset in one transaction, without ever
+        loading more than _mv_delete_batch_size of them.
+        
+        The entities are deleted by the ORM's queryset delete. If the delete 
+        can be done in SQL alone (see _deletes_in_sql), it deletes them 
+        without loading them; then they are deleted by DELETE statements of 
+        _mv_delete_batch_size pks each (or one statement for all of them if 
+        _mv_delete_batch_size is None). Otherwise they are deleted a batch 
+        at a time, so related entities are collected and the signals are 
+        sent for each batch only.
+        
+        @param deletes: the queryset of the entities to delete
+        '''
+        db = router.db_for_write(self.__class__)
+        size = self._mv_delete_batch_size
+        in_sql = self._deletes_in_sql(deletes, db)
+        with transaction.atomic(using=db):
+            if in_sql and size is None:
+                deletes.delete()
+            else:
+                deletes = deletes.order_by('pk')
+                while True:
+                    pks = list(deletes.values_list('pk', flat=True)
+                                                        [:size or 2000])
+                    if not pks:
+                        break
+                    self.__class__.objects.filter(pk__in = pks).delete()
+                    self._progress(len(pks))
+        invalidate(self.__class__)
+    
     def head(self, request, *args, **kwargs):
         '''
         Return just the headers of a call.
@@ -0,0 +1,162 @@
+'''
+The compiled metadata for a modelview. Everything a modelview needs to know
+about its model in order to answer a request (field names, which of those are
+foreign keys or many-to-many fields, the unique id, the url path, etc.) is
+worked out once per model class and then shared read-only by every instance
+of the view and by the serializer.
+
+Since as_view creates a new instance of the modelview for every request, these
+used to be rebuilt on every call. Use get_spec to get the spec for a model.
+'''
+
+from django.conf import settings
+from django.db.models import AutoField
+from django.db.models import DO_NOTHING
+from django.db.models.fields.files import FileField
+from django.db.models.signals import class_prepared
+
+
+#the kinds a field name can resolve to on a model
+FIELD = 'field'
+FILE = 'file'
+FK = 'fk'
+M2M = 'm2m'
+REL = 'rel'
+
+_specs = {}
+
+
+class ViewSpec(object):
+    '''
+    The compiled, read-only description of a model used by the modelviews and
+    the serializer. Do not create this directly, use get_spec instead.
+    '''
+
+    def __init__(self, model):
+        opts = model._meta
+        self.model = model
+        self.label = '{}.{}'.format(opts.app_label, opts.model_name)
+        self.all_field_names = tuple(opts.get_all_field_names())
+        self.public_fields = tuple(getattr(model, 'public_fields', None) or ())
+        self.field_names = self.public_fields or self.all_field_names
+        self.field_set = frozenset(self.field_names)
+        self.kinds = {}
+        self.related_models = {}
+        #the attribute to get the field from an instance by (for reverse 
+        #relations this is not the field name, ie. <name>_set)
+        self.accessors = {}
+        #the reverse relations that are one-to-one, and so are an object (or 
+        #a DoesNotExist) instead of a manager
+        self.o2o_rels = set()
+        for name in self.all_field_names:
+            field, _, direct, m2m = opts.get_field_by_name(name)
+            self.accessors[name] = name
+            if not direct:
+                self.kinds[name] = REL
+                self.related_models[name] = field.related_model
+                self.accessors[name] = field.get_accessor_name()
+                if field.one_to_one:
+                    self.o2o_rels.add(name)
+            elif m2m:
+                self.kinds[name] = M2M
+                self.related_models[name] = field.rel.to
+            elif getattr(field, 'rel', None) and name == field.name:
+                self.kinds[name] = FK
+                self.related_models[name] = field.rel.to
+            elif isinstance(field, FileField):
+                self.kinds[name] = FILE
+            else:
+                self.kinds[name] = FIELD
+        self.fks = tuple(f for f in self.field_names if self.kinds[f] == FK)
+        self.m2ms = tuple(f.name for f, _ in opts.get_m2m_with_model())
+        self.o2o_rels = frozenset(self.o2o_rels)
+        #the concrete fields by the names they can be written with, both the
+        #field name and the attname (ie. <fk>_id)
+        self.columns = {}
+        for field in opts.concrete_fields:
+            self.columns[field.name] = self.columns[field.attname] = field
+        #the concrete fields that an entity cannot be inserted without
+        self.required = tuple(f for f in opts.concrete_fields 
+                              if self._is_required(f))
+        self.fast_delete = self._can_fast_delete(opts)
+        self.pk_name = opts.pk.name
+        self.unique_id = getattr(model, '_unique_id', self.pk_name)
+        self.cursor_key = getattr(model, '_cursor_key', self.unique_id)
+        self.url_path = self._make_url_path(model)
+
+    @staticmethod
+    def _is_required(field):
+        '''
+        Check if a value must be given for the field to insert an entity, ie.
+        it is not nullable and it is not given a value otherwise (by being an
+        auto field, by a default, by auto_now or as the empty string).
+        '''
+        if field.null or field.has_default() or isinstance(field, AutoField):
+            return False
+        if getattr(field, 'auto_now', False) or getattr(field, 
+                                                        'auto_now_add', 
+                                                        False):
+            return False
+        return not field.empty_strings_allowed
+
+    @staticmethod
+    def _can_fast_delete(opts):
+        '''
+        Check if the rows of the model can be deleted without touching the 
+        rows of any other table, ie. no parent tables, no generic relations
+        and no foreign keys to it (including those of m2m through tables) 
+        that do anything on delete. Signals are not checked here since they 
+        can be connected at any time.
+        '''
+        if opts.parents:
+            return False
+        if any(hasattr(f, 'bulk_related_objects') for f in opts.virtual_fields):
+            return False
+        for f in opts.get_fields(include_hidden=True):
+            if (f.auto_created and not f.concrete 
+                    and (f.one_to_many or f.one_to_one)
+                    and f.field.rel.on_delete is not DO_NOTHING):
+                return False
+        return True
+    
+    @staticmethod
+    def _make_url_path(model):
+        '''
+        The url path of the modelview as it is registered by the router.
+        '''
+        if getattr(settings, 'ROUTE_AUTO_CREATE', '') == 'app_module_view':
+            p = '/'.join(model.__module__.split('.'))
+        else:
+            p = model.__module__.split('.')[-1]
+        return p + '/' + model.__name__.lower()
+
+    def is_relation(self, name):
+        '''
+        Check if the field name points to another model.
+        '''
+        return self.kinds.get(name, FIELD) in (FK, M2M, REL)
+
+
+def get_spec(model):
+    '''
+    Get the compiled spec for the model class. It is built the first time it
+    is asked for (so that all of the related models have been loaded by the
+    app registry) and then cached for the life of the process.
+
+    @param model: the model class (or an instance of it)
+    @return the ViewSpec of the model
+    '''
+    if not isinstance(model, type):
+        model = type(model)
+    spec = _specs.get(model)
+    if spec is None:
+        spec = _specs[model] = ViewSpec(model)
+    return spec
+
+def _drop_spec(sender, **kwargs):
+    '''
+    Forget any spec compiled for a model class that is being (re)prepared.
+    '''
+    _specs.pop(sender, None)
+
+class_prepared.connect(_drop_spec)
@@ -11,6 +11,8 @@ from django.db import connection
 
 from mviews.errors import AuthenticationError
 from mviews.errors import AuthorizationError
+from mviews.errors import ParamError
+from mviews.mauth.utils import compile_perms
 from mviews.serializer.serializer import serialize_to_response
 from mviews.utils import err
 
@@ -51,10 +53,13 @@ def response(mview, qs, headers = {}, extra = None):
                        " with the query params provided.")
         else:
             return err(qs)
-    resp = serialize_to_response(mview, qs, 
-                                 rootcall=getattr(mview, 'rootcall', ''), 
-                                 extra=extra
-                                 )
+    try:
+        resp = serialize_to_response(mview, qs, 
+                                     rootcall=getattr(mview, 'rootcall', ''), 
+                                     extra=extra
+                                     )
+    except ParamError as e:
+        return err(e)
     print(len(connection.queries))
     if headers:
         set_headers(resp, headers)
@@ -88,19 +93,26 @@ def other_response(data = None, accept='application/json', headers = {}):
         set_headers(resp, headers)
     return resp
 
-def check_perms(request, _perms):
-        if _perms:
-            if (not request.user.is_authenticated() 
-                and request.method.lower() in _perms):
-                raise AuthenticationError()
-            req = _perms.get(request.method.lower(), False)
-            if req:
-                try:
-                    if (request.user.level < 
-                            request.user.get_level_by_name(req)):
-                        raise AuthorizationError("Unauthorized. You do not " 
-                                    "have permission "
-                                   "'{}' or above.".format(req))
-                except AttributeError as e:
-                    print(e)
-                    pass #Likely because user object not set up or anonymous
\ No newline at end of file
+def check_perms(request, _perms, levels = None):
+    '''
+    Check that the user of the request may use the method of the request.
+    
+    @param request: the request
+    @param _perms: the _perms dictionary of the view of method to level name
+    @param levels: the _perms compiled with mviews.mauth.utils.compile_perms,
+        or None to compile them now (see perm_levels to compile once per view)
+    '''
+    if not _perms:
+        return
+    method = request.method.lower()
+    if levels is None:
+        levels = compile_perms(_perms)
+    if method not in levels:
+        return
+    if not request.user.is_authenticated():
+        raise AuthenticationError()
+    level = levels[method]
+    if level is not None and getattr(request.user, 'level', level) < level:
+        raise AuthorizationError("Unauthorized. You do not " 
+                                 "have permission "
+                                 "'{}' or above.".format(_perms[method]))
@@ -0,0 +1,85 @@
+'''
+A url pattern that resolves all of the auto-created routes (see 
+Routes._register_installed_apps_views) with one lookup. Each auto-created 
+route is a path prefix (ie. <module>/<view>/) followed by the ids, so instead
+of a regex per route that Django would try one after the other, the prefixes
+are kept in a trie of their path segments. Resolving a path then costs the 
+same no matter how many routes there are. Custom routes tables are still 
+regexes in the url patterns.
+'''
+
+import re
+
+from django.core.urlresolvers import RegexURLPattern
+from django.core.urlresolvers import ResolverMatch
+
+
+#the key of the view in a node of the trie; segments are always strings
+_VIEW = None
+#what the rest of the path cannot have, as in the auto-created regex
+_invalid_rest = re.compile(r'[\s#?]')
+
+
+def _not_resolved(request, *args, **kwargs):
+    '''
+    The callback of the dispatcher itself, which is never called since the
+    dispatcher resolves to the view of the route instead.
+    '''
+    raise NotImplementedError("The dispatcher resolves to the route's view.")
+
+
+class PrefixDispatcher(RegexURLPattern):
+    '''
+    Resolves the path to the view of the route that is a prefix of it. If
+    more than one route is a prefix of the path, the one added first wins 
+    (as it would have as the first of the regexes). The rest of the path 
+    after the prefix is the only positional arg of the view.
+    
+    If no route matches, the path is left for the url patterns after it.
+    '''
+    
+    def __init__(self):
+        super(PrefixDispatcher, self).__init__(r'^', _not_resolved)
+        self.root = {}
+        self.count = 0
+        
+    def add(self, prefix, func):
+        '''
+        Add the view for the path prefix.
+        
+        @param prefix: the path prefix, ie. <module>/<view>
+        @param func: the view function
+        '''
+        node = self.root
+        for segment in prefix.strip('/').split('/'):
+            node = node.setdefault(segment, {})
+        if _VIEW not in node:
+            node[_VIEW] = (self.count, func)
+            self.count += 1
+        
+    def __len__(self):
+        return self.count
+    
+    def resolve(self, path):
+        '''
+        Find the view of the path.
+        
+        @param path: the path being resolved, without the leading /
+        @return the ResolverMatch, or None if no route matches
+        '''
+        segments = path.split('/')
+        node = self.root
+        found = None
+        #the last segment can only be the rest since the prefix ends with /
+        for i, segment in enumerate(segments[:-1]):
+            node = node.get(segment)
+            if node is None:
+                break
+            view = node.get(_VIEW)
+            if view is not None and (found is None or view[0] < found[0]):
+                rest = '/'.join(segments[i + 1:])
+                if not _invalid_rest.search(rest):
+                    found = (view[0], view[1], rest)
+        if found is None:
+            return None
+        return ResolverMatch(found[1], (found[2],), {})
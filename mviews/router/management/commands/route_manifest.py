@@ -0,0 +1,60 @@
+'''
+Write the route manifest so that the routes do not need to be found by 
+scanning the installed apps at startup, or check that it is up to date with
+--check. Add mviews.router to your INSTALLED_APPS to use this command.
+'''
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+#not mviews.router.routes, which makes the routes (and so scans) on import
+from mviews.router.manifest import acceptable_routes
+from mviews.router.manifest import is_current
+from mviews.router.manifest import write_manifest
+
+
+class Command(BaseCommand):
+    help = ("Scan the installed apps for their routes and write them to the "
+            "ROUTE_MANIFEST file (or the path given), or check that it is up "
+            "to date with --check.")
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', 
+                            help="The manifest file to write.")
+        parser.add_argument('--check', action='store_true', 
+                            help="Check that the manifest is up to date with "
+                                 "the sources of the apps instead of writing "
+                                 "it, failing if it is not.")
+    
+    def handle(self, *args, **options):
+        path = options['path'] or getattr(settings, 'ROUTE_MANIFEST', None)
+        if path is None:
+            raise CommandError("Set the ROUTE_MANIFEST setting or give the "
+                               "path of the manifest file.")
+        auto_create = getattr(settings, 'ROUTE_AUTO_CREATE', None)
+        if auto_create not in acceptable_routes:
+            raise CommandError("The ROUTE_AUTO_CREATE setting must be one of "
+                               "{}.".format(acceptable_routes))
+        if options['check']:
+            self.check_manifest(path)
+            return
+        try:
+            write_manifest(path, with_app = auto_create == 'app_module_view')
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write("Wrote the route manifest to {}".format(path))
+    
+    def check_manifest(self, path):
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError("Cannot read the route manifest {}: {}"
+                               .format(path, e))
+        if not is_current(manifest):
+            raise CommandError("The route manifest {} is out of date. Run "
+                               "route_manifest to update it.".format(path))
+        self.stdout.write("The route manifest {} is up to date.".format(path))
@@ -0,0 +1,258 @@
+'''
+Finding the routes of the installed apps by scanning them, and writing and
+reading the route manifest that saves the scan (see the ROUTE_MANIFEST
+setting). This module does not import mviews.router.routes, so the manifest
+can be written without making the routes of the project first.
+
+The manifest keeps a fingerprint of the sources of the installed apps. If a
+source changes after the manifest is written, the manifest is out of date
+(ie. a view was added). Since working out the fingerprint reads every source
+of the apps, it is only checked when the manifest is read if the 
+ROUTE_MANIFEST_CHECK setting is True (it defaults to DEBUG); otherwise check
+it with route_manifest --check, ie. when deploying.
+'''
+
+from hashlib import md5
+import importlib as il
+import inspect
+import json
+import os
+import pkgutil
+import warnings
+
+from django.conf import settings
+from django.views.generic.base import View
+
+
+acceptable_routes = ('app_module_view', 'module_view')
+
+def _scanned_apps():
+    '''
+    Get the installed apps that are scanned for routes (all but the django.*
+    apps).
+    '''
+    return [app for app in settings.INSTALLED_APPS
+            if 'django' != app.split('.')[0]]
+
+def scan_installed_apps(with_app = False):
+    '''
+    Find the routes of the installed apps (see
+    Routes._register_installed_apps_views).
+
+    @param with_app: set to true if you want the app name to be included
+                    in the route
+    @return a generator of ('auto', <route>, <view function or class>, 
+        <path>) for each auto-created route and ('view', None, <view class>,
+        <path>) for each view with a routes table, where the path is the 
+        dotted path the view was found by (which may not be the __module__
+        and __name__ of a decorated function)
+    '''
+    def auto_route(app, mod, funcName, func, path):
+        r = "{}/{}/([^\s#?]*)".format(mod,funcName)
+        if with_app:
+            r = "{}/{}".format(app, r.lstrip('/'))
+        return ('auto', r.lower(), func, path)
+
+    def load_views(app, mod, mod_name, parent_mod_name = ""):
+        if parent_mod_name:
+            name_mod = parent_mod_name + '/' + mod_name
+        else:
+            name_mod = mod_name
+        for klass in inspect.getmembers(mod, inspect.isclass):
+            #only add those views defined in the module
+            if mod.__name__ != klass[1].__module__:
+                continue
+            path = "{}.{}".format(mod.__name__, klass[0])
+            #other classes are not made, since making some of them has side
+            #effects (ie. Routes, which would scan again when mviews.router
+            #is installed for the route_manifest command)
+            if not issubclass(klass[1], View):
+                continue
+            try:
+                try:
+                    inst = klass[1]()
+                except AttributeError:
+                    continue #object is perhaps a model object
+                #we do not want to add the View class
+                if isinstance(inst, View):
+                    if (
+                        (not hasattr(inst, 'register_route')
+                         or (hasattr(inst, 'register_route')
+                         and inst.register_route)
+                        )
+                        and not getattr(inst, 'routes_only', False)
+                        ):
+                        yield auto_route(app,
+                                         name_mod,
+                                         klass[0],
+                                         klass[1],
+                                         path
+                                         )
+                    if hasattr(inst, 'routes'):
+                        yield ('view', None, klass[1], path)
+            except TypeError as e: #not a View class if init requires input.
+                if "'function' object is not subscriptable" in str(e):
+                    raise ValueError("Attempting to do something wrong")
+                if 'string indices must be integers' in str(e):
+                    raise TypeError from e
+            except ValueError as e:
+                warnings.warn("The view {} was not routed since it could "
+                              "not be made: {}".format(path, e))
+        if (mod_name == "views"
+            and (hasattr(settings, 'REGISTER_VIEWS_PY_FUNCS')
+            and settings.REGISTER_VIEWS_PY_FUNCS)
+            ):
+            for func in inspect.getmembers(mod, inspect.isfunction):
+                yield auto_route(app, 
+                                 name_mod, 
+                                 func[0], 
+                                 func[1],
+                                 "{}.{}".format(mod.__name__, func[0]))
+
+    def load_module(app, mod, pkg, path = ""):
+        '''
+        Load the module and get all of the modules in it.
+        '''
+        loaded_app = il.import_module('.' + mod, pkg)
+        for finder, mname, ispkg in pkgutil.walk_packages([loaded_app
+                                                           .__path__[0]
+                                                           ]
+                                                          ):
+            if ispkg:
+                for found in load_module(app,
+                                         mname,
+                                         loaded_app.__package__,
+                                         path+'/'+mod):
+                    yield found
+            views_mod = il.import_module('.' + mname,
+                                         loaded_app.__package__
+                                         )
+            #Check if the module itself has any view classes
+            for found in load_views(app, views_mod, mname, path + '/' + mod):
+                yield found
+
+    for app in _scanned_apps():
+        loaded_app = il.import_module(app)
+        for finder, mname, ispkg in pkgutil.walk_packages([loaded_app
+                                                           .__path__[0]
+                                                           ]
+                                                          ):
+            if ispkg:
+                found = load_module(app, mname, loaded_app.__package__)
+            else:
+                mod = il.import_module('.' + mname,
+                                       loaded_app.__package__
+                                       )
+                found = load_views(app, mod, mname)
+            for f in found:
+                yield f
+
+def sources_fingerprint():
+    '''
+    Get the fingerprint of the python sources of the scanned apps (and of the
+    settings that change what is scanned). Only the app packages are
+    imported, not their modules. The contents are hashed instead of using the
+    times the files were changed, since those change when the project is
+    deployed.
+
+    @return the hex digest of the sources
+    '''
+    digest = md5(repr((settings.ROUTE_AUTO_CREATE,
+                       getattr(settings, 'REGISTER_VIEWS_PY_FUNCS', None))
+                      ).encode('utf-8'))
+    for app in _scanned_apps():
+        root = il.import_module(app).__path__[0]
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if not name.endswith('.py'):
+                    continue
+                path = os.path.join(dirpath, name)
+                digest.update(os.path.relpath(path, root).encode('utf-8'))
+                with open(path, 'rb') as f:
+                    digest.update(md5(f.read()).digest())
+    return digest.hexdigest()
+
+def _entry(kind, route, view, path):
+    '''
+    Make the manifest entry of a route found by scan_installed_apps.
+
+    @raise ValueError: if the routes table of the view cannot be written as
+        json
+    '''
+    entry = {"kind" : kind,
+             "view" : path,
+             "doc" : view.__doc__}
+    if kind == 'auto':
+        entry["route"] = route
+        return entry
+    entry["routes"] = view.routes
+    entry["prefix"] = getattr(view, 'prefix', None)
+    entry["add_ending"] = getattr(view, 'add_ending', None)
+    for r in view.routes:
+        try:
+            json.dumps(r)
+        except (TypeError, ValueError) as e:
+            raise ValueError("The route {} of {} cannot be written to the "
+                             "manifest: {}".format(r.get("pattern"),
+                                                   entry["view"],
+                                                   e))
+    return entry
+
+def write_manifest(path, with_app = False):
+    '''
+    Scan the installed apps for their routes (which imports every module
+    of them) and write the routes to the manifest file at the path, so
+    that they can be loaded later without scanning (see read_manifest).
+    This is done by the route_manifest management command.
+
+    @param path: the path of the manifest file
+    @param with_app: set to true if you want the app name to be included
+                    in the route
+    @raise ValueError: if a route cannot be written as json
+    '''
+    entries = [_entry(*found) for found in scan_installed_apps(with_app)]
+    content = json.dumps({"auto_create" : settings.ROUTE_AUTO_CREATE,
+                          "fingerprint" : sources_fingerprint(),
+                          "routes" : entries},
+                         indent = 1)
+    with open(path, 'w') as f:
+        f.write(content)
+
+def is_current(manifest, check_sources = True):
+    '''
+    Check if a manifest is up to date.
+
+    @param manifest: the manifest, as read from its file
+    @param check_sources: check that the sources of the apps have not
+        changed since the manifest was written, which reads all of them
+    @return False if the manifest was not made for the ROUTE_AUTO_CREATE
+        setting or for the sources of the apps
+    '''
+    if manifest.get("auto_create") != settings.ROUTE_AUTO_CREATE:
+        return False
+    return (not check_sources 
+            or manifest.get("fingerprint") == sources_fingerprint())
+
+def read_manifest(path, check_sources = None):
+    '''
+    Read the routes from a manifest file written by write_manifest. If the
+    manifest is not up to date (see is_current), a warning is given and None
+    is returned so that the apps are scanned instead.
+
+    @param path: the path of the manifest file
+    @param check_sources: check the sources of the apps as well, which 
+        defaults to the ROUTE_MANIFEST_CHECK setting (or DEBUG if not set)
+    @return the list of entries of the manifest, or None if it is out of date
+    '''
+    with open(path) as f:
+        manifest = json.load(f)
+    if check_sources is None:
+        check_sources = getattr(settings, 'ROUTE_MANIFEST_CHECK', 
+                                settings.DEBUG)
+    if not is_current(manifest, check_sources):
+        warnings.warn("The route manifest {} is out of date, so the installed "
+                      "apps are scanned for their routes instead. Run the "
+                      "route_manifest command to update it.".format(path))
+        return None
+    return manifest["routes"]
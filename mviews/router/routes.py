@@ -4,19 +4,30 @@ Created on Mar 12, 2015
 '''
 
 import importlib as il
-import inspect
-import pkgutil
+import os
 import sys
 
 from django.conf.urls import patterns
 from django.conf.urls import url
 from django.conf import settings
-from django.views.generic.base import View
 
+from .dispatch import PrefixDispatcher
+from .manifest import acceptable_routes
+from .manifest import read_manifest
+from .manifest import scan_installed_apps
 from .utils import check_if_list
 from .utils import Discovery
+from .utils import LazyView
 
 
+def _lazy(func):
+    '''
+    Make a view given by its dotted path into a LazyView.
+    '''
+    if isinstance(func, str):
+        return LazyView(func)
+    return func
+
 class Routes(object):
     '''
     A way of keeping track of routes at the view level instead of trying to 
@@ -36,8 +47,11 @@ class Routes(object):
     routes = []
     #to be used to make the discovery endpoint after routes are created
     discovery = [] 
-    acceptable_routes = ('app_module_view', 'module_view')
+    acceptable_routes = acceptable_routes
     tracked = set() #single definitive source of all routes
+    url_patterns = None #the url patterns, once made by urls
+    #the ending of every auto-created route
+    auto_ending = '/([^\s#?]*)'
     
     def __init__(self, project_name=None):
         '''
@@ -55,19 +69,21 @@ class Routes(object):
                 except ImportError as e:
                     print("passing on loading urls: {}".format(e))
         if hasattr(settings, "ROUTE_AUTO_CREATE"):
-            if settings.ROUTE_AUTO_CREATE == "app_module_view":
-                self._register_installed_apps_views(settings.INSTALLED_APPS, 
-                                                    with_app=True)
-            elif settings.ROUTE_AUTO_CREATE == "module_view":
-                self._register_installed_apps_views(settings.INSTALLED_APPS)
-            else:
+            if settings.ROUTE_AUTO_CREATE not in self.acceptable_routes:
                 raise ValueError("The route_auto_create option was set in "
                                  "settings but option {} is not a valid "
                                  "option. Valid options are: {}"
-                                 .format(settings.route_auto_create, 
+                                 .format(settings.ROUTE_AUTO_CREATE, 
                                          self.acceptable_routes
                                          )
                                  )
+            manifest = getattr(settings, 'ROUTE_MANIFEST', None)
+            if (manifest is None or not os.path.exists(manifest) 
+                    or not self.load_manifest(manifest)):
+                self._register_installed_apps_views(
+                        settings.INSTALLED_APPS, 
+                        with_app=settings.ROUTE_AUTO_CREATE == "app_module_view"
+                                                    )
     
     def _register_installed_apps_views(self, apps, with_app = False):
         '''
@@ -99,6 +115,17 @@ class Routes(object):
         To prevent select views from being registered in this manner, set 
         the register_route variable on the view to False.
         
+        Since this imports every module of every installed app, it can be 
+        slow for large projects. To skip it, set the ROUTE_MANIFEST setting 
+        to the path of a manifest file and write the manifest with the 
+        route_manifest management command whenever views are added. The 
+        routes are then read from the manifest and each view is imported the 
+        first time its route is requested. If the manifest does not exist, 
+        the apps are scanned as usual. If it is out of date with the sources
+        of the apps, a warning is given and the apps are scanned as well; 
+        this is only checked if the ROUTE_MANIFEST_CHECK setting (default
+        DEBUG) is True, so run route_manifest --check when deploying.
+        
         All functions within a views.py module are also added with this view. 
         That means that any decorators will also have their own views. If this 
         is not desired behavior, then set the settings.REGISTER_VIEWS_PY_FUNCS 
@@ -109,88 +136,39 @@ class Routes(object):
         @param with_app: set to true if you want the app name to be included 
                         in the route
         '''
-        def add_func(app, mod, funcName, func):
-            r = "{}/{}/([^\s#?]*)".format(mod,funcName)
-            if with_app:
-                r = "{}/{}".format(app, r.lstrip('/'))
-            self.add(r.lower(), func, add_ending=False)
-            
-        def load_views(mod, mod_name, parent_mod_name = ""):
-            if parent_mod_name:
-                name_mod = parent_mod_name + '/' + mod_name
+        for kind, route, view, _ in scan_installed_apps(with_app):
+            if kind == 'auto':
+                self.add_auto(route, LazyView.of(view) 
+                                     if isinstance(view, type) else view)
             else:
-                name_mod = mod_name
-            for klass in inspect.getmembers(mod, inspect.isclass):
-                #only add those views defined in the module
-                if mod.__name__ != klass[1].__module__:
-                    continue
-                try:
-                    try:
-                        inst = klass[1]()
-                    except AttributeError:
-                        continue #object is perhaps a model object
-                    #we do not want to add the View class
-                    if isinstance(inst, View): 
-                        if (
-                            (not hasattr(inst, 'register_route') 
-                             or (hasattr(inst, 'register_route') 
-                             and inst.register_route)
-                            )
-                            and not getattr(inst, 'routes_only', False)
-                            ):
-                            add_func(app, 
-                                     name_mod, 
-                                     klass[0], 
-                                     klass[1].as_view()
-                                     )
-                        if hasattr(inst, 'routes'):
-                            self.add_view(klass[1])
-                except TypeError as e: #not a View class if init requires input.
-                    if "'function' object is not subscriptable" in str(e):
-                        raise ValueError("Attempting to do something wrong")
-                    if 'string indices must be integers' in str(e):
-                        raise TypeError from e
-                except ValueError as e:
-                    print(e)
-            if (mod_name == "views" 
-                and (hasattr(settings, 'REGISTER_VIEWS_PY_FUNCS')                       
-                and settings.REGISTER_VIEWS_PY_FUNCS)
-                ):
-                for func in inspect.getmembers(mod, inspect.isfunction):
-                    add_func(app, name_mod, func[0], func[1])
-        
-        def load_module(mod, pkg, path = ""):
-            '''
-            Load the module and get all of the modules in it.
-            '''
-            print("The module and pkg of the load_module:",mod, pkg, path)
-            loaded_app = il.import_module('.' + mod, pkg)
-            for finder, mname, ispkg in pkgutil.walk_packages([loaded_app
-                                                               .__path__[0]
-                                                               ]
-                                                              ):
-                if ispkg:
-                    load_module(mname, loaded_app.__package__, path+'/'+mod)
-                views_mod = il.import_module('.' + mname, 
-                                             loaded_app.__package__
-                                             )
-                #Check if the module itself has any view classes
-                load_views(views_mod, mname, path + '/' + mod) 
-            
-        for app in settings.INSTALLED_APPS:
-            if 'django' != app.split('.')[0]: #only do it for non-django apps
-                loaded_app = il.import_module(app)
-                for finder, mname, ispkg in pkgutil.walk_packages([loaded_app
-                                                                   .__path__[0]
-                                                                   ]
-                                                                  ):
-                    if ispkg:
-                        load_module(mname, loaded_app.__package__)
-                    else:
-                        mod = il.import_module('.' + mname, 
-                                               loaded_app.__package__
-                                               )
-                        load_views(mod, mname)
+                self.add_view(view)
+    
+    def load_manifest(self, path):
+        '''
+        Add the routes from a manifest file written by 
+        mviews.router.manifest.write_manifest. The views are only imported 
+        when their route is first requested (see LazyView).
+        
+        @param path: the path of the manifest file
+        @return False if the manifest is out of date (and so was not loaded;
+            see read_manifest), otherwise True
+        '''
+        entries = read_manifest(path)
+        if entries is None:
+            return False
+        for entry in entries:
+            view = LazyView(entry["view"], entry["doc"])
+            if entry["kind"] == 'auto':
+                self.add_auto(entry["route"], view)
+                continue
+            kwargs = {}
+            if entry["add_ending"] is not None:
+                kwargs['add_ending'] = entry["add_ending"]
+            self.add_list(entry["routes"], 
+                          view, 
+                          prefix = entry["prefix"], 
+                          **kwargs)
+        return True
                         
     def add(self, route, func, var_mappings= None, add_ending=True, **kwargs):
         '''
@@ -210,15 +188,22 @@ class Routes(object):
         To pass in a reverse url name lookup, you can use the key word 
         'django_url_name' in the kwargs dictionary.
         
+        The view can be given as the dotted path of a view function or a 
+        class-based view instead, in which case it is only imported (and 
+        as_view() called) the first time the route is requested. Its doc is 
+        then not in the discovery endpoint.
+        
         @param route: the unformatted string for the route
-        @param func: the view function to be called
+        @param func: the view function to be called, or its dotted path
         @param var_mappings: the list of dictionaries used to fill in the var 
                             mappings
         @param add_ending: adds the appropriate /$ is on the ending if True. 
                     Defaults to True
         @param kwargs: the kwargs to be passed into the urls function
         '''
+        self._check_not_frozen()
         self._check_if_format_exists(route)
+        func = _lazy(func)
         
         def add_url(pattern, pmap, ending, opts):
             url_route = '^{}{}'.format(pattern.format(*pmap), 
@@ -261,10 +246,12 @@ class Routes(object):
         }
         
         @param routes: the list of routes
-        @param func: the function to be called
+        @param func: the function to be called, or its dotted path
         @param prefix: the prefix to attach to the route pattern
         '''
+        self._check_not_frozen()
         check_if_list(routes)
+        func = _lazy(func)
         for route in routes:
             route_kwargs = kwargs.copy()
             if 'kwargs' in route:
@@ -281,15 +268,55 @@ class Routes(object):
                       **route_kwargs
                       )
     
+    def add_auto(self, route, func):
+        '''
+        Add an auto-created route of the form <prefix>/([^\s#?]*) for the 
+        view function. Unless the ROUTE_TRIE setting is False, the route is 
+        resolved by a dispatcher (see mviews.router.dispatch) instead of by
+        its own regex. Auto-created routes added one after the other share a
+        dispatcher, which is placed in the url patterns where the first of 
+        them was added, so routes are tried in the order they were added as 
+        with the regexes.
+        
+        @param route: the regex of the route
+        @param func: the view function to be called, or its dotted path
+        '''
+        self._check_not_frozen()
+        func = _lazy(func)
+        if not getattr(settings, 'ROUTE_TRIE', True):
+            self.add(route, func, add_ending=False)
+            return
+        self._check_if_format_exists(route)
+        if not self.routes or not isinstance(self.routes[-1], PrefixDispatcher):
+            self.routes.append(PrefixDispatcher())
+        self.routes[-1].add(route[:-len(self.auto_ending)], func)
+        self.discovery.append(('^' + route, func.__doc__))
+    
     @property
     def urls(self):
         '''
         Get the urls from the Routes object. This a patterns object.
+        
+        The routes are final once this is first called: the discovery 
+        endpoint is added and frozen, and the same patterns are returned 
+        every time after. Adding a route after that raises a ValueError.
         '''
-        Discovery.add_routes(self.discovery)
-        self.add('discovery', Discovery.as_view())
-        return patterns(r'',*self.routes)
+        if Routes.url_patterns is None:
+            Discovery.add_routes(self.discovery)
+            self.add('discovery', Discovery.as_view())
+            Discovery.freeze()
+            Routes.url_patterns = patterns(r'',*self.routes)
+        return Routes.url_patterns
         
+    def _check_not_frozen(self):
+        '''
+        Checks that the url patterns have not been made yet, since a route 
+        added after would be in neither the patterns nor the discovery 
+        endpoint.
+        '''
+        if Routes.url_patterns is not None:
+            raise ValueError("Cannot add routes once the urls are made.")
+    
     def _check_if_format_exists(self, route):
         '''
         Checks if the unformatted route already exists.
@@ -345,7 +372,7 @@ class Routes(object):
         if hasattr(view, 'add_ending') and 'add_ending' not in kwargs:
             kwargs['add_ending'] = view.add_ending
         
-        self.add_list(view.routes, view.as_view(), prefix = prefix, **kwargs)
+        self.add_list(view.routes, LazyView.of(view), prefix = prefix, **kwargs)
 
 class LazyRoutes(Routes):
     '''
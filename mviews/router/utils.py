@@ -6,9 +6,17 @@ Created on Nov 16, 2015
 Defines the utility functions specific to the router package.
 '''
 
-from django.http.response import JsonResponse as jr
+from hashlib import md5
+
+from django.conf import settings
+from django.http.response import HttpResponse
+from django.utils.http import parse_etags
+from django.utils.http import quote_etag
+from django.utils.module_loading import import_string
 from django.views.generic.base import View
 
+from mviews.serializer.encoders import dumps
+
 
 common_regex = {
                 'name' : "[\w|\d|\+|\.]*",
@@ -30,6 +38,63 @@ def check_if_list(lst):
     if not (hasattr(lst, "__getitem__") or hasattr(lst, "__iter__")):
         raise TypeError("Must be an iterable: {}".format(lst))
     
+class LazyView(object):
+    """
+    A view that is only imported when it is first called (or when an 
+    attribute of the view is first asked for). If the dotted path is to a 
+    class-based view, its as_view() is used. A lazy view of a class that is
+    already imported (see of) keeps the class and only defers its as_view().
+    """
+
+    def __init__(self, path, doc=None):
+        '''
+        @param path: the dotted path of the view function or class
+        @param doc: the doc of the view, for the discovery endpoint
+        '''
+        self.path = path
+        self.__doc__ = doc
+        self.__name__ = path.rsplit('.', 1)[-1]
+        self._view = None
+        self._cls = None
+
+    @classmethod
+    def of(cls, view):
+        '''
+        Make a lazy view of a class-based view that is already imported, so 
+        that its as_view() is only called if its route is requested. The 
+        class is kept (and not imported again by its path) so that nested,
+        local and dynamically made classes can be used.
+        '''
+        lazy = cls("{}.{}".format(view.__module__, view.__qualname__), 
+                   view.__doc__)
+        lazy._cls = view
+        return lazy
+    
+    @property
+    def view(self):
+        '''
+        The view function, imported the first time it is needed.
+        '''
+        if self._view is None:
+            view = self._cls or import_string(self.path)
+            if isinstance(view, type):
+                view = view.as_view()
+            self._view = view
+        return self._view
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view(request, *args, **kwargs)
+    
+    def __getattr__(self, name):
+        '''
+        Get the attributes that are not on the lazy view from the view, so 
+        that those checked by middleware (ie. csrf_exempt) are found. The 
+        view is imported when one is first asked for.
+        '''
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.view, name)
+
 class RoutesOnly(View):
     routes_only = True
     
@@ -39,10 +104,18 @@ class Discovery(View):
     system with their associated regex.
     """
     
+    register_route = False #added by Routes.urls
     discovery = []
+    #the encoded responses, by path prefix, once frozen
+    responses = None
+    #the max number of prefixes to keep the filtered responses of
+    max_prefixes = 256
     
     @classmethod
     def add_routes(self, routes):
+        if self.responses is not None:
+            raise ValueError("Cannot add routes to discovery once it is "
+                             "frozen.")
         for r, doc in routes:
             self.discovery.append({"path" : self._get_path(r), 
                                   "regex" : r, 
@@ -68,14 +141,69 @@ class Discovery(View):
                 out.append(p.lstrip('^')) 
         return '/'.join(out) + '/'
     
+    @classmethod
+    def freeze(self):
+        """
+        Make the discovery endpoints final, once all routes are added. The 
+        response is encoded once here and sent as is after.
+        """
+        self.discovery = tuple(self.discovery)
+        self.responses = {'' : self._encode(self.discovery)}
+    
+    @classmethod
+    def _encode(self, discovery):
+        """
+        Encode the discovery endpoints with their strong ETag.
+        """
+        content = dumps({"urls" : discovery})
+        return content, quote_etag(md5(content).hexdigest())
+    
+    @classmethod
+    def _response_for(self, prefix):
+        """
+        Get the encoded response of the endpoints with the path prefix.
+        """
+        if self.responses is None:
+            self.freeze()
+        found = self.responses.get(prefix)
+        if found is None:
+            found = self._encode([d for d in self.discovery 
+                                  if d["path"].startswith(prefix)])
+            if len(self.responses) < self.max_prefixes:
+                self.responses[prefix] = found
+        return found
+    
     def get(self, request, *args, **kwargs):
         """
         Returns the json object of discovery endpoints. Looks as follows:
         
             {
-                "urls" : {
-                    "<url_path>" : "<regex of path>"
-                }
+                "urls" : [
+                    {
+                        "path" : "<url_path>",
+                        "regex" : "<regex of path>",
+                        "doc" : "<doc of the view>"
+                    }, ...
+                ]
             }
+        
+        To only get the endpoints whose path starts with a prefix, send the 
+        prefix query param.
+        
+        The response never changes once the routes are made, so it is sent 
+        with a strong ETag and may be cached for the DISCOVERY_MAX_AGE 
+        setting in seconds (default 3600). A request with a matching 
+        If-None-Match gets a 304.
         """
-        return jr({"urls" : self.discovery})
\ No newline at end of file
+        content, etag = self._response_for(request.GET.get('prefix', '')
+                                           .lstrip('/'))
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and (if_none_match.strip() == '*' or etag in 
+                              [quote_etag(e) for e in parse_etags(if_none_match)]):
+            resp = HttpResponse(status = 304)
+        else:
+            resp = HttpResponse(content, content_type = "application/json")
+        resp['ETag'] = etag
+        resp['Cache-Control'] = 'public, max-age={}'.format(
+                                    getattr(settings, 'DISCOVERY_MAX_AGE', 3600))
+        return resp
\ No newline at end of file
@@ -0,0 +1,84 @@
+'''
+The json encoders used for every response of the framework. An encoder is a
+function that takes json serializable data (plus dates, times, decimals and
+uuids) and returns the encoded bytes, which can be written straight into the
+response without being turned into a string first.
+
+The encoder used is set with the JSON_ENCODER setting to the name of a
+registered encoder (default 'json', the standard library json with the
+DjangoJSONEncoder). If orjson is installed, it is registered as 'orjson' and
+can be chosen with JSON_ENCODER = 'orjson'; it writes dates, times, decimals
+and uuids the same way as the DjangoJSONEncoder. To add your own encoder, use
+register_encoder.
+'''
+
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder as djson
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_encoders = {}
+
+def register_encoder(name, encoder):
+    '''
+    Register an encoder so that it can be chosen with the JSON_ENCODER setting.
+
+    @param name: the name of the encoder
+    @param encoder: a function that takes the data and returns bytes
+    '''
+    _encoders[name] = encoder
+
+def get_encoder(name=None):
+    '''
+    Get the encoder by name, or the encoder set in the settings if no name is
+    given.
+
+    @param name: the name of the encoder
+    @return the encoder function
+    '''
+    if name is None:
+        name = getattr(settings, 'JSON_ENCODER', 'json')
+    try:
+        return _encoders[name]
+    except KeyError:
+        raise ValueError("The JSON_ENCODER {} is not a registered encoder. "
+                         "Registered encoders are: {}"
+                         .format(name, sorted(_encoders))
+                         )
+
+def dumps(data):
+    '''
+    Encode the data to json with the encoder of the project.
+
+    @param data: the data to encode
+    @return the encoded bytes
+    '''
+    return get_encoder()(data)
+
+def _json_dumps(data):
+    '''
+    Encode with the standard library json.
+    '''
+    return json.dumps(data, cls=djson).encode('utf-8')
+
+register_encoder('json', _json_dumps)
+
+if orjson is not None:
+    _djson = djson()
+    _orjson_opts = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def _orjson_dumps(data):
+        '''
+        Encode with orjson. Dates and times (which orjson writes with the 
+        microseconds), and anything it does not know natively (ie. decimals 
+        and lazy strings), are handed to the DjangoJSONEncoder.
+        '''
+        return orjson.dumps(data, default=_djson.default, option=_orjson_opts)
+
+    register_encoder('orjson', _orjson_dumps)
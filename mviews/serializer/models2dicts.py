@@ -23,11 +23,17 @@ of your app.
 '''
 
 from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.base import File
 from django.db import models
 from django.db.models.manager import Manager
 
 from .utils import hyperlinkerize
+from mviews.mview.spec import FILE
+from mviews.mview.spec import FK
+from mviews.mview.spec import M2M
+from mviews.mview.spec import REL
+from mviews.mview.spec import get_spec
 
 
 def convert_to_dicts(qs, field_names, depth=0, rootcall=''):
@@ -72,58 +78,323 @@ def convert_to_dicts(qs, field_names, depth=0, rootcall=''):
     @param rootcall: the network location for the hyperlinks.
     """
     vals = []
-    base_type = qs.model
+    if hasattr(qs, 'model'):
+        base_type = qs.model
+    elif qs:
+        base_type = type(qs[0]) #a page that has already been read
+    else:
+        return vals
+    if isinstance(field_names, dict):
+        filt = field_names.get("base", _get_model_fields(base_type))
+    else:
+        filt = field_names
+    trav = _Traversal(base_type, field_names, rootcall, depth)
+    convert = row_converter(base_type, filt)
+    for m in qs:
+        ident = (type(m), m.pk)
+        trav.path.add(ident)
+        vals.append(convert(m, trav))
+        trav.path.discard(ident)
+    return vals
+
+#the compiled row converters by (model, fields, hyperlinked)
+_row_converters = {}
+#the most row converters to keep before starting over, since the fields come 
+#from the request and so there could be any number of combinations
+MAX_ROW_CONVERTERS = 512
+
+def row_converter(model, fields):
+    """
+    Get the function that converts one object of the model into a dictionary 
+    of the fields for convert_to_dicts. The function is generated for the 
+    model and fields the first time it is asked for and then cached, so how 
+    each field is converted (a plain value, a file, a foreign key or a 
+    relation) and how the hyperlink is made are worked out once instead of for
+    every field of every object.
+    
+    The function takes the object and the traversal of the conversion.
+    
+    @param model: the model class of the objects
+    @param fields: the names of the fields to convert
+    @return the converter function
+    """
+    hyperlinked = getattr(settings, 'HYPERLINK_VALUES', True)
+    key = (model, tuple(fields), hyperlinked)
+    convert = _row_converters.get(key)
+    if convert is None:
+        if len(_row_converters) >= MAX_ROW_CONVERTERS:
+            _row_converters.clear()
+        convert = _row_converters[key] = _compile_row_converter(model, 
+                                                                key[1], 
+                                                                hyperlinked)
+    return convert
+
+def _compile_row_converter(model, fields, hyperlinked):
+    """
+    Generate the source of the converter function for row_converter and 
+    compile it.
+    """
+    spec = get_spec(model)
+    lines = ["def convert(m, trav):", "    out = {}"]
+    for f in fields:
+        kind = spec.kinds.get(f)
+        attr = spec.accessors.get(f, f)
+        if kind is None or not attr.isidentifier():
+            #not a model field (ie. a property), so work it out at runtime
+            lines.append("    _convert_value(trav, m, {!r}, out)".format(f))
+            continue
+        value = "m." + attr
+        if kind == FILE:
+            value = "_file_name({})".format(value)
+        elif kind == FK:
+            value = "_fk_to_dict(trav, {}, {!r})".format(value, f)
+        elif f in spec.o2o_rels:
+            value = "_o2o_rel_to_dict(trav, m, {!r}, {!r})".format(attr, f)
+        elif kind in (M2M, REL):
+            #we start foreign relations at one less because we want to not
+            #count the step of getting the objects as a depth count
+            value = "_foreign_rel_to_dict(trav, {}, 0, {!r})".format(value, f)
+        lines.append("    out[{!r}] = {}".format(f, value))
+    if hyperlinked and fields:
+        lines.append("    out['url'] = hyperlinkerize(m.serializable_value({!r}), "
+                     "trav.rootcall, {!r})"
+                     .format(spec.unique_id, 
+                             spec.url_path if hasattr(model, 'url_path') else ''
+                             ))
+    lines.append("    return out")
+    namespace = {
+                 "_convert_value" : _convert_value,
+                 "_file_name" : _file_name,
+                 "_fk_to_dict" : _fk_to_dict,
+                 "_o2o_rel_to_dict" : _o2o_rel_to_dict,
+                 "_foreign_rel_to_dict" : _foreign_rel_to_dict,
+                 "hyperlinkerize" : hyperlinkerize
+                 }
+    exec(compile('\n'.join(lines), 
+                 '<row converter for {}>'.format(spec.label), 
+                 'exec'), 
+         namespace)
+    return namespace["convert"]
+
+def _file_name(value):
+    """
+    The name of a file field's value, or None if there is no file.
+    """
+    return value.name if value is not None else None
+
+def _fk_to_dict(trav, value, field):
+    """
+    Convert the object of a foreign key on a base object.
+    """
+    if value is None:
+        return None
+    return _foreign_obj_to_dict(trav, value, 1, field)
+
+def _o2o_rel_to_dict(trav, m, attr, field):
+    """
+    Convert the object of a reverse one-to-one relation on a base object, or 
+    None if the base object has none.
+    """
+    try:
+        value = getattr(m, attr)
+    except ObjectDoesNotExist:
+        return None
+    return _foreign_obj_to_dict(trav, value, 1, field)
+
+def _convert_value(trav, m, f, out):
+    """
+    Convert a value that is not known to be a field of the model by checking
+    what it is. Nothing is added if it is not an attribute of the object.
+    """
+    try:
+        field = getattr(m, f)
+    except AttributeError:
+        return #not a field on the model
+    if isinstance(field, Manager):
+        out[f] = _foreign_rel_to_dict(trav, field, 0, f) 
+    elif isinstance(field, models.Model):
+        out[f] = _foreign_obj_to_dict(trav, field, 1, f) 
+    elif isinstance(field, File):
+        out[f] = field.name               
+    else:
+        out[f] = field
+
+def convert_to_normalized(qs, field_names, depth=0, rootcall='', included=None):
+    """
+    Convert a list-like set of model objects into a list of dictionaries like
+    convert_to_dicts, except that nested objects are not copied into each of
+    the objects that point to them. Instead, a relation is given as the pk (or
+    list of pks) of the related objects and each related object is converted
+    once into the included dictionary. This is keyed by the label of the model
+    (<app_label>.<model_name>) and then by the pk:
+    
+        {
+            "<app_label>.<model_name>" : {
+                "<pk>" : {
+                    ... (object fields, with relations as pks)
+                }
+            }
+        }
+    
+    The related objects are followed to the depth given, as in 
+    convert_to_dicts. Relations past the depth are given only if they are a 
+    foreign key (as the pk of the foreign key) since this does not need
+    another query.
+    
+    @param qs: a list-like object of models to convert
+    @param field_names: the field filter, see convert_to_dicts
+    @param depth: an integer that details how many levels of nested objects to
+                    include. Defaults to 0.
+    @param rootcall: the network location for the hyperlinks.
+    @param included: the included dictionary to add to; pass in the one from
+                    the previous call to convert more objects for the same
+                    response (ie. when streaming)
+    @return the list of dictionaries and the included dictionary
+    """
+    if included is None:
+        included = {}
+    vals = []
+    if hasattr(qs, 'model'):
+        base_type = qs.model
+    elif qs:
+        base_type = type(qs[0])
+    else:
+        return vals, included
     if isinstance(field_names, dict):
         filt = field_names.get("base", _get_model_fields(base_type))
     else:
         filt = field_names
+    trav = _Traversal(base_type, field_names, rootcall, depth)
+    trav.included = included
     for m in qs:
-        obj = {}
-        vals.append(obj)
-        for f in filt:    
+        vals.append(_normalized_fields(trav, m, filt, 0))
+    return vals, included
+
+def _normalized_fields(trav, obj, fields, depth):
+    """
+    Convert the fields of the object with the relations given as pks. Any
+    related objects followed are added to the included dictionary of the
+    traversal.
+    """
+    spec = get_spec(obj)
+    out = {}
+    for f in fields:
+        if not spec.is_relation(f):
             try:
-                field = getattr(m, f)
+                value = getattr(obj, spec.accessors.get(f, f))
             except AttributeError:
                 continue #not a field on the model
-            if isinstance(field, Manager):
-                #we start foreign relations at one less because we want to not
-                #count the step of getting the objects as a depth count
-                obj[f] = _foreign_rel_to_dict(base_type, 
-                                              field, 
-                                              0, 
-                                              field_names,
-                                              f,
-                                              rootcall, 
-                                              depth
-                                              ) 
-            elif isinstance(field, models.Model):
-                obj[f] = _foreign_obj_to_dict(base_type, 
-                                              field, 
-                                              1, 
-                                              field_names,
-                                              f,
-                                              rootcall, 
-                                              depth
-                                              ) 
-            elif isinstance(field, File):
-                obj[f] = field.name               
+            out[f] = value.name if isinstance(value, File) else value
+        elif (trav.max_depth > depth 
+              and (depth == 0 
+                   or (spec.related_models[f] is not trav.base_type
+                       #the managers of an included object are only followed
+                       #if there is a level past it, as in convert_to_dicts
+                       and (trav.max_depth > depth + 1
+                            or spec.kinds[f] == FK 
+                            or f in spec.o2o_rels)
+                       )
+                   )
+              ):
+            try:
+                rel = getattr(obj, spec.accessors[f])
+            except ObjectDoesNotExist: #a reverse one-to-one with no object
+                rel = None
+            if isinstance(rel, Manager):
+                out[f] = [_include_obj(trav, o, depth+1, f) for o in rel.all()]
+            elif rel is None:
+                out[f] = None
             else:
-                obj[f] = field
-            if getattr(settings, 'HYPERLINK_VALUES', True):
-                obj["url"] = hyperlinkerize(getattr(m, 
-                                                    'unique_id', 
-                                                    m.id
-                                                    ), 
-                                            rootcall, 
-                                            getattr(m, 'url_path', '')
-                                            ) 
-    return vals
+                out[f] = _include_obj(trav, rel, depth+1, f)
+        elif spec.kinds[f] == FK:
+            out[f] = obj.serializable_value(f)
+    if getattr(settings, 'HYPERLINK_VALUES', True):
+        out["url"] = hyperlinkerize(obj.serializable_value(
+                                                getattr(obj, 'unique_id', 'id')
+                                                           ), 
+                                    trav.rootcall, 
+                                    getattr(obj, 'url_path', '')
+                                    ) 
+    return out
+
+def _include_obj(trav, obj, depth, field):
+    """
+    Add the object to the included dictionary of the traversal if it is not 
+    already there.
+    
+    @return the pk of the object
+    """
+    bucket = trav.included.setdefault(get_spec(obj).label, {})
+    key = str(obj.pk) #json keys are always strings
+    if key not in bucket:
+        bucket[key] = {} #mark it as included before following its relations
+        bucket[key] = _normalized_fields(trav, 
+                                         obj, 
+                                         _get_filter(trav.field_filter, 
+                                                     field, 
+                                                     obj),
+                                         depth)
+    return obj.pk
+
+def relation_paths(model, field_names, depth):
+    """
+    Work out the relations that convert_to_dicts will follow for the model at
+    the given depth with the given field filter (see convert_to_dicts for the
+    format of field_names). These are returned as lookup paths to pass to 
+    select_related and prefetch_related so that each level of the relation 
+    tree is loaded with one query, instead of one query per object.
+    
+    Chains of foreign keys from the base model are joined with select_related;
+    anything reached through a many-to-many or reverse relation is prefetched.
+    Relations back to the base model past the first level are not followed by
+    the serializer and so are not loaded. Neither are the many-to-many and 
+    reverse foreign key relations of the nested objects at the last level, 
+    which the serializer leaves out.
+    
+    @param model: the model class of the queryset being serialized
+    @param field_names: the field filter of the serialization
+    @param depth: the depth of the serialization
+    @return the list of select_related paths and the list of prefetch paths
+    """
+    select = []
+    prefetch = []
+    
+    def walk(m, fields, prefix, level, joined):
+        if level > depth:
+            return
+        spec = get_spec(m)
+        for f in fields:
+            if not spec.is_relation(f):
+                continue
+            related = spec.related_models[f]
+            if level > 1 and related is model:
+                continue
+            #the managers of a nested object are only followed if there is a
+            #level past it (see _foreign_obj_to_dict)
+            many = spec.kinds[f] != FK and f not in spec.o2o_rels
+            if many and level > 1 and level >= depth:
+                continue
+            path = prefix + spec.accessors[f]
+            join = joined and spec.kinds[f] == FK
+            (select if join else prefetch).append(path)
+            walk(related, 
+                 _get_filter(field_names, f, related), 
+                 path + '__', 
+                 level + 1, 
+                 join)
+    
+    if isinstance(field_names, dict):
+        base = field_names.get("base", _get_model_fields(model))
+    else:
+        base = field_names
+    walk(model, base, '', 1, True)
+    return select, prefetch
 
 def _get_model_fields(model):
     """
     Gets the model's fields.
     """
-    return getattr(model, "public_fields", model._meta.get_all_field_names())
+    return get_spec(model).field_names
 
 def _get_filter(filters, field, model):
     """
@@ -135,107 +406,99 @@ def _get_filter(filters, field, model):
         fields = _get_model_fields(model)
         return fields
     
-def _is_foreign_key(fobj, field):
+class _Traversal(object):
     """
-    Check if is a foreign key to prevent getting lots of objects that we don't
-    want.
+    The state of a single call to convert_to_dicts. It is made for each call 
+    so nothing is kept between calls (or requests).
+    
+    It keeps track of the objects on the current path of the conversion so
+    that a cycle of objects is not followed, and of every object converted so
+    that an object reached more than once (at the same depth through the same 
+    field) is only converted once and the dictionary is reused. A dictionary
+    that left out an object because it was on the path depends on the path it
+    was reached by, so it is not reused.
     """
-    return getattr(fobj._meta.get_field_by_name(field)[0], "rel", False) 
+    
+    def __init__(self, base_type, field_filter, rootcall, max_depth):
+        self.base_type = base_type
+        self.field_filter = field_filter
+        self.rootcall = rootcall
+        self.max_depth = max_depth
+        self.path = set()
+        #whether an object was left out of the conversion in progress since 
+        #it was on the path
+        self.pruned = False
+        self.converted = {}
+        self.included = {}
 
-def _foreign_obj_to_dict(base_type, 
-                         fobj, 
-                         depth, 
-                         field_filter,
-                         field,
-                         rootcall, 
-                         max_depth=0, 
-                         rels=set(), 
-                         fos=set()
-                        ):
+def _foreign_obj_to_dict(trav, fobj, depth, field):
     """
     Basically the same as convert_to_dicts except it keeps track of where the
-    conversion has been and how much more it needs to do. It does so by
-    keeping track of what foreign_objects have been visited and what relations
-    have been visited. If they are seen again they will not be included in the
-    output.
+    conversion has been and how much more it needs to do with the traversal.
+    Objects already on the path of the conversion, and relations back to the
+    base type, are not included in the output.
     
     It also will pass in the name of the field being used along with the
     field_filter dict to see if there are any fields to be filtered on nested
     objects.
     """
-    fields = _get_filter(field_filter, field, fobj)
+    key = (type(fobj), fobj.pk, depth, field)
+    if key in trav.converted:
+        return trav.converted[key]
+    ident = key[:2]
+    trav.path.add(ident)
+    pruned, trav.pruned = trav.pruned, False
+    spec = get_spec(fobj)
+    fields = _get_filter(trav.field_filter, field, fobj)
     fkDict = {}
     for f in fields:
-        if _is_foreign_key(fobj, f) and max_depth <= depth:
-            continue
+        if spec.is_relation(f) and (trav.max_depth <= depth
+                                    or spec.related_models[f] is trav.base_type
+                                    ):
+            continue #checked before getting it, which could be a query
         try:
-            fo = getattr(fobj, f)
+            fo = getattr(fobj, spec.accessors.get(f, f))
         except AttributeError:
-            fo = getattr(fobj, f+'_set')
+            continue #not a field on the model
         if isinstance(fo, Manager):
-            if max_depth > depth and type(fo) not in rels:
-                fkDict[f] = _foreign_rel_to_dict(base_type, 
-                                                fo, 
-                                                depth+1,
-                                                field_filter,
-                                                f,
-                                                rootcall,
-                                                max_depth,
-                                                rels)
+            if trav.max_depth > depth and fo.model is not trav.base_type:
+                fkDict[f] = _foreign_rel_to_dict(trav, fo, depth+1, f)
         elif isinstance(fo, models.Model):
-            if (max_depth > depth 
-                and type(fo) != base_type 
-                and type(fo) not in fos
-                ):
-                fos.add(type(fobj))
-                fkDict[f] = _foreign_obj_to_dict(base_type, 
-                                                fo, 
-                                                depth+1, 
-                                                field_filter,
-                                                f,
-                                                rootcall,
-                                                max_depth,
-                                                rels,
-                                                fos)
-                fos.remove(type(fobj))
+            if type(fo) is trav.base_type:
+                pass
+            elif (type(fo), fo.pk) in trav.path:
+                trav.pruned = True
+            else:
+                fkDict[f] = _foreign_obj_to_dict(trav, fo, depth+1, f)
         elif isinstance(fo, File):
             fkDict[f] = fo.name  
         else: 
             fkDict[f] = fobj.serializable_value(f)
     if getattr(settings, 'HYPERLINK_VALUES', True):
-        fkDict["url"] = hyperlinkerize(fkDict[getattr(fobj, 
-                                                      'unique_id', 
-                                                      'id')
-                                              ], 
-                                       rootcall, 
+        fkDict["url"] = hyperlinkerize(fobj.serializable_value(
+                                                getattr(fobj, 'unique_id', 'id')
+                                                                ), 
+                                       trav.rootcall, 
                                        getattr(fobj, 'url_path', '')
                                        ) 
+    trav.path.discard(ident)
+    if not trav.pruned:
+        trav.converted[key] = fkDict
+    #the objects this one is nested in depend on the path as well
+    trav.pruned = trav.pruned or pruned
     return fkDict
 
-def _foreign_rel_to_dict(base_type, 
-                         frel, 
-                         depth,
-                         field_filter,
-                         field, 
-                         rootcall, 
-                         max_depth=0, 
-                         rels=set()
-                         ):
+def _foreign_rel_to_dict(trav, frel, depth, field):
     """
     Expands all of the objects in a relation field. This could be a many-to-many, 
     or a many-to-one relationship.
     """
-    rels.add(type(frel))
-    fks = []
+    if trav.max_depth <= depth:
+        return []
+    out = []
     for fk in frel.all():
-        if max_depth > depth:
-            fkDict = _foreign_obj_to_dict(base_type, 
-                                          fk, 
-                                          depth+1, 
-                                          field_filter,
-                                          field,
-                                          rootcall, 
-                                          max_depth, 
-                                          rels)
-            fks.append(fkDict)
-    return fks
+        if (type(fk), fk.pk) in trav.path:
+            trav.pruned = True
+        else:
+            out.append(_foreign_obj_to_dict(trav, fk, depth+1, field))
+    return out
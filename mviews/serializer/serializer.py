@@ -12,9 +12,34 @@ To make this possible, a few more attributes must be added to a model:
 """
 
 from django.http.response import HttpResponse as resp
+from django.http.response import StreamingHttpResponse as sresp
+
+from mviews.errors import ParamError
 
 from .serializers import _serialize_json
+from .serializers import _stream_csv
+from .serializers import _stream_json
+from .serializers import _stream_ndjson
+from .utils import encode_cursor
+
+#content types that are always streamed a row at a time, with their serializer
+streamed_types = (
+                  ("application/x-ndjson", _stream_ndjson),
+                  ("text/csv", _stream_csv)
+                  )
 
+def streamed_content_type(accept):
+    """
+    Get the streamed content type asked for in the Accept header.
+    
+    @param accept: the Accept header of the request
+    @return the content type and its serializer, or None for both if the 
+        Accept header is not for a streamed type
+    """
+    for ct, streamer in streamed_types:
+        if ct in accept:
+            return ct, streamer
+    return None, None
 
 def serialize(mview, qs, serializer=None, rootcall='', extra = None):
     """
@@ -38,24 +63,56 @@ def serialize(mview, qs, serializer=None, rootcall='', extra = None):
         return serializer(qs)
 #     if "xml" in mview.accept:
 #         return _serialize_xml(qs, rootcall)
+    return _serialize_json(qs, **_serializer_kwargs(mview, rootcall, extra))
+
+def _serializer_kwargs(mview, rootcall='', extra = None):
+    """
+    Get the keyword arguments that the serializers need from the mview.
+    
+    @param mview: the mview object
+    @param rootcall: the root of the call to use in hyperlinked returns
+    @param extra: any extra data to serialize that is not apart of the mview
+    @return the dictionary of keyword arguments
+    """
     if mview.fields:
         #get all of the field names specified and in the model
         field_names = set(mview.fields).intersection(mview.field_names)
     else:
         field_names = set(mview.field_names)  
-    return _serialize_json(qs,
-                           field_names, 
-                           unique_id=mview.unique_id,
-                           depth=mview.sdepth,
-                           paginate=mview.params.get('_limit', 
-                                                     getattr(mview, 
-                                                             '__paginate',
-                                                              0)
-                                                     ),
-                           page=mview.params.get('_page', 1),
-                           rootcall=rootcall, 
-                           url_path=mview.url_path,
-                           extra=extra)
+    cursor, cursor_key = _get_cursor(mview)
+    return dict(fields=field_names, 
+                unique_id=mview.unique_id,
+                depth=mview.sdepth,
+                paginate=mview.params.get('_limit', 
+                                          getattr(mview, 
+                                                  '__paginate',
+                                                  0)
+                                          ),
+                page=mview.params.get('_page', 1),
+                rootcall=rootcall, 
+                url_path=mview.url_path,
+                extra=extra,
+                cursor=cursor,
+                cursor_key=cursor_key,
+                count='_count' in mview.params,
+                normalize=getattr(mview, '_mv_normalize', False))
+
+def _get_cursor(mview):
+    """
+    Get the cursor and the key to page by if the request asked for keyset
+    pagination with the _cursor or _after query params. The _cursor is the
+    opaque cursor given in a previous page, the _after is the raw value of
+    the key to start after.
+    
+    @return the cursor and the key, or None for both if not paging by key
+    """
+    params = mview.params
+    if '_cursor' in params:
+        return params['_cursor'], mview._mv_spec.cursor_key
+    if '_after' in params:
+        return (encode_cursor('n', params['_after'] or None), 
+                mview._mv_spec.cursor_key)
+    return None, None
     
 def serialize_to_response(mview, qs, serializer=None, rootcall='', extra = None):
     """
@@ -70,6 +127,12 @@ def serialize_to_response(mview, qs, serializer=None, rootcall='', extra = None)
     a custom serializer, you must set the response's content_type to the
     correct content_type manually.
     
+    If the mview is streaming (see BaseModelAsView._mv_stream) then a 
+    StreamingHttpResponse is returned instead and the queryset is read and 
+    encoded in chunks. Asking for application/x-ndjson or text/csv in the
+    Accept header always streams; text/csv cannot be expanded (see 
+    _stream_csv).
+    
     It is assumed that the models have added the proper attributes to fit in
     with this packages idea of what a model should look like.
     
@@ -80,6 +143,17 @@ def serialize_to_response(mview, qs, serializer=None, rootcall='', extra = None)
     @param extra: any extra data to serialize that is not apart of the mview
     @return a response object with the serialized data as payload
     """
+    if serializer is None and getattr(mview, '_mv_stream', False):
+        kwargs = _serializer_kwargs(mview, rootcall, extra)
+        kwargs['chunk_key'] = mview._mv_spec.cursor_key
+        kwargs['chunk_size'] = mview._mv_stream_chunk_size
+        ct, streamer = streamed_content_type(mview.accept)
+        if streamer is None:
+            ct, streamer = "application/json", _stream_json
+        elif ct == "text/csv" and kwargs['depth']:
+            raise ParamError("The _depth and _expand params are not supported "
+                             "for text/csv, which has no nested objects.")
+        return sresp(streamer(qs, **kwargs), content_type=ct)
     retData = serialize(mview, qs, serializer, rootcall, extra)
     if "xml" in mview.accept:
         ct = "application/xml"
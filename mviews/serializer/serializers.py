@@ -6,15 +6,30 @@ Created on Nov 11, 2015
 Methods that will do the actual serialization of data.
 '''
 
-import json
+import csv
 
 from django.conf import settings
-from django.core.serializers.json import DjangoJSONEncoder as djson
 
 from .models2dicts import convert_to_dicts as c2d
+from .models2dicts import convert_to_normalized as c2n
+from .encoders import dumps
+from .utils import chunked
 from .utils import create_paging_dict
 from .utils import hyperlinkerize
 
+def _asked_for(rows, fields):
+    """
+    Drop the values of the rows (of a values queryset) that are not in the 
+    fields, ie. the cursor key that is selected to find the next page or 
+    chunk when it was not asked for.
+    """
+    rows = list(rows)
+    if rows and isinstance(rows[0], dict) and not fields.issuperset(rows[0]):
+        for r in rows:
+            for k in set(r) - fields:
+                del r[k]
+    return rows
+
 def _serialize_json(qs, 
                     fields, 
                     unique_id='id', 
@@ -23,7 +38,11 @@ def _serialize_json(qs,
                     page=1, 
                     rootcall='', 
                     url_path='', 
-                    extra = None
+                    extra = None,
+                    cursor = None,
+                    cursor_key = None,
+                    count = False,
+                    normalize = False
                     ):
     """
     Serialize a queryset into json. If expand is true, will treat the qs as 
@@ -34,27 +53,43 @@ def _serialize_json(qs,
     Any extra values retrieved before serialization but not apart of the 
     mview can be passed with the extra param. This needs to be json serializable
     data.
+    
+    If a cursor_key is passed in, the queryset is paged by that key with the
+    cursor instead of by page number. See create_cursor_paging_dict.
+    
+    If normalize is true and there is a depth, the related objects are put
+    once each in the included object instead of in every object that points 
+    to them. See convert_to_normalized.
     """
-    return_single = (len(qs) > 1 
-                     or paginate 
+    paged = paginate or cursor_key is not None
+    normalize = normalize and depth
+    return_single = (paged
+                     or normalize
                      or not getattr(settings, "RETURN_SINGLES", True)
+                     or len(qs) > 1 
                      )
     
-    if paginate:
+    if paged:
         qs, rslt = create_paging_dict(qs, 
                                       url_path, 
-                                      paginate, 
+                                      paginate or 10, 
                                       page, 
-                                      rootcall
+                                      rootcall,
+                                      cursor=cursor,
+                                      key=cursor_key,
+                                      count=count
                                       )
         rslt["data"] = []
     else:
         rslt = {"count" : len(qs), "data" : []}
     if not depth:  
+        rows = _asked_for(qs, fields)
         if return_single:
-            rslt["data"] = list(qs)
+            rslt["data"] = rows
         else:
-            rslt = list(qs)[0] if len(qs) > 0 else rslt
+            rslt = rows[0] if rows else rslt
+    elif normalize:
+        rslt["data"], rslt["included"] = c2n(qs, fields, depth, rootcall)
     else:  
         vals = c2d(qs, fields, depth, rootcall)
         if return_single:
@@ -73,7 +108,148 @@ def _serialize_json(qs,
                                           url_path) 
     if extra is not None:
         rslt['extra'] = extra
-    return json.dumps(rslt, cls=djson)
+    return dumps(rslt)
+
+def _stream_json(qs, 
+                 fields, 
+                 unique_id='id', 
+                 depth=0, 
+                 paginate=0, 
+                 page=1, 
+                 rootcall='', 
+                 url_path='', 
+                 extra = None,
+                 cursor = None,
+                 cursor_key = None,
+                 count = False,
+                 normalize = False,
+                 chunk_key = 'id',
+                 chunk_size = 2000
+                 ):
+    """
+    Serialize a queryset into json a piece at a time. This returns a generator
+    that is meant to be passed to a StreamingHttpResponse so that the whole 
+    queryset is never in memory. It produces the same object as 
+    _serialize_json, except that 1-length querysets are not returned as a 
+    single object and the count is written after the data (since it is not 
+    known until all the data is written).
+    
+    If the queryset is not paginated, it is read in chunks of chunk_size 
+    ordered by the chunk_key. See chunked for more info.
+    
+    When normalizing, the included object is written after the data as well,
+    so it is held in memory until then.
+    
+    The page is read before the generator is returned, so that a bad cursor
+    or paging param raises a ParamError here instead of once the response 
+    has started.
+    """
+    if paginate or cursor_key is not None:
+        page_qs, rslt = create_paging_dict(qs, 
+                                           url_path, 
+                                           paginate or 10, 
+                                           page, 
+                                           rootcall,
+                                           cursor=cursor,
+                                           key=cursor_key,
+                                           count=count
+                                           )
+        chunks = (page_qs,)
+    else:
+        rslt = {}
+        chunks = chunked(qs, chunk_key, chunk_size)
+    return _write_json(chunks, rslt, fields, unique_id, depth, rootcall, 
+                       url_path, extra, normalize)
+
+def _write_json(chunks, rslt, fields, unique_id, depth, rootcall, url_path, 
+                extra, normalize):
+    """
+    Generate the json of _stream_json from the chunks of the queryset and the
+    paging dictionary.
+    """
+    hyperlinks = getattr(settings, 'HYPERLINK_VALUES', True) and not fields
+    yield b'{"data" : ['
+    written = 0
+    included = {} if normalize and depth else None
+    for chunk in chunks:
+        if included is not None:
+            vals = c2n(chunk, fields, depth, rootcall, included)[0]
+        else:
+            vals = (c2d(chunk, fields, depth, rootcall) if depth 
+                    else _asked_for(chunk, fields))
+        out = []
+        for r in vals:
+            if hyperlinks:
+                r["url"] = hyperlinkerize(r[unique_id], rootcall, url_path) 
+            out.append(dumps(r))
+        if out:
+            yield (b',' if written else b'') + b','.join(out)
+            written += len(out)
+    if "next_cursor" not in rslt: #see create_cursor_paging_dict
+        rslt["count"] = written
+    if included is not None:
+        rslt["included"] = included
+    if extra is not None:
+        rslt['extra'] = extra
+    yield b'], ' + dumps(rslt)[1:]
+
+def _rows(qs, fields, depth=0, rootcall='', chunk_key='id', chunk_size=2000):
+    """
+    Generate the rows of the queryset one at a time as dictionaries, reading 
+    them from the database in chunks. See chunked for more info.
+    """
+    for chunk in chunked(qs, chunk_key, chunk_size):
+        for r in (c2d(chunk, fields, depth, rootcall) if depth 
+                  else _asked_for(chunk, fields)):
+            yield r
+
+def _stream_ndjson(qs, 
+                   fields, 
+                   depth=0, 
+                   rootcall='', 
+                   chunk_key='id', 
+                   chunk_size=2000, 
+                   **kwargs
+                   ):
+    """
+    Serialize a queryset into newline delimited json (one json object per 
+    line) a row at a time. There is no envelope, so paging and extra data are
+    not written.
+    """
+    for r in _rows(qs, fields, depth, rootcall, chunk_key, chunk_size):
+        yield dumps(r) + b'\n'
+
+class _Echo(object):
+    """
+    A file-like object for the csv writer that returns what is written instead
+    of holding on to it.
+    """
+    
+    def write(self, value):
+        return value
+
+def _stream_csv(qs, 
+                fields, 
+                depth=0, 
+                rootcall='', 
+                chunk_key='id', 
+                chunk_size=2000, 
+                **kwargs
+                ):
+    """
+    Serialize a queryset into csv a row at a time. The header is made from the
+    fields of the first row. The rows are never expanded (the depth is 
+    ignored) since a cell cannot hold a nested object; serialize_to_response
+    answers a request for them with a 400. There is no envelope, so paging 
+    and extra data are not written.
+    """
+    writer = csv.writer(_Echo())
+    header = None
+    for r in _rows(qs, fields, 0, rootcall, chunk_key, chunk_size):
+        if header is None:
+            header = list(r.keys())
+            yield writer.writerow(header)
+        yield writer.writerow([r.get(h) for h in header])
 
 def _serialize_xml(mview, qs, expand):
     """
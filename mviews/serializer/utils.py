@@ -7,10 +7,17 @@ Utility functions to be used in the seriliazation framework. These generally
 are not useful except within this framework.
 '''
 
+from base64 import urlsafe_b64decode
+from base64 import urlsafe_b64encode
+import json
 import math
 
 from django.conf import settings
 
+from mviews.errors import ParamError
+
+from .encoders import dumps
+
 
 def hyperlink(rootcall, path, append = ''):
     """
@@ -63,10 +70,14 @@ def paginator(queryset, limit=10, page_num=1):
         to_return = limit = 10 if int(limit) <= 0 else int(limit)
     except TypeError:
         to_return = limit = 10
+    except ValueError as e:
+        raise ParamError("Not a valid limit: {}".format(e))
     try:
         page_num = int(page_num)
     except TypeError:
         page_num = 1
+    except ValueError as e:
+        raise ParamError("Not a valid page: {}".format(e))
     count = queryset.count()
     number_pages = max(math.floor(count/ limit), 2 if count > limit else 1)
     page_num = page_num if page_num <= number_pages else number_pages
@@ -81,20 +92,189 @@ def paginator(queryset, limit=10, page_num=1):
                                   "limit" : limit,
                                   "returned" : to_return}
     
-def create_paging_dict(qs, path="/", limit=1, page=1, rootcall=''):
+def chunked(queryset, key, chunk_size=2000):
+    """
+    Iterate over the queryset in chunks of at most chunk_size entities so that
+    only one chunk is held in memory at a time. Each chunk is found by its key
+    (like in cursor_paginator) so it is as cheap to get as the first. This
+    means the queryset will be ordered by the key, which should be unique.
+    
+    If the queryset is a list it is yielded as the only chunk.
+    
+    @param queryset: the queryset to iterate over
+    @param key: the name of the field to chunk by
+    @param chunk_size: the max number of entities in a chunk
+    @return a generator of evaluated querysets
+    """
+    if not hasattr(queryset, 'filter'):
+        yield queryset
+        return
+    queryset = queryset.order_by(key)
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(**{key + '__gt' : last})
+        chunk = chunk[:chunk_size]
+        rows = list(chunk) #fills the result cache of the chunk
+        if rows:
+            yield chunk
+        if len(rows) < chunk_size:
+            return
+        last = _key_value(rows[-1], key)
+
+def encode_cursor(direction, value):
+    """
+    Make an opaque cursor out of the direction to page in and the value of the
+    key to page from.
+
+    @param direction: 'n' to get the entities after the value, 'p' for before
+    @param value: the value of the cursor key to page from
+    @return the cursor as a url-safe string
+    """
+    raw = dumps([direction, value])
+    return urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor. An empty cursor is the first page.
+
+    @param cursor: the cursor string sent back by the client
+    @return the direction and the value of the key to page from
+    """
+    if not cursor:
+        return 'n', None
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, value = json.loads(raw.decode('utf-8'))
+    except (TypeError, ValueError) as e:
+        raise ParamError("Not a valid cursor: {}".format(e))
+    if direction not in ('n', 'p'):
+        raise ParamError("Not a valid cursor: {}".format(cursor))
+    return direction, value
+
+def _key_value(obj, key):
+    """
+    Get the value of the key from a row, be it a dictionary or a model.
+    """
+    if isinstance(obj, dict):
+        return obj[key]
+    return getattr(obj, key)
+
+def cursor_paginator(queryset, key, limit=10, cursor=None):
+    '''
+    Keyset pagination of the queryset. Instead of an OFFSET the page is found
+    by filtering on the key and ordering by it, so any page costs the same as
+    the first one as long as the key is indexed. The key should be unique
+    (like the pk) or entities could be skipped.
+
+    One more entity than the limit is fetched to know if there is another page
+    without having to count the queryset.
+
+    @param queryset: the queryset to paginate
+    @param key: the name of the field to page by
+    @param limit: the limit of the entities in the page
+    @param cursor: the cursor from a previous page, or None for the first page
+    @return the page as a list
+    @return a dictionary of values: {next_cursor: the cursor of the next page,
+                previous_cursor: the cursor of the previous page,
+                limit: number of entities for page,
+                returned: number of entities in the page}
+    '''
+    try:
+        limit = 10 if int(limit) <= 0 else int(limit)
+    except (TypeError, ValueError):
+        limit = 10
+    direction, value = decode_cursor(cursor)
+    if direction == 'n':
+        if value is not None:
+            queryset = queryset.filter(**{key + '__gt' : value})
+        rows = list(queryset.order_by(key)[:limit + 1])
+    else:
+        queryset = queryset.filter(**{key + '__lt' : value})
+        rows = list(queryset.order_by('-' + key)[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'p':
+        rows.reverse()
+    has_next = more if direction == 'n' else bool(rows)
+    has_previous = more if direction == 'p' else value is not None
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor('n', _key_value(rows[-1], key))
+    if rows and has_previous:
+        previous_cursor = encode_cursor('p', _key_value(rows[0], key))
+    return rows, {"next_cursor" : next_cursor,
+                  "previous_cursor" : previous_cursor,
+                  "limit" : limit,
+                  "returned" : len(rows)}
+
+def create_cursor_paging_dict(qs, key, path="/", limit=10, cursor=None,
+                              rootcall='', count=False):
+    """
+    Create the paging dictionary for keyset pagination. Works like
+    create_paging_dict, except the next and previous links carry an opaque
+    _cursor param instead of a page number. Since counting a large table is
+    as costly as scanning it, the total is only added if count is True. 
+    There is no count either, since it would not be the total; the number 
+    of entities in the page is number_returned.
+
+    @param qs: the queryset to paginate
+    @param key: the name of the field to page by
+    @param path: the path to the view for the hyperlink to the next page
+    @param limit: the limit of the items to return (default 10)
+    @param cursor: the cursor of the page to return, None for the first page
+    @param rootcall: the protocol-domain combo as string
+    @param count: add the total_entities to the paging dict if True
+    @return the page and the paging dict
+    """
+    total = qs.count() if count else None
+    rows, paging = cursor_paginator(qs, key, limit, cursor)
+
+    def link(c):
+        if c is None:
+            return None
+        return hyperlink(rootcall,
+                         path,
+                         '?_cursor={}&_limit={}'.format(c, paging["limit"])
+                         )
+
+    rslt = {
+           "number_per_page" : paging["limit"],
+           "number_returned" : paging["returned"],
+           "next_cursor" : paging["next_cursor"],
+           "previous_cursor" : paging["previous_cursor"],
+           "next" : link(paging["next_cursor"]),
+           "previous" : link(paging["previous_cursor"])
+           }
+    if total is not None:
+        rslt["total_entities"] = total
+    return rows, rslt
+
+def create_paging_dict(qs, path="/", limit=1, page=1, rootcall='',
+                       cursor=None, key=None, count=False):
     """
     Create the paging dictionary used for returns to the client. It will also
     output the paginated queryset. You can also pass in a path that will make
     a hyperlink if the HYPERLINK_VALUES is set to true. If not passed in, will
     create a URL with no path.
-    
+
+    If a key is passed in, keyset pagination is used instead of page numbers
+    (see create_cursor_paging_dict) and the page param is ignored.
+
     @param qs: the queryset to paginate
     @param path: the path to the view for the hyperlink to the next page
     @param limit: the limit of the items to return (default 10)
     @param page: the page of the items to return (default 1)
     @param rootcall: the protocol-domain combo as string
+    @param cursor: the cursor of the page to return when paging by key
+    @param key: the field to page by; if None pages by page number
+    @param count: add the total count when paging by key
     @return the new queryset and the paging dict
     """
+    if key is not None:
+        return create_cursor_paging_dict(qs, key, path, limit, cursor,
+                                         rootcall, count)
     qs, paging = paginator(qs, limit, page)  
     page_count = paging.get("number_of_pages", 1)
     page_number = paging.get("page_num", 1)
@@ -4,13 +4,16 @@ Created on Aug 27, 2015
 @author: derigible
 '''
 
+from codecs import getincrementaldecoder
 from datetime import datetime as dt
+from json import JSONDecoder
 from json import loads as load
-from json import dumps as d
 import os
 
 from django.conf import settings
-from django.http.response import JsonResponse as jr
+from django.http.response import HttpResponse
+
+from mviews.serializer.encoders import dumps
 
 
 def err(msg, status = 400):
@@ -21,9 +24,22 @@ def err(msg, status = 400):
     @param status: the status code of the error
     @return the HttpResponse object
     '''
-    resp = jr(d({"err" : "{}".format(msg)}), status = status)
+    resp = json_response({"err" : "{}".format(msg)}, status = status)
     resp.reason_phrase = msg
     return resp
+
+def json_response(data, status = 200):
+    '''
+    Send a json response encoded with the project's json encoder (see 
+    mviews.serializer.encoders).
+    
+    @param data: the data to encode
+    @param status: the status code of the response
+    @return the HttpResponse object
+    '''
+    return HttpResponse(dumps(data), 
+                        content_type = "application/json", 
+                        status = status)
     
 def read(request):
     '''
@@ -40,6 +56,151 @@ def read(request):
         except ValueError as e:
             raise ValueError("Not a valid json object: {}".format(e))
     return d
+
+class _JsonStream(object):
+    '''
+    Reads json values one at a time from a file-like object (ie. the request)
+    keeping only the unparsed part of the payload in memory.
+    '''
+    
+    _decoder = JSONDecoder()
+    _number_chars = '0123456789.eE+-'
+    
+    def __init__(self, stream, chunk_size, max_value_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_value_size = max_value_size
+        self.text = getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self, size=None):
+        '''
+        Read the next chunk of the stream into the buffer, dropping what has
+        already been parsed.
+        
+        @param size: the number of bytes to read, or None for the chunk_size
+        @return False if the stream has been read to the end
+        '''
+        if self.eof:
+            return False
+        chunk = self.stream.read(size or self.chunk_size)
+        self.eof = not chunk
+        self.buf = self.buf[self.pos:] + self.text.decode(chunk, self.eof)
+        self.pos = 0
+        return True
+        
+    def peek(self):
+        '''
+        Skip the whitespace and get the next character, or '' at the end.
+        '''
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+    
+    def expect(self, chars):
+        '''
+        Read the next character, which must be one of chars.
+        '''
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError("Not a valid json object: expected {} at {!r}"
+                             .format(' or '.join(chars), 
+                                     self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+        return c
+    
+    def value(self, max_size=None):
+        '''
+        Read the next json value, reading more of the stream until the value
+        is complete. The value may be at most max_size characters if given, 
+        so that a payload that is not valid json is not read into memory 
+        whole.
+        '''
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except ValueError as e:
+                pending = len(self.buf) - self.pos
+                if max_size is not None and pending > max_size:
+                    raise ValueError("Not a valid json object, or a value is "
+                                     "longer than {} characters: {}"
+                                     .format(max_size, e))
+                #reading as much again as is pending keeps a large value from
+                #being decoded once for every chunk
+                if self._fill(max(self.chunk_size, pending)):
+                    continue
+                raise ValueError("Not a valid json object: {}".format(e))
+            #a number at the end of the buffer may go on in the next chunk
+            if (isinstance(value, (int, float)) 
+                    and not self.buf[end:].strip(self._number_chars)
+                    and self._fill()):
+                continue
+            self.pos = end
+            return value
+    
+    def array(self):
+        '''
+        Iterate over the elements of the json array that is next.
+        '''
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value(self.max_value_size)
+            if self.expect(',]') == ']':
+                return
+
+def _read_rest(js, d, items):
+    '''
+    Iterate over the elements of the list of read_stream, then read the keys
+    of the payload that are after the list into the payload.
+    '''
+    for item in items:
+        yield item
+    while js.expect(',}') == ',':
+        k = js.value()
+        js.expect(':')
+        d[k] = js.value()
+
+def read_stream(request, key='data', chunk_size=64 * 1024, 
+                max_value_size=1024 * 1024):
+    '''
+    Read the payload incrementally. Like read, except that if the value of 
+    the key is a list its elements are parsed one at a time as they are 
+    iterated over, so that the payload is never held in memory all at once.
+    This can only be iterated over once. The keys of the payload after the 
+    list are only in the payload once the list has been iterated over to the
+    end.
+    
+    @param request: the request object to read
+    @param key: the key of the list to iterate over
+    @param chunk_size: the number of bytes to read from the request at a time
+    @param max_value_size: the most characters an element of the list may
+        be; the other values of the payload are read whole, as read would
+    @return the decoded request payload
+    '''
+    js = _JsonStream(request, chunk_size, max_value_size)
+    d = {}
+    if not js.peek():
+        return d
+    js.expect('{')
+    if js.peek() == '}':
+        return d
+    while True:
+        k = js.value()
+        js.expect(':')
+        if k == key and js.peek() == '[':
+            d[k] = _read_rest(js, d, js.array())
+            return d
+        d[k] = js.value()
+        if js.expect(',}') == '}':
+            return d
     
 def make_new_dir(dir_append = []):
     '''
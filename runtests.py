@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+'''
+Run the tests of mviews against the settings in tests/settings.py:
+
+    python runtests.py [<test label>...]
+'''
+
+import os
+import sys
+
+import django
+from django.conf import settings
+from django.test.utils import get_runner
+
+
+if __name__ == '__main__':
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'tests.settings'
+    django.setup()
+    TestRunner = get_runner(settings)
+    failures = TestRunner().run_tests(sys.argv[1:] or ['tests'])
+    sys.exit(bool(failures))
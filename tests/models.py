@@ -0,0 +1,85 @@
+'''
+The models the tests are run against.
+'''
+
+from django.db import models as m
+
+from mviews.mview.modelviews import ModelAsView
+from mviews.mview.modelviews import UserModelAsView
+
+
+class User(UserModelAsView):
+    '''
+    A user with the levels of the permissions.
+    '''
+    level_by_name = {"student" : 0, "teacher" : 1, "admin" : 5}
+    levels = {0 : "student", 1 : "teacher", 5 : "admin"}
+    USERNAME_FIELD = 'email'
+
+class Author(ModelAsView):
+    '''
+    An author of books.
+    '''
+    name = m.CharField(max_length = 50, unique = True)
+    _perms = {"delete" : "teacher"}
+    _stream_requests = True
+
+class Note(ModelAsView):
+    '''
+    A note, deleted 2 at a time.
+    '''
+    text = m.CharField(max_length = 100)
+    deleted = m.BooleanField(default = False)
+    _delete_batch_size = 2
+    _stream_requests = True
+
+class Tag(ModelAsView):
+    '''
+    A tag whose responses are cached.
+    '''
+    name = m.CharField(max_length = 50)
+    _cache_timeout = 60
+
+class Event(ModelAsView):
+    '''
+    An event that answers conditional GETs.
+    '''
+    name = m.CharField(max_length = 50)
+    updated = m.DateTimeField(auto_now = True)
+    _conditional_get = True
+    _last_modified_field = 'updated'
+
+class Profile(ModelAsView):
+    '''
+    The profile of an author, if they have one.
+    '''
+    author = m.OneToOneField(Author, related_name = 'profile')
+    bio = m.TextField(blank = True)
+
+class Price(ModelAsView):
+    '''
+    A price looked up by its code.
+    '''
+    code = m.DecimalField(max_digits = 5, decimal_places = 2, unique = True)
+    label = m.CharField(max_length = 50)
+    tags = m.ManyToManyField('Tag', blank = True)
+
+class Node(m.Model):
+    '''
+    A node of a linked list, which may be a cycle.
+    '''
+    name = m.CharField(max_length = 50)
+    next = m.ForeignKey('self', null = True, related_name = '+')
+
+class Shelf(m.Model):
+    '''
+    Points to the first node of a list.
+    '''
+    first = m.ForeignKey(Node, related_name = '+')
+
+class Book(ModelAsView):
+    '''
+    A book of an author, with its tags.
+    '''
+    author = m.ForeignKey(Author, related_name = 'books')
+    tags = m.ManyToManyField(Tag)
@@ -0,0 +1,39 @@
+'''
+The settings the tests are run with (see runtests.py).
+'''
+
+import tempfile
+
+
+SECRET_KEY = 'mviews-tests'
+
+INSTALLED_APPS = [
+                  'django.contrib.auth',
+                  'django.contrib.contenttypes',
+                  'django.contrib.sessions',
+                  'mviews.mauth',
+                  'mviews.jobs',
+                  'mviews.router',
+                  'tests',
+                  ]
+
+DATABASES = {
+             'default' : {
+                          'ENGINE' : 'django.db.backends.sqlite3',
+                          'NAME' : ':memory:',
+                          }
+             }
+
+MIDDLEWARE_CLASSES = [
+                      'django.contrib.sessions.middleware.SessionMiddleware',
+                      'django.middleware.csrf.CsrfViewMiddleware',
+                      'django.contrib.auth.middleware.AuthenticationMiddleware',
+                      ]
+
+ROOT_URLCONF = 'tests.urls'
+
+AUTH_USER_MODEL = 'tests.User'
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix = 'mviews-tests-')
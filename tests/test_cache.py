@@ -0,0 +1,94 @@
+import json
+import time
+from unittest.mock import ANY
+from unittest.mock import patch
+
+from django.db.models.deletion import Collector
+from django.test import TestCase
+from django.test import override_settings
+
+from mviews.mview import cache
+from mviews.mview.cache import connect_receivers
+from tests.models import Event
+from tests.models import Note
+from tests.models import Tag
+from tests.models import User
+
+
+class CacheTest(TestCase):
+    
+    def setUp(self):
+        connect_receivers()
+        self.tag = Tag.objects.create(name = 'old')
+    
+    def get_name(self):
+        resp = self.client.get('/models/tag/{}/'.format(self.tag.pk))
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(resp.content.decode())["name"]
+    
+    def login(self, email):
+        User.objects.create_user(email, 'pass')
+        self.client.login(username = email, password = 'pass')
+    
+    def test_invalidated_on_save(self):
+        self.assertEqual(self.get_name(), 'old')
+        self.tag.name = 'new'
+        self.tag.save()
+        self.assertEqual(self.get_name(), 'new')
+    
+    def test_cached_by_user(self):
+        self.login('a@example.com')
+        self.assertEqual(self.get_name(), 'old')
+        #sends no signals, so the cached response is not invalidated
+        Tag.objects.filter(pk = self.tag.pk).update(name = 'new')
+        self.assertEqual(self.get_name(), 'old')
+        self.login('b@example.com')
+        self.assertEqual(self.get_name(), 'new')
+    
+    def test_unwatched_fast_delete(self):
+        self.assertTrue(Collector(using = 'default')
+                        .can_fast_delete(Note.objects.all()))
+
+
+class ConditionalGetTest(TestCase):
+    
+    def setUp(self):
+        connect_receivers()
+        self.old = Event.objects.create(name = 'old')
+        Event.objects.create(name = 'new')
+    
+    def get(self, **headers):
+        return self.client.get('/models/event/', **headers)
+    
+    def test_if_none_match(self):
+        etag = self.get()['ETag']
+        resp = self.get(HTTP_IF_NONE_MATCH = etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+        Event.objects.create(name = 'newer')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH = etag).status_code, 200)
+    
+    def test_if_modified_since(self):
+        since = self.get()['Last-Modified']
+        resp = self.get(HTTP_IF_MODIFIED_SINCE = since)
+        self.assertEqual(resp.status_code, 304)
+    
+    @patch('mviews.mview.cache.time')
+    def test_older_deleted(self, clock):
+        clock.time.return_value = time.time()
+        since = self.get()['Last-Modified']
+        #sends no signals and leaves the max of updated as it was
+        Event.objects.filter(pk = self.old.pk)._raw_delete('default')
+        clock.time.return_value += 10
+        resp = self.get(HTTP_IF_MODIFIED_SINCE = since)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.content.decode())["name"], 'new')
+    
+    @override_settings(MVIEWS_SEEN_TIMEOUT = 60)
+    @patch('mviews.mview.cache._cache')
+    def test_seen_expires(self, cached):
+        cached.return_value.get.return_value = None
+        cache._first_seen('"x"')
+        cached.return_value.add.assert_called_once_with('mviews:seen:"x"', 
+                                                        ANY, 
+                                                        60)
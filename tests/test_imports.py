@@ -0,0 +1,76 @@
+import json
+
+from django.test import TestCase
+
+from tests.models import Price
+
+
+def loads(resp):
+    return json.loads(resp.content.decode())
+
+
+class ImportTest(TestCase):
+    
+    def send(self, body, content_type, query = ''):
+        return self.client.post('/models/price/' + query,
+                                body,
+                                content_type = content_type)
+    
+    def ndjson(self, rows, query = ''):
+        body = '\n'.join(r if isinstance(r, str) else json.dumps(r)
+                         for r in rows)
+        return self.send(body, 'application/x-ndjson', query)
+    
+    def test_ndjson(self):
+        resp = self.ndjson([{"code" : "1.00", "label" : "a"},
+                            '{"code" : ',
+                            {"code" : "2.00", "label" : "x" * 51},
+                            {"label" : "no code"},
+                            {"code" : "3.00", "nope" : 1},
+                            {"code" : "x", "label" : "b"},
+                            {"code" : "4.00", "label" : "c"}])
+        self.assertEqual(resp.status_code, 200)
+        counts = loads(resp)
+        self.assertEqual((counts["inserted"], counts["rejected"]), (2, 5))
+        self.assertEqual([e["line"] for e in counts["errors"]],
+                         [2, 3, 4, 5, 6])
+        self.assertIn("code is required", counts["errors"][2]["err"])
+        self.assertEqual(sorted(Price.objects.values_list('label', flat = True)),
+                         ['a', 'c'])
+    
+    def test_csv(self):
+        resp = self.send('code,label\n1.00,a\n,b\n2.00,c\n', 'text/csv')
+        self.assertEqual(resp.status_code, 200)
+        counts = loads(resp)
+        self.assertEqual((counts["inserted"], counts["rejected"]), (2, 1))
+        self.assertEqual(counts["errors"][0]["line"], 3)
+    
+    def test_upsert(self):
+        Price.objects.create(code = 1, label = 'a')
+        resp = self.ndjson([{"code" : "1.00", "label" : "b"},
+                            {"code" : "2.00", "label" : "c"}],
+                           '?_upsert=code')
+        counts = loads(resp)
+        self.assertEqual((counts["inserted"], counts["updated"]), (1, 1))
+        self.assertEqual(Price.objects.get(code = 1).label, 'b')
+    
+    def test_database_error(self):
+        rows = [{"code" : "1.00", "label" : "a"},
+                {"code" : "1.00", "label" : "b"},
+                {"code" : "2.00", "label" : "c"}]
+        resp = self.ndjson(rows)
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(Price.objects.exists())
+        resp = self.ndjson(rows, '?_commit=batch&_batch_size=1')
+        self.assertEqual(resp.status_code, 200)
+        counts = loads(resp)
+        self.assertEqual((counts["inserted"], counts["rejected"]), (2, 1))
+        self.assertEqual(counts["errors"][0]["line"], 2)
+        self.assertEqual(Price.objects.count(), 2)
+    
+    def test_options(self):
+        resp = self.client.options('/models/price/')
+        self.assertEqual(loads(resp)["accepts"],
+                         ['application/json',
+                          'application/x-ndjson',
+                          'text/csv'])
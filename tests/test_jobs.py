@@ -0,0 +1,101 @@
+from datetime import timedelta
+import json
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.test import RequestFactory
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from mviews.jobs.models import Job
+from mviews.mview.modelviews import ViewWrapper
+from tests.models import Author
+from tests.models import User
+
+
+def loads(resp):
+    return json.loads(resp.content.decode())
+
+
+class _Inline(object):
+    '''
+    Runs the jobs as they are queued instead of in the worker pool.
+    '''
+    
+    def submit(self, func, *args):
+        func(*args)
+
+
+#the jobs are queued once the transaction of the request commits, which the
+#transaction of a TestCase never does
+@patch('mviews.jobs.utils._get_pool', return_value = _Inline())
+class JobTest(TransactionTestCase):
+    
+    def queue(self, data):
+        return self.client.post('/models/author/?_async=1', 
+                                json.dumps({"data" : data}), 
+                                content_type = 'application/json')
+    
+    def test_run(self, pool):
+        resp = self.queue([{"name" : "a"}, {"name" : "b"}])
+        self.assertEqual(resp.status_code, 202)
+        queued = loads(resp)
+        self.assertTrue(queued["url"].endswith(
+                                    '/mviews/jobs/{}/'.format(queued["job"])))
+        self.assertEqual(resp['Location'], queued["url"])
+        status = loads(self.client.get(queued["url"]))
+        self.assertEqual(status["status"], Job.DONE)
+        self.assertEqual(status["processed"], 2)
+        self.assertEqual(sorted(Author.objects.values_list('name', flat = True)),
+                         ['a', 'b'])
+    
+    def test_body_deleted(self, pool):
+        with patch('mviews.jobs.utils.run_job'):
+            job = Job.objects.get(pk = loads(self.queue([{"name" : "a"}]))["job"])
+        name = job.body.name
+        self.assertTrue(default_storage.exists(name))
+        from mviews.jobs.utils import run_job
+        run_job(job.pk)
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(Job.objects.get(pk = job.pk).body.name, '')
+    
+    def test_user(self, pool):
+        user = User.objects.create_user('a@example.com', 'pass')
+        self.client.login(username = 'a@example.com', password = 'pass')
+        url = loads(self.queue([{"name" : "a"}]))["url"]
+        self.assertEqual(Job.objects.get().user_id, str(user.pk))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        User.objects.create_user('b@example.com', 'pass')
+        self.client.login(username = 'b@example.com', password = 'pass')
+        self.assertEqual(self.client.get(url).status_code, 404)
+    
+    def test_stale(self, pool):
+        job = Job.objects.create(model = 'tests.author', 
+                                 method = 'POST', 
+                                 status = Job.RUNNING,
+                                 heartbeat = timezone.now() - timedelta(hours = 1))
+        status = loads(self.client.get('/mviews/jobs/{}/'.format(job.pk)))
+        self.assertEqual(status["status"], Job.FAILED)
+        self.assertTrue(status["error"])
+    
+    def test_not_installed(self, pool):
+        with self.modify_settings(INSTALLED_APPS = {'remove' : ['mviews.jobs']}):
+            resp = self.queue([{"name" : "a"}])
+        self.assertEqual(resp.status_code, 501)
+    
+    def test_queued_on_commit(self, pool):
+        with patch('mviews.jobs.utils.run_job') as run:
+            with transaction.atomic():
+                job = loads(self.queue([{"name" : "a"}]))["job"]
+                self.assertFalse(run.called)
+            run.assert_called_once_with(job)
+    
+    def test_not_modelview(self, pool):
+        request = RequestFactory().post('/?_async=1')
+        request.user = AnonymousUser()
+        plain = type('Plain', (ViewWrapper,), {"field_names" : ()})
+        resp = plain.as_view()(request)
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(Job.objects.exists())
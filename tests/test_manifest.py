@@ -0,0 +1,105 @@
+from io import StringIO
+import json
+import os
+import tempfile
+from unittest import mock
+import warnings
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.views.generic.base import View
+
+from mviews.router import manifest
+from mviews.router.utils import LazyView
+#the tests app is scanned, so make its routes before the setting is changed
+import tests.urls # @UnusedImport
+from tests import views
+
+
+@override_settings(ROUTE_AUTO_CREATE = 'module_view')
+class ManifestTest(TestCase):
+    
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix = '.json')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+    
+    def test_read(self):
+        manifest.write_manifest(self.path)
+        entries = manifest.read_manifest(self.path)
+        self.assertIn("models/author/([^\\s#?]*)", 
+                      [e.get("route") for e in entries])
+    
+    def change_sources(self):
+        manifest.write_manifest(self.path)
+        with open(self.path) as f:
+            content = json.load(f)
+        content["fingerprint"] = "0"
+        with open(self.path, 'w') as f:
+            json.dump(content, f)
+    
+    @override_settings(ROUTE_MANIFEST_CHECK = True)
+    def test_out_of_date(self):
+        self.change_sources()
+        with warnings.catch_warnings(record = True) as caught:
+            warnings.simplefilter('always')
+            self.assertIsNone(manifest.read_manifest(self.path))
+        self.assertIn("out of date", str(caught[0].message))
+    
+    def test_sources_not_checked(self):
+        self.change_sources()
+        with mock.patch.object(manifest, 'sources_fingerprint') as fingerprint:
+            self.assertTrue(manifest.read_manifest(self.path))
+        self.assertFalse(fingerprint.called)
+    
+    def test_check_command(self):
+        manifest.write_manifest(self.path)
+        call_command('route_manifest', self.path, check = True, 
+                     stdout = StringIO())
+        self.change_sources()
+        with self.assertRaises(CommandError) as caught:
+            call_command('route_manifest', self.path, check = True)
+        self.assertIn("out of date", str(caught.exception))
+    
+    @override_settings(REGISTER_VIEWS_PY_FUNCS = True)
+    def test_decorated_function(self):
+        manifest.write_manifest(self.path)
+        entry = [e for e in manifest.read_manifest(self.path) 
+                 if e.get("route", '').startswith('views/authed/')][0]
+        self.assertEqual(entry["view"], 'tests.views.authed')
+        self.assertIs(LazyView(entry["view"]).view, views.authed)
+    
+    def test_other_auto_create(self):
+        manifest.write_manifest(self.path)
+        with override_settings(ROUTE_AUTO_CREATE = 'app_module_view'):
+            with warnings.catch_warnings(record = True):
+                warnings.simplefilter('always')
+                self.assertIsNone(manifest.read_manifest(self.path))
+    
+    def test_unwritable_kwargs(self):
+        class Unwritable(View):
+            routes = ({"pattern" : "unwritable", 
+                       "kwargs" : {"default" : object()}},)
+        found = [('view', None, Unwritable, 'tests.test_manifest.Unwritable')]
+        with mock.patch.object(manifest, 'scan_installed_apps', 
+                               return_value = found):
+            with self.assertRaises(CommandError) as caught:
+                call_command('route_manifest', self.path)
+        self.assertIn("unwritable", str(caught.exception))
+        self.assertIn("tests.test_manifest.Unwritable", 
+                      str(caught.exception))
+    
+    def test_view_not_made(self):
+        class Broken(View):
+            def __init__(self):
+                raise ValueError("broken")
+        Broken.__module__ = views.__name__
+        with mock.patch.object(views, 'Broken', Broken, create = True):
+            with warnings.catch_warnings(record = True) as caught:
+                warnings.simplefilter('always')
+                found = list(manifest.scan_installed_apps())
+        self.assertNotIn(Broken, [view for _, _, view, _ in found])
+        self.assertIn("tests.views.Broken", 
+                      ' '.join(str(w.message) for w in caught))
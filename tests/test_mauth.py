@@ -0,0 +1,52 @@
+import json
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from mviews.mauth.utils import reload_levels
+from tests.models import Author
+from tests.models import User
+
+
+class PermissionTest(TestCase):
+    
+    def test_anonymous_level(self):
+        resp = self.client.get('/admin/permission/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.content.decode()), 
+                         {"level" : "student"})
+    
+    def test_user_level(self):
+        user = User.objects.create_user('admin@example.com', 'pass')
+        user.level = 5
+        user.save()
+        self.client.login(username = 'admin@example.com', password = 'pass')
+        resp = self.client.get('/admin/permission/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.content.decode()), 
+                         {"level" : "admin"})
+    
+    def test_levels(self):
+        resp = self.client.options('/admin/permission/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.content.decode())["level_by_name"], 
+                         User.level_by_name)
+
+
+class PermsTest(TestCase):
+    
+    def tearDown(self):
+        reload_levels()
+    
+    def test_level_required(self):
+        User.objects.create_user('student@example.com', 'pass')
+        self.client.login(username = 'student@example.com', password = 'pass')
+        resp = self.client.delete('/models/author/')
+        self.assertEqual(resp.status_code, 403)
+    
+    def test_unknown_level(self):
+        with patch.object(Author, '_perms', {"get" : "nobody"}):
+            reload_levels()
+            resp = self.client.get('/models/author/')
+        self.assertEqual(resp.status_code, 500)
+        self.assertIn("nobody", json.loads(resp.content.decode())["err"])
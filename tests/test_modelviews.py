@@ -0,0 +1,214 @@
+from decimal import Decimal
+import json
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from tests.models import Author
+from tests.models import Book
+from tests.models import Note
+from tests.models import Price
+from tests.models import Tag
+from tests.models import User
+
+
+def loads(resp):
+    return json.loads(resp.content.decode())
+
+
+class DeleteTest(TestCase):
+    
+    def test_delete(self):
+        user = User.objects.create_user('teacher@example.com', 'pass')
+        user.level = 1
+        user.save()
+        self.client.login(username = 'teacher@example.com', password = 'pass')
+        pks = [Author.objects.create(name = str(i)).pk for i in range(5)]
+        resp = self.client.delete('/models/author/?ids={}'
+                                  .format(','.join(map(str, pks[:4]))))
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(list(Author.objects.values_list('pk', flat = True)), 
+                         pks[4:])
+    
+    def test_batches(self):
+        pks = [Note.objects.create(text = str(i)).pk for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.delete('/models/note/?ids={}'
+                                      .format(','.join(map(str, pks[:4]))))
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(list(Note.objects.values_list('pk', flat = True)), 
+                         pks[4:])
+        self.assertEqual(len([q for q in queries 
+                              if q['sql'].startswith('DELETE')]), 2)
+    
+    @patch.object(Note, '_delete_batch_size', None)
+    def test_one_statement(self):
+        pks = [Note.objects.create(text = str(i)).pk for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.delete('/models/note/?ids={}'
+                                      .format(','.join(map(str, pks))))
+        self.assertEqual(resp.status_code, 204)
+        self.assertFalse(Note.objects.exists())
+        self.assertEqual([q['sql'].split()[0] for q in queries 
+                          if 'SAVEPOINT' not in q['sql']], 
+                         ['DELETE'])
+
+
+class MultiPutTest(TestCase):
+    
+    def put(self, data):
+        return self.client.put('/models/note/', 
+                               json.dumps(data), 
+                               content_type = 'application/json')
+    
+    def test_same_entity(self):
+        note = Note.objects.create(text = 'a')
+        resp = self.put({"data" : [{"data" : {"id" : note.pk, "text" : "b"}},
+                                   {"data" : {"id" : str(note.pk), 
+                                              "text" : "c"}}]})
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(Note.objects.get().text, 'c')
+    
+    def test_bad_lookup(self):
+        Note.objects.create(text = 'a')
+        resp = self.put({"data" : [{"data" : {"id" : "x", "text" : "b"}}]})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(Note.objects.get().text, 'a')
+    
+    def test_params_limit(self):
+        pks = [Note.objects.create(text = str(i)).pk for i in range(400)]
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.put({"data" : [{"data" : {"id" : pk, 
+                                                  "text" : "x", 
+                                                  "deleted" : True}} 
+                                       for pk in pks]})
+        self.assertEqual(resp.status_code, 204)
+        #5 params a row, so 199 rows a statement under SQLite's 999
+        self.assertEqual(len([q for q in queries 
+                              if q['sql'].startswith('UPDATE')]), 3)
+        self.assertEqual(Note.objects.filter(text = 'x', deleted = True).count(),
+                         400)
+    
+    def test_no_update_fields_none(self):
+        note = Note.objects.create(text = 'a')
+        Note._no_update_fields = None
+        self.addCleanup(delattr, Note, '_no_update_fields')
+        resp = self.put({"data" : [{"data" : {"id" : note.pk, "text" : "b"}}]})
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(Note.objects.get().text, 'b')
+
+
+class AggregateTest(TestCase):
+    
+    def setUp(self):
+        for text, deleted in (('a', False), ('b', False), ('c', True)):
+            Note.objects.create(text = text, deleted = deleted)
+    
+    def get(self, query):
+        return self.client.get('/models/note/?' + query)
+    
+    def test_aggs(self):
+        resp = self.get('_aggs=count+id,max+text')
+        self.assertEqual(resp.status_code, 200)
+        body = loads(resp)
+        self.assertEqual(body["extra"]["aggs"], 
+                         {"count_id" : 3, "max_text" : "c"})
+        self.assertEqual(body["count"], 3)
+    
+    def test_group_by(self):
+        with self.assertNumQueries(1):
+            resp = self.get('_aggs=count+id,min+text&_group_by=deleted')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(loads(resp)["aggs"], 
+                         [{"deleted" : False, "count_id" : 2, "min_text" : "a"},
+                          {"deleted" : True, "count_id" : 1, "min_text" : "c"}])
+    
+    def test_no_valid_aggs(self):
+        for query in ('_aggs=count+nofield', 
+                      '_aggs=nope+id&_group_by=deleted'):
+            resp = self.get(query)
+            self.assertEqual(resp.status_code, 400)
+            self.assertIn("None of the _aggs are valid", loads(resp)["err"])
+
+
+class M2mWriteTest(TestCase):
+    
+    def setUp(self):
+        self.author = Author.objects.create(name = 'a')
+        self.tags = [Tag.objects.create(name = str(i)).pk for i in range(3)]
+    
+    def send(self, method, path, data):
+        return getattr(self.client, method)(path, 
+                                            json.dumps(data), 
+                                            content_type = 'application/json')
+    
+    def tags_of(self, obj):
+        return sorted(obj.tags.values_list('pk', flat = True))
+    
+    def test_bulk_post(self):
+        resp = self.send('post', '/models/book/?_pks=1', 
+                         {"data" : [{"entity" : {"author_id" : self.author.pk},
+                                     "tags" : self.tags[:2]},
+                                    {"entity" : {"author_id" : self.author.pk},
+                                     "tags" : self.tags[2:]}]})
+        self.assertEqual(resp.status_code, 200)
+        first, second = loads(resp)["data"]
+        self.assertEqual(self.tags_of(Book.objects.get(pk = first)), 
+                         self.tags[:2])
+        self.assertEqual(self.tags_of(Book.objects.get(pk = second)), 
+                         self.tags[2:])
+    
+    def test_put_changing_filtered_field(self):
+        other = Author.objects.create(name = 'b')
+        book = Book.objects.create(author = self.author)
+        book.tags.add(self.tags[0])
+        resp = self.send('put', '/models/book/?author={}'.format(self.author.pk),
+                         {"data" : {"author_id" : other.pk}, 
+                          "tags" : {"add" : self.tags[1:], 
+                                    "delete" : self.tags[:1]}})
+        self.assertEqual(resp.status_code, 204)
+        book = Book.objects.get(pk = book.pk)
+        self.assertEqual(book.author_id, other.pk)
+        self.assertEqual(self.tags_of(book), self.tags[1:])
+    
+    def test_multi_put_by_python_value(self):
+        price = Price.objects.create(code = Decimal('1.50'), label = 'a')
+        resp = self.send('put', '/models/price/', 
+                         {"lookup" : "code",
+                          "data" : [{"data" : {"code" : "1.5", "label" : "b"},
+                                     "tags" : {"add" : self.tags}}]})
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(Price.objects.get().label, 'b')
+        self.assertEqual(self.tags_of(price), self.tags)
+
+
+class BulkPostTest(TestCase):
+    
+    def setUp(self):
+        self.author = Author.objects.create(name = 'a')
+        self.tag = Tag.objects.create(name = 't')
+    
+    def count_queries(self, path, data):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.post(path, 
+                                    json.dumps({"data" : data}), 
+                                    content_type = 'application/json')
+        self.assertEqual(resp.status_code, 200)
+        return len(queries)
+    
+    def test_depth_queries(self):
+        counts = [self.count_queries('/models/author/?_depth=1', 
+                                     [{"name" : "{}-{}".format(n, i)} 
+                                      for i in range(n)])
+                  for n in (2, 10)]
+        self.assertEqual(counts[0], counts[1])
+    
+    def test_m2m_queries(self):
+        counts = [self.count_queries('/models/book/?_pks=1', 
+                                     [{"entity" : {"author_id" : self.author.pk},
+                                       "tags" : [self.tag.pk]}] * n)
+                  for n in (2, 10)]
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.tag.book_set.count(), 12)
@@ -0,0 +1,82 @@
+import json
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from tests.models import Author
+
+
+def loads(resp):
+    return json.loads(resp.content.decode())
+
+
+class CursorPagingTest(TestCase):
+    
+    def setUp(self):
+        self.pks = [Author.objects.create(name = str(i)).pk for i in range(5)]
+    
+    def get(self, query):
+        resp = self.client.get('/models/author/?' + query)
+        self.assertEqual(resp.status_code, 200)
+        return loads(resp)
+    
+    def pks_of(self, page):
+        return [e["id"] for e in page["data"]]
+    
+    def test_walk(self):
+        first = self.get('_cursor=&_limit=2')
+        self.assertEqual(self.pks_of(first), self.pks[:2])
+        self.assertIsNone(first["previous_cursor"])
+        second = self.get('_cursor={}&_limit=2'.format(first["next_cursor"]))
+        self.assertEqual(self.pks_of(second), self.pks[2:4])
+        last = self.get('_cursor={}&_limit=2'.format(second["next_cursor"]))
+        self.assertEqual(self.pks_of(last), self.pks[4:])
+        self.assertIsNone(last["next_cursor"])
+        back = self.get('_cursor={}&_limit=2'.format(last["previous_cursor"]))
+        self.assertEqual(self.pks_of(back), self.pks[2:4])
+        back = self.get('_cursor={}&_limit=2'.format(back["previous_cursor"]))
+        self.assertEqual(self.pks_of(back), self.pks[:2])
+        self.assertIsNone(back["previous_cursor"])
+        self.assertIsNotNone(back["next_cursor"])
+    
+    def test_after(self):
+        page = self.get('_after={}&_limit=2'.format(self.pks[1]))
+        self.assertEqual(self.pks_of(page), self.pks[2:4])
+        self.assertIsNotNone(page["previous_cursor"])
+    
+    def test_key_not_asked_for(self):
+        first = self.get('_cursor=&_limit=2&_fields=name')
+        self.assertEqual(first["data"], [{"name" : "0"}, {"name" : "1"}])
+        self.assertNotIn("count", first)
+        self.assertEqual(first["number_returned"], 2)
+        second = self.get('_cursor={}&_limit=2&_fields=name'
+                          .format(first["next_cursor"]))
+        self.assertEqual(second["data"], [{"name" : "2"}, {"name" : "3"}])
+    
+    def test_stream_key_not_asked_for(self):
+        resp = self.client.get('/models/author/?_stream&_fields=name')
+        body = json.loads(b''.join(resp.streaming_content).decode())
+        self.assertEqual(body["data"], [{"name" : str(i)} for i in range(5)])
+        self.assertEqual(body["count"], 5)
+    
+    def test_count_on_request(self):
+        with self.assertNumQueries(1):
+            page = self.get('_cursor=&_limit=2')
+        self.assertNotIn("total_entities", page)
+        with self.assertNumQueries(2):
+            page = self.get('_cursor=&_limit=2&_count')
+        self.assertEqual(page["total_entities"], 5)
+
+
+class PagingErrorTest(TestCase):
+    
+    def test_bad_limit(self):
+        resp = self.client.get('/models/author/?_page=1&_limit=x')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("Not a valid limit", loads(resp)["err"])
+    
+    @patch('mviews.mview.utils.serialize_to_response', 
+           side_effect = ValueError('bug'))
+    def test_other_errors_raised(self, serialize):
+        with self.assertRaises(ValueError):
+            self.client.get('/models/author/')
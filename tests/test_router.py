@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+from django.core.urlresolvers import RegexURLPattern
+from django.http.response import HttpResponse
+from django.test import Client
+from django.test import RequestFactory
+from django.test import TestCase
+from django.views.generic.base import View
+
+from mviews.router.dispatch import PrefixDispatcher
+from mviews.router.routes import Routes
+from mviews.router.routes import routes
+from mviews.router.utils import LazyView
+
+
+class LazyViewTest(TestCase):
+    
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks = True)
+    
+    def test_csrf_exempt(self):
+        resp = self.client.post('/views/exempt/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, b'exempt')
+    
+    def test_csrf_protected(self):
+        resp = self.client.post('/views/protected/')
+        self.assertEqual(resp.status_code, 403)
+    
+    def test_attributes(self):
+        view = LazyView('tests.views.exempt')
+        self.assertIsNone(view._view)
+        self.assertTrue(view.csrf_exempt)
+        self.assertFalse(hasattr(view, '_missing'))
+    
+    def test_local_class(self):
+        class Local(View):
+            routes = ['local']
+            
+            def get(self, request):
+                return HttpResponse('local')
+        
+        view = LazyView.of(Local)
+        self.assertIsNone(view._view)
+        self.assertEqual(view.__name__, 'Local')
+        self.assertEqual(view(RequestFactory().get('/local/')).content, 
+                         b'local')
+
+
+class FrozenRoutesTest(TestCase):
+    
+    def test_add_after_urls(self):
+        self.assertIsNotNone(Routes.url_patterns)
+        count = len(routes.routes)
+        with self.assertRaises(ValueError):
+            routes.add('views/late', 'tests.views.exempt')
+        with self.assertRaises(ValueError):
+            routes.add_auto(r'models/late/([^\s#?]*)', 'tests.models.Tag')
+        self.assertEqual(len(routes.routes), count)
+        self.assertNotIn('views/late', Routes.tracked)
+        self.assertEqual(self.client.get('/views/late/').status_code, 404)
+
+
+def view(request, *args):
+    return HttpResponse()
+
+def other(request, *args):
+    return HttpResponse()
+
+
+class PrefixDispatcherTest(TestCase):
+    
+    def setUp(self):
+        self.dispatcher = PrefixDispatcher()
+        self.dispatcher.add('a/b', view)
+    
+    def test_rest(self):
+        match = self.dispatcher.resolve('a/b/1/2')
+        self.assertIs(match.func, view)
+        self.assertEqual(match.args, ('1/2',))
+    
+    def test_trailing_slash(self):
+        self.assertEqual(self.dispatcher.resolve('a/b/').args, ('',))
+        self.assertIsNone(self.dispatcher.resolve('a/b'))
+        self.assertIsNone(self.dispatcher.resolve('a/b/c d'))
+    
+    def test_no_match(self):
+        self.assertIsNone(self.dispatcher.resolve('a/c/'))
+        self.assertIsNone(self.dispatcher.resolve('b/'))
+        self.assertIsNone(self.dispatcher.resolve(''))
+    
+    def test_longer_prefix(self):
+        #the first added wins, as with the regexes
+        self.dispatcher.add('a/b/c', other)
+        self.assertIs(self.dispatcher.resolve('a/b/c/1').func, view)
+        dispatcher = PrefixDispatcher()
+        dispatcher.add('a/b/c', other)
+        dispatcher.add('a/b', view)
+        self.assertIs(dispatcher.resolve('a/b/c/1').func, other)
+        self.assertEqual(dispatcher.resolve('a/b/c/1').args, ('1',))
+        self.assertIs(dispatcher.resolve('a/b/d/1').func, view)
+    
+    @patch.object(Routes, 'routes', [])
+    @patch.object(Routes, 'tracked', set())
+    @patch.object(Routes, 'discovery', [])
+    @patch.object(Routes, 'url_patterns', None)
+    def test_order_kept(self):
+        table = Routes()
+        table.add_auto(r'a/b/([^\s#?]*)', view)
+        table.add_auto(r'a/c/([^\s#?]*)', view)
+        table.add(r'a/b/custom', other)
+        table.add_auto(r'a/d/([^\s#?]*)', view)
+        self.assertEqual([type(r) for r in table.routes], 
+                         [PrefixDispatcher, RegexURLPattern, PrefixDispatcher])
+        self.assertEqual(len(table.routes[0]), 2)
@@ -0,0 +1,147 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from unittest import skipIf
+from uuid import UUID
+
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+
+from mviews.serializer.encoders import _encoders
+from mviews.serializer.encoders import dumps
+from mviews.serializer.encoders import get_encoder
+
+from mviews.serializer.models2dicts import convert_to_dicts
+from mviews.serializer.models2dicts import convert_to_normalized
+from mviews.serializer.models2dicts import relation_paths
+from tests.models import Author
+from tests.models import Book
+from tests.models import Node
+from tests.models import Profile
+from tests.models import Shelf
+from tests.models import Tag
+
+
+class ReverseOneToOneTest(TestCase):
+    
+    def setUp(self):
+        self.with_profile = Author.objects.create(name = 'with')
+        self.profile = Profile.objects.create(author = self.with_profile, 
+                                              bio = 'bio')
+        self.without = Author.objects.create(name = 'without')
+    
+    def test_convert(self):
+        with_profile, without = convert_to_dicts(
+                                    Author.objects.order_by('pk'), 
+                                    ['name', 'profile'])
+        self.assertEqual(with_profile['profile']['bio'], 'bio')
+        self.assertEqual(with_profile['profile']['id'], self.profile.pk)
+        self.assertIsNone(without['profile'])
+    
+    def test_normalized(self):
+        vals, included = convert_to_normalized(Author.objects.order_by('pk'),
+                                               ['name', 'profile'], 
+                                               depth = 1)
+        self.assertEqual(vals[0]['profile'], self.profile.pk)
+        self.assertIsNone(vals[1]['profile'])
+        self.assertEqual(included['tests.profile'][str(self.profile.pk)]['bio'],
+                         'bio')
+
+
+class CycleTest(TestCase):
+    
+    def test_pruned_not_reused(self):
+        n1 = Node.objects.create(name = '1')
+        n2 = Node.objects.create(name = '2', next = n1)
+        n3 = Node.objects.create(name = '3', next = n2)
+        n1.next = n2
+        n1.save()
+        Shelf.objects.create(first = n1)
+        Shelf.objects.create(first = n3)
+        first, second = convert_to_dicts(Shelf.objects.order_by('pk'), 
+                                         ['first'], 
+                                         depth = 3)
+        #n1 is on the path so it is left out of n2
+        self.assertNotIn('next', first['first']['next'])
+        #but not when n2 is reached from n3
+        self.assertEqual(second['first']['next']['next']['name'], '1')
+
+
+class RelationPathsTest(TestCase):
+    
+    def test_last_level(self):
+        fields = ['name', 'profile', 'books']
+        select, prefetch = relation_paths(Author, fields, 2)
+        self.assertEqual(select, [])
+        self.assertEqual(sorted(prefetch), ['books', 'profile'])
+        select, prefetch = relation_paths(Author, fields, 3)
+        self.assertEqual(sorted(prefetch), ['books', 'books__tags', 'profile'])
+    
+    def test_loads_what_is_converted(self):
+        author = Author.objects.create(name = 'a')
+        book = Book.objects.create(author = author)
+        book.tags.add(Tag.objects.create(name = 't'))
+        fields = ['name', 'books']
+        #the authors, their books and (past the second level) the tags
+        for depth, queries in ((1, 2), (2, 2), (3, 3)):
+            select, prefetch = relation_paths(Author, fields, depth)
+            qs = (Author.objects.select_related(*select)
+                  .prefetch_related(*prefetch))
+            with self.assertNumQueries(queries):
+                converted = convert_to_dicts(qs, fields, depth)
+            #the tags are only read past the last level
+            self.assertEqual(bool(converted[0]['books'][0].get('tags')), 
+                             depth > 2)
+    
+    def test_self_fk_not_loaded(self):
+        n1 = Node.objects.create(name = '1')
+        n2 = Node.objects.create(name = '2', next = n1)
+        Node.objects.create(name = '3', next = n2)
+        fields = ['name', 'next']
+        select, prefetch = relation_paths(Node, fields, 2)
+        qs = Node.objects.select_related(*select).prefetch_related(*prefetch)
+        with self.assertNumQueries(1):
+            converted = convert_to_dicts(qs.order_by('pk'), fields, 2)
+        #the base type is not followed past the first level
+        self.assertEqual(converted[2]['next']['id'], n2.pk)
+        self.assertNotIn('next', converted[2]['next'])
+    
+    def test_normalized_loads_what_is_converted(self):
+        author = Author.objects.create(name = 'a')
+        book = Book.objects.create(author = author)
+        book.tags.add(Tag.objects.create(name = 't'))
+        fields = ['name', 'books']
+        for depth, queries in ((2, 2), (3, 3)):
+            select, prefetch = relation_paths(Author, fields, depth)
+            qs = (Author.objects.select_related(*select)
+                  .prefetch_related(*prefetch))
+            with self.assertNumQueries(queries):
+                _, included = convert_to_normalized(qs, fields, depth)
+            #the tags are only read past the last level, as when nested
+            self.assertEqual('tags' in included['tests.book'][str(book.pk)],
+                             depth > 2)
+
+
+class EncoderTest(TestCase):
+    
+    data = [datetime(2016, 1, 2, 3, 4, 5, 123456, tzinfo = timezone.utc),
+            Decimal('1.10'),
+            UUID('12345678123456781234567812345678')]
+    expected = (b'["2016-01-02T03:04:05.123Z", "1.10", '
+                b'"12345678-1234-5678-1234-567812345678"]')
+    
+    def test_json_default(self):
+        self.assertIs(get_encoder(), _encoders['json'])
+        self.assertEqual(dumps(self.data), self.expected)
+    
+    @override_settings(JSON_ENCODER = 'missing')
+    def test_unregistered(self):
+        with self.assertRaises(ValueError):
+            dumps({})
+    
+    @skipIf('orjson' not in _encoders, 'orjson is not installed')
+    def test_orjson_same_as_json(self):
+        encoded = get_encoder('orjson')(self.data)
+        self.assertEqual(json.loads(encoded.decode()),
+                         json.loads(self.expected.decode()))
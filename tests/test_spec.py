@@ -0,0 +1,58 @@
+from django.db.models.signals import class_prepared
+from django.test import TestCase
+
+from mviews.mview.spec import ViewSpec
+from mviews.mview.spec import _specs
+from mviews.mview.spec import get_spec
+from tests.models import Author
+from tests.models import Book
+from tests.models import Event
+from tests.models import Note
+from tests.models import Price
+from tests.models import Shelf
+from tests.models import Tag
+
+
+class GetSpecTest(TestCase):
+    
+    def test_built_once(self):
+        _specs.pop(Tag, None)
+        spec = get_spec(Tag)
+        self.assertIs(_specs[Tag], spec)
+        self.assertIs(get_spec(Tag()), spec)
+        self.assertEqual(spec.label, 'tests.tag')
+    
+    def test_dropped_when_prepared(self):
+        spec = get_spec(Tag)
+        class_prepared.send(sender = Tag)
+        self.assertNotIn(Tag, _specs)
+        self.assertIsNot(get_spec(Tag), spec)
+
+
+class FastDeleteTest(TestCase):
+    
+    def test_not_pointed_to(self):
+        self.assertTrue(ViewSpec._can_fast_delete(Note._meta))
+        self.assertTrue(ViewSpec._can_fast_delete(Shelf._meta))
+    
+    def test_cascades(self):
+        #the books and the profile of the author
+        self.assertFalse(ViewSpec._can_fast_delete(Author._meta))
+        #the through tables of the tags of books and prices
+        self.assertFalse(ViewSpec._can_fast_delete(Tag._meta))
+
+
+class RequiredTest(TestCase):
+    
+    def required(self, model, name):
+        return ViewSpec._is_required(model._meta.get_field(name))
+    
+    def test_required(self):
+        self.assertTrue(self.required(Price, 'code'))
+        self.assertTrue(self.required(Book, 'author'))
+    
+    def test_not_required(self):
+        self.assertFalse(self.required(Price, 'id'))
+        self.assertFalse(self.required(Price, 'label'))
+        self.assertFalse(self.required(Note, 'deleted'))
+        self.assertFalse(self.required(Event, 'updated'))
@@ -0,0 +1,146 @@
+import json
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from tests.models import Author
+from tests.models import Book
+from tests.models import Note
+from tests.models import Tag
+
+
+def loads(resp):
+    return json.loads(resp.content.decode())
+
+
+@override_settings(STREAM_REQUEST_SIZE = 10)
+class StreamedBodyTest(TestCase):
+    
+    def send(self, method, path, data):
+        return getattr(self.client, method)(path, 
+                                            json.dumps(data), 
+                                            content_type = 'application/json')
+    
+    def test_same_response(self):
+        data = {"data" : [{"name" : "a"}, {"name" : "b"}]}
+        streamed = self.send('post', '/models/author/', data)
+        self.assertEqual(streamed.status_code, 200)
+        with override_settings(STREAM_REQUEST_SIZE = None):
+            data = {"data" : [{"name" : "c"}, {"name" : "d"}]}
+            read = self.send('post', '/models/author/', data)
+        self.assertEqual(read.status_code, 200)
+        self.assertEqual([sorted(e) for e in loads(streamed)["data"]], 
+                         [sorted(e) for e in loads(read)["data"]])
+        self.assertEqual([e["name"] for e in loads(streamed)["data"]], 
+                         ['a', 'b'])
+    
+    def test_pks(self):
+        resp = self.send('post', '/models/author/?_pks=1', 
+                         {"data" : [{"name" : "a"}, {"name" : "b"}]})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(loads(resp), 
+                         {"count" : 2, 
+                          "data" : list(Author.objects.order_by('pk')
+                                        .values_list('pk', flat = True))})
+    
+    def test_lookup_after_data(self):
+        note = Note.objects.create(text = 'a')
+        resp = self.send('put', '/models/note/', 
+                         {"data" : [{"data" : {"id" : note.pk, "text" : "b"}}],
+                          "lookup" : "text"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("lookup", loads(resp)["err"])
+        self.assertEqual(Note.objects.get().text, 'a')
+    
+    def test_lookup_before_data(self):
+        note = Note.objects.create(text = 'a')
+        resp = self.send('put', '/models/note/', 
+                         {"lookup" : "text", 
+                          "data" : [{"data" : {"text" : "a", "deleted" : True}}]})
+        self.assertEqual(resp.status_code, 204)
+        self.assertTrue(Note.objects.get(pk = note.pk).deleted)
+    
+    @patch('mviews.mview.modelviews.read_stream')
+    def test_opt_in(self, read_stream):
+        resp = self.send('post', '/models/tag/', 
+                         {"data" : [{"name" : "a"}, {"name" : "b"}]})
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(read_stream.called)
+        self.assertEqual(Tag.objects.count(), 2)
+    
+    @override_settings(STREAM_MAX_VALUE_SIZE = 100)
+    def test_large_single_entity(self):
+        text = 'x' * 100000
+        resp = self.send('post', '/models/note/', {"data" : {"text" : text}})
+        self.assertEqual(resp.status_code, 200)
+        note = Note.objects.get()
+        self.assertEqual(note.text, text)
+        resp = self.send('put', '/models/note/{}/'.format(note.pk), 
+                         {"data" : {"text" : text[1:]}})
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(Note.objects.get().text, text[1:])
+    
+    @override_settings(STREAM_MAX_VALUE_SIZE = 100)
+    def test_malformed(self):
+        resp = self.client.post('/models/author/', 
+                                '{"data" : [{"name" : "' + 'x' * 100000, 
+                                content_type = 'application/json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("longer than 100", loads(resp)["err"])
+
+
+class StreamedGetTest(TestCase):
+    
+    def setUp(self):
+        for name in 'abc':
+            Author.objects.create(name = name)
+    
+    def test_stream(self):
+        resp = self.client.get('/models/author/?_stream')
+        self.assertTrue(resp.streaming)
+        body = json.loads(b''.join(resp.streaming_content).decode())
+        self.assertEqual(body["count"], 3)
+    
+    def test_bad_cursor(self):
+        resp = self.client.get('/models/author/?_stream&_cursor=notacursor')
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("Not a valid cursor", loads(resp)["err"])
+    
+    def test_bad_limit(self):
+        resp = self.client.get('/models/author/?_stream&_limit=x')
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp.status_code, 400)
+
+
+class ExportTest(TestCase):
+    
+    def setUp(self):
+        self.author = Author.objects.create(name = 'a, b')
+        Book.objects.create(author = self.author)
+    
+    def get(self, path, accept):
+        return self.client.get(path, HTTP_ACCEPT = accept)
+    
+    def lines(self, resp):
+        self.assertTrue(resp.streaming)
+        return b''.join(resp.streaming_content).decode().splitlines()
+    
+    def test_ndjson(self):
+        resp = self.get('/models/book/?_depth=1', 'application/x-ndjson')
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(l) for l in self.lines(resp)]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["author"]["name"], 'a, b')
+    
+    def test_csv(self):
+        resp = self.get('/models/author/?_fields=id,name', 'text/csv')
+        self.assertEqual(resp['Content-Type'], 'text/csv')
+        self.assertEqual(self.lines(resp)[1:], 
+                         ['{},"a, b"'.format(self.author.pk)])
+    
+    def test_csv_depth(self):
+        resp = self.get('/models/book/?_depth=1', 'text/csv')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("text/csv", loads(resp)["err"])
@@ -0,0 +1,76 @@
+from decimal import Decimal
+import json
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+
+from mviews.mview.modelviews import _supports_on_conflict
+from tests.models import Price
+
+
+class UpsertTest(TestCase):
+    
+    def setUp(self):
+        self.existing = Price.objects.create(code = Decimal('1.50'), 
+                                             label = 'a')
+    
+    def upsert(self, data, key = 'code'):
+        resp = self.client.post('/models/price/?_upsert=' + key, 
+                                json.dumps({"data" : data}), 
+                                content_type = 'application/json')
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(resp.content.decode())["data"]
+    
+    def check_upsert(self):
+        pks = self.upsert([{"code" : "1.5", "label" : "b"}, 
+                           {"code" : 2, "label" : "c"},
+                           {"code" : 1.5, "label" : "d"}])
+        new = Price.objects.get(code = 2)
+        self.assertEqual(pks, [self.existing.pk, new.pk, self.existing.pk])
+        self.assertEqual(Price.objects.get(pk = self.existing.pk).label, 'd')
+        self.assertEqual(Price.objects.count(), 2)
+    
+    def test_on_conflict(self):
+        self.check_upsert()
+    
+    @patch('mviews.mview.modelviews._supports_on_conflict', 
+           return_value = False)
+    def test_by_lookup(self, supports):
+        self.check_upsert()
+    
+    def check_upsert_by_pk(self):
+        pks = self.upsert([{"id" : self.existing.pk, "code" : 1, "label" : "b"},
+                           {"id" : 100, "code" : 2, "label" : "c"}], 
+                          'id')
+        self.assertEqual(pks, [self.existing.pk, 100])
+        self.assertEqual(Price.objects.get(pk = self.existing.pk).code, 1)
+        self.assertEqual(Price.objects.get(pk = 100).label, 'c')
+        self.assertEqual(Price.objects.count(), 2)
+    
+    def test_on_conflict_by_pk(self):
+        self.check_upsert_by_pk()
+    
+    @patch('mviews.mview.modelviews._supports_on_conflict', 
+           return_value = False)
+    def test_by_lookup_by_pk(self, supports):
+        self.check_upsert_by_pk()
+    
+    def test_statement_params_limit(self):
+        with patch.object(connection.ops, 'bulk_batch_size', 
+                          return_value = 1) as size:
+            self.check_upsert()
+        self.assertTrue(size.called)
+    
+    def test_old_postgresql(self):
+        old = Mock(vendor = 'postgresql', pg_version = 90400)
+        self.assertFalse(_supports_on_conflict(old))
+        old.pg_version = 90500
+        self.assertTrue(_supports_on_conflict(old))
+    
+    def test_invalid_key(self):
+        resp = self.client.post('/models/price/?_upsert=code', 
+                                json.dumps({"data" : [{"code" : "x"}]}), 
+                                content_type = 'application/json')
+        self.assertEqual(resp.status_code, 400)
@@ -0,0 +1,21 @@
+'''
+The routes the tests are run against.
+'''
+
+from mviews.jobs.views import JobStatus
+from mviews.mauth.views import Permission
+from mviews.router.routes import routes
+
+
+routes.add_view(Permission)
+routes.add_view(JobStatus)
+routes.add_auto(r'models/author/([^\s#?]*)', 'tests.models.Author')
+routes.add_auto(r'models/note/([^\s#?]*)', 'tests.models.Note')
+routes.add_auto(r'models/tag/([^\s#?]*)', 'tests.models.Tag')
+routes.add_auto(r'models/price/([^\s#?]*)', 'tests.models.Price')
+routes.add_auto(r'models/event/([^\s#?]*)', 'tests.models.Event')
+routes.add_auto(r'models/book/([^\s#?]*)', 'tests.models.Book')
+routes.add('views/exempt', 'tests.views.exempt')
+routes.add('views/protected', 'tests.views.protected')
+
+urlpatterns = routes.urls
@@ -0,0 +1,20 @@
+'''
+The plain views the tests are run against.
+'''
+
+from django.http.response import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from mviews.mauth.decorators import authenticated
+
+
+@csrf_exempt
+def exempt(request):
+    return HttpResponse('exempt')
+
+def protected(request):
+    return HttpResponse('protected')
+
+@authenticated
+def authed(request):
+    return HttpResponse('authed')